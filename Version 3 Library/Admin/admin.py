@@ -1,4 +1,5 @@
 # --- 1. Import Necessary Libraries ---
+import sys
 import pandas as pd
 import mysql.connector
 from flask import (
@@ -7,107 +8,511 @@ from flask import (
     send_file,
     jsonify,
     render_template,
-    send_from_directory
+    Response,
+    stream_with_context
 )
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import date, datetime, timedelta
+import atexit
+import csv
 import io
+import os
+import tempfile
+import zlib
+import xlsxwriter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+import log_schema
+import metrics
+import static_assets
+from leader_lock import LeaderLock
+import rollups
+import archive
+import attendance
+from report_cache import ReportCache
+import occupancy_report
+import parquet_export
 
 # --- 2. Database Configuration ---
 db_config = {
     'host': 'localhost',      # Or your database server IP
     'user': 'root',           # Your database username
     'password': '',           # Your database password
-    'database': 'lib_main'
+    'database': os.environ.get('LIB_DB_NAME', 'lib_main')  # bench.py points this at its own database
 }
+db_pool_conn = db_pool.get_pool(db_config, name='admin')
 
 # --- 3. Initialize the Flask Application ---
-app = Flask(__name__, template_folder='.', static_folder='.')
+app = Flask(__name__, template_folder='.', static_folder=None)
 CORS(app)  # Enable CORS to allow requests from the browser
+log = metrics.install(app, 'admin')
+ASSETS = static_assets.AssetPipeline(app, ['sty.css', 'scr.js', 'background.png'])
+
+# --- 4. Helper Functions to Fetch Data from MySQL ---
+# Report column -> SQL expression. Dates and times are formatted by MySQL so
+# pandas only has to fill in "Still Inside" for open logs.
+REPORT_COLUMNS = {
+    "Registration No": "full_reg_no",
+    "Name": "name",
+    "Branch": "branch",
+    "Year": "year",
+    "Entry Date": "DATE_FORMAT(entry_date, %(date_fmt)s)",
+    "Entry Time": "TIME_FORMAT(entry_time, %(time_fmt)s)",
+    "Exit Date": "DATE_FORMAT(exit_date, %(date_fmt)s)",
+    "Exit Time": "TIME_FORMAT(exit_time, %(time_fmt)s)",
+}
 
-# --- 4. Helper Function to Fetch Data from MySQL ---
-def get_log_data():
-    """
-    Connects to the MySQL database and fetches the library logs.
-    Returns a pandas DataFrame.
-    """
-    try:
-        conn = mysql.connector.connect(**db_config)
-        query = """
-            SELECT 
-                full_reg_no, 
-                name, 
-                branch, 
-                year, 
-                entry_date, 
-                TIME_FORMAT(entry_time, '%H:%i:%s') AS entry_time,
-                exit_date,
-                TIME_FORMAT(exit_time, '%H:%i:%s') AS exit_time
-            FROM logs
-        """
-        df = pd.read_sql(query, conn)
+LOG_INDEXES = {
+    "idx_logs_entry_date_time": "(entry_date, entry_time)",
+    "idx_logs_reg_exit": "(full_reg_no, exit_date)",
+}
+
+def ensure_log_indexes():
+    """Creates the composite indexes the report queries rely on, if missing."""
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'logs'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        for name, columns in LOG_INDEXES.items():
+            if name not in existing:
+                log.info("creating index on logs", extra={'fields': {'index': name, 'columns': columns}})
+                cursor.execute(f"CREATE INDEX {name} ON logs {columns}")
+        cursor.close()
+    except mysql.connector.Error as e:
+        log.error("error creating log indexes", extra={'fields': {'error': str(e)}})
+    finally:
+        db_pool_conn.put(conn)
 
-        # Format entry & exit dates properly
-        df['entry_date'] = pd.to_datetime(df['entry_date'], errors='coerce').dt.strftime('%d-%m-%Y')
-        df['exit_date'] = pd.to_datetime(df['exit_date'], errors='coerce').dt.strftime('%d-%m-%Y')
+@metrics.timed('get_log_data')
+def get_log_data(start_date=None, end_date=None, columns=None, newest_first=False):
+    """
+    Fetches library logs with entry_date between start_date and end_date
+    (inclusive, either bound optional) as a pandas DataFrame with report
+    column names. Returns None if the database could not be queried.
+    """
+    columns = columns or list(REPORT_COLUMNS)
+    df = read_parquet(_parquet_log_data, start_date, end_date, columns, newest_first)
+    if df is not None:
+        return df
+    select = ",\n                ".join(f"{REPORT_COLUMNS[col]} AS `{col}`" for col in columns)
+    where, params = _date_range_clause(start_date, end_date)
+    params.update(date_fmt='%d-%m-%Y', time_fmt='%H:%i:%s')
+    order = "DESC" if newest_first else "ASC"
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        query = f"""
+            SELECT
+                {select}
+            FROM {archive.logs_source(where, start_date)}
+            ORDER BY entry_date {order}, entry_time {order}
+        """
+        df = pd.read_sql(query, conn, params=params)
 
         # Fill missing exit date/time with "Still Inside"
-        df['exit_date'] = df['exit_date'].fillna("Still Inside")
-        df['exit_time'] = df['exit_time'].fillna("Still Inside")
-
-        # Rename columns for professional Excel reports
-        df.rename(columns={
-            "full_reg_no": "Registration No",
-            "name": "Name",
-            "branch": "Branch",
-            "year": "Year",
-            "entry_date": "Entry Date",
-            "entry_time": "Entry Time",
-            "exit_date": "Exit Date",
-            "exit_time": "Exit Time"
-        }, inplace=True)
+        for col in ("Exit Date", "Exit Time"):
+            if col in df:
+                df[col] = df[col].fillna("Still Inside")
+        return df
+
+    except mysql.connector.Error as e:
+        log.error("error fetching log data", extra={'fields': {'error': str(e)}})
+        return None
+    finally:
+        db_pool_conn.put(conn)
+
+def iter_log_rows(start_date=None, end_date=None, newest_first=False, chunk_size=5000):
+    """
+    Yields lists of report rows (tuples in REPORT_COLUMNS order) read from an
+    unbuffered, server-side cursor, so only one chunk is held in memory.
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    select = ", ".join(f"{expr} AS `{col}`" for col, expr in REPORT_COLUMNS.items())
+    where, params = _date_range_clause(start_date, end_date)
+    params.update(date_fmt='%d-%m-%Y', time_fmt='%H:%i:%s')
+    order = "DESC" if newest_first else "ASC"
+    conn = db_pool_conn.get()
+    cursor = None
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(f"SELECT {select} FROM {archive.logs_source(where, start_date)} "
+                       f"ORDER BY entry_date {order}, entry_time {order}", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            # Open logs have no exit date/time yet
+            yield [row[:6] + tuple("Still Inside" if v is None else v for v in row[6:]) for row in rows]
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass  # closing mid-stream; put() below discards a broken connection
+        db_pool_conn.put(conn)
+
+@metrics.timed('count_unique_visitors')
+def count_unique_visitors(start_date, end_date):
+    """COUNT(DISTINCT full_reg_no) for the date range, or None on a database error."""
+    df = read_parquet(parquet_export.read_logs, start_date, end_date, ['full_reg_no'])
+    if df is not None:
+        return df['full_reg_no'].nunique()
+    where, params = _date_range_clause(start_date, end_date)
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(DISTINCT full_reg_no) FROM {archive.logs_source(where, start_date)}",
+                       params)
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return count
+    except mysql.connector.Error as e:
+        log.error("error counting unique visitors", extra={'fields': {'error': str(e)}})
+        return None
+    finally:
+        db_pool_conn.put(conn)
+
+VISIT_COLUMNS = ["full_reg_no", "name", "branch", "year", "entry_date", "entry_time", "exit_date", "exit_time"]
 
+@metrics.timed('get_visit_times')
+def get_visit_times(start_date, end_date):
+    """
+    Raw entry/exit dates and times (unformatted, for arithmetic) for logs with
+    entry_date in the range, oldest first. Returns None on a database error.
+    """
+    df = read_parquet(parquet_export.read_logs, start_date, end_date, VISIT_COLUMNS)
+    if df is not None:
         return df
+    where, params = _date_range_clause(start_date, end_date)
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        query = f"""
+            SELECT {', '.join(VISIT_COLUMNS)}
+            FROM {archive.logs_source(where, start_date)}
+            ORDER BY entry_date, entry_time
+        """
+        return pd.read_sql(query, conn, params=params)
+    except mysql.connector.Error as e:
+        log.error("error fetching visit times", extra={'fields': {'error': str(e)}})
+        return None
+    finally:
+        db_pool_conn.put(conn)
+
+def _date_range_clause(start_date, end_date):
+    conditions, params = [], {}
+    if start_date is not None:
+        conditions.append("entry_date >= %(start_date)s")
+        params['start_date'] = start_date
+    if end_date is not None:
+        conditions.append("entry_date <= %(end_date)s")
+        params['end_date'] = end_date
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+# --- 4b. Pre-aggregated Rollups ---
+def refresh_log_rollups(start_date=None, end_date=None):
+    """
+    Recomputes rollups for a date range, or (without a range) every day that
+    may have changed since the last refresh. Returns False on a database error.
+    """
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        if start_date is None:
+            rollups.refresh_pending(conn)
+        else:
+            rollups.refresh_rollups(conn, start_date, end_date)
+        return True
+    except mysql.connector.Error as e:
+        log.error("error refreshing log rollups", extra={'fields': {'error': str(e)}})
+        return False
+    finally:
+        db_pool_conn.put(conn)
 
+def refresh_attendance_bitmaps(start_date=None, end_date=None):
+    """Same as refresh_log_rollups, for the per-day attendance bitmaps."""
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        if start_date is None:
+            attendance.refresh_pending(conn)
+        else:
+            attendance.refresh_attendance(conn, start_date, end_date)
+        return True
     except mysql.connector.Error as e:
-        print(f"Error connecting to MySQL or fetching data: {e}")
-        return pd.DataFrame()
+        log.error("error refreshing attendance bitmaps", extra={'fields': {'error': str(e)}})
+        return False
     finally:
-        if 'conn' in locals() and conn.is_connected():
-            conn.close()
+        db_pool_conn.put(conn)
+
+def read_rollups(reader, start_date, end_date):
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        return reader(conn, start_date, end_date)
+    except mysql.connector.Error as e:
+        log.error("error reading log rollups", extra={'fields': {'error': str(e)}})
+        return None
+    finally:
+        db_pool_conn.put(conn)
+
+def _read_rolled_up_unique_visitors(conn, day, _end=None):
+    return rollups.read_unique_visitors(conn, day)
+
+def _read_attendance(conn, start_date, end_date):
+    days, matrix = attendance.read_matrix(conn, start_date, end_date)
+    return days, matrix, attendance.read_people(conn)
+
+# --- 4c. Parquet Export ---
+# With LIB_REPORT_SOURCE=parquet, report ranges the export fully covers are
+# read from the Parquet files; newer days (open logs) still come from MySQL.
+REPORT_SOURCE = os.environ.get('LIB_REPORT_SOURCE', 'mysql').lower()
+PARQUET_EXPORT_ENABLED = parquet_export.available() and os.environ.get('LIB_PARQUET_EXPORT', '1') != '0'
+PARQUET_EXPORT_MINUTES = 15
+
+def read_parquet(reader, start_date, end_date, *args):
+    """reader(start_date, end_date, *args) from the export, or None if MySQL should be used."""
+    if REPORT_SOURCE != 'parquet' or not parquet_export.available():
+        return None
+    if not parquet_export.covers(start_date, end_date):
+        return None
+    try:
+        return reader(start_date, end_date, *args)
+    except parquet_export.READ_ERRORS as e:
+        log.warning("parquet read failed, using MySQL", extra={'fields': {'error': str(e)}})
+        return None
+
+def _parquet_log_data(start_date, end_date, columns, newest_first):
+    logs = parquet_export.read_logs(start_date, end_date)
+    if newest_first:
+        logs = logs.iloc[::-1]
+    # Same text formats as the MySQL query; covered days have no open logs
+    report = pd.DataFrame({
+        "Registration No": logs['full_reg_no'],
+        "Name": logs['name'],
+        "Branch": logs['branch'],
+        "Year": logs['year'],
+        "Entry Date": pd.to_datetime(logs['entry_date']).dt.strftime('%d-%m-%Y'),
+        "Entry Time": _format_duration(logs['entry_time']),
+        "Exit Date": pd.to_datetime(logs['exit_date']).dt.strftime('%d-%m-%Y'),
+        "Exit Time": _format_duration(logs['exit_time']),
+    })
+    return report[columns].reset_index(drop=True)
+
+def _format_duration(times):
+    seconds = times.dt.total_seconds().astype('int64')
+    return (
+        (seconds // 3600).astype(str).str.zfill(2) + ':'
+        + (seconds // 60 % 60).astype(str).str.zfill(2) + ':'
+        + (seconds % 60).astype(str).str.zfill(2)
+    )
+
+def export_parquet():
+    """Appends newly closed logs to the Parquet export. Returns rows written; errors propagate."""
+    conn = db_pool_conn.get()
+    try:
+        return parquet_export.export_closed_logs(conn)
+    finally:
+        db_pool_conn.put(conn)
 
 # --- 5. Helper Function to Create and Send Excel Files ---
 def create_excel_response(df, filename="report.xlsx"):
     """
     Converts a pandas DataFrame to an in-memory Excel file and prepares it for download.
     """
+    return create_workbook_response({'Report': df}, filename)
+
+def create_workbook_response(sheets, filename="report.xlsx"):
+    """
+    Same as create_excel_response, for several DataFrames ({sheet name: df}).
+    """
+    return send_excel_bytes(build_workbook_bytes(sheets), filename)
+
+@metrics.timed('build_workbook_bytes')
+def build_workbook_bytes(sheets):
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Report')
-    output.seek(0)
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+    return output.getvalue()
+
+def send_excel_bytes(data, filename):
+    metrics.record_export(request.endpoint, len(data))
     return send_file(
-        output,
+        io.BytesIO(data),
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         as_attachment=True,
         download_name=filename
     )
 
-# --- 6. API Endpoints for Reports ---
-@app.route('/sty.css')
-def serve_css():
-    return send_from_directory('.', 'sty.css')
+# --- 5a. Report Cache ---
+REPORT_CACHE = ReportCache(int(os.environ.get('LIB_REPORT_CACHE_BYTES', 64 * 1024 * 1024)))
+
+class ReportError(Exception):
+    """Raised by report builders; becomes a JSON error response."""
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@app.errorhandler(ReportError)
+def handle_report_error(e):
+    return jsonify({"error": e.message}), e.status
 
-@app.route('/scr.js')
-def serve_js():
-    return send_from_directory('.', 'scr.js')
+@metrics.timed('get_range_fingerprint')
+def get_range_fingerprint(start_date, end_date):
+    """
+    Cheap summary of the logs in a range: row count, newest log_id and how
+    many are still open. Any entry, exit or auto-exit in the range changes it.
+    """
+    fingerprint = read_parquet(parquet_export.range_fingerprint, start_date, end_date)
+    if fingerprint is not None:
+        return fingerprint
+    where, params = _date_range_clause(start_date, end_date)
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT COUNT(*), COALESCE(MAX(log_id), 0), COALESCE(SUM(exit_date IS NULL), 0)
+                FROM {archive.logs_source(where, start_date)}""",
+            params
+        )
+        fingerprint = tuple(int(v) for v in cursor.fetchone())
+        cursor.close()
+        return fingerprint
+    except mysql.connector.Error as e:
+        log.error("error fingerprinting logs", extra={'fields': {'error': str(e)}})
+        return None
+    finally:
+        db_pool_conn.put(conn)
+
+def cached_report(endpoint, start_date, end_date, build, state=None):
+    """
+    Serves a report workbook from REPORT_CACHE while the logs in its range are
+    unchanged. build() returns (sheets, filename) or raises ReportError.
+    Reports built from derived tables pass state(), a tuple (or None on a
+    database error) that changes whenever those tables do; it becomes part of
+    the fingerprint.
+    """
+    key = (endpoint, start_date, end_date)
+    fingerprint = get_range_fingerprint(start_date, end_date)
+    if fingerprint is not None and state is not None:
+        extra = state()
+        fingerprint = None if extra is None else fingerprint + extra
+    if fingerprint is not None:
+        cached = REPORT_CACHE.get(key, fingerprint)
+        if cached:
+            return send_excel_bytes(*cached)
+    sheets, filename = build()
+    data = build_workbook_bytes(sheets)
+    if fingerprint is not None:
+        REPORT_CACHE.put(key, fingerprint, data, filename)
+    return send_excel_bytes(data, filename)
+
+# --- 5b. Streaming Exports ---
+EXCEL_MAX_ROWS = 1048576
+STREAM_CHUNK_BYTES = 64 * 1024
+
+def _stream_file(path, report):
+    """Sends a temp file in chunks and deletes it once the download ends."""
+    metrics.record_export(report, os.path.getsize(path))
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+def stream_excel_response(row_chunks, filename):
+    """
+    Writes rows with xlsxwriter's constant_memory mode (one row in memory at a
+    time, spilling to a temp file) and streams the finished workbook.
+    Rows past Excel's sheet limit continue on a new sheet.
+    """
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        header = list(REPORT_COLUMNS)
+        sheet, row_num, sheet_count = None, EXCEL_MAX_ROWS, 0
+        for rows in row_chunks:
+            for row in rows:
+                if row_num >= EXCEL_MAX_ROWS:
+                    sheet_count += 1
+                    sheet = workbook.add_worksheet('Report' if sheet_count == 1 else f'Report {sheet_count}')
+                    sheet.write_row(0, 0, header)
+                    row_num = 1
+                sheet.write_row(row_num, 0, row)
+                row_num += 1
+        if sheet is None:
+            workbook.add_worksheet('Report').write_row(0, 0, header)
+        workbook.close()
+    except Exception:
+        os.remove(path)
+        raise
+    return Response(
+        _stream_file(path, request.endpoint),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        headers={'Content-Disposition': f'attachment; filename={filename}',
+                 'Content-Length': str(os.path.getsize(path))}
+    )
+
+def stream_csv_response(row_chunks, filename, gzip_output=False):
+    """Streams rows as CSV (optionally gzip-compressed) while they are read."""
+    report = request.endpoint
+
+    def generate():
+        size = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        compressor = zlib.compressobj(wbits=31) if gzip_output else None
+
+        def flush():
+            data = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            return compressor.compress(data) if compressor else data
+
+        writer.writerow(REPORT_COLUMNS)
+        for rows in row_chunks:
+            writer.writerows(rows)
+            chunk = flush()
+            if chunk:
+                size += len(chunk)
+                yield chunk
+        tail = flush()
+        if compressor:
+            tail += compressor.flush()
+        if tail:
+            size += len(tail)
+            yield tail
+        metrics.record_export(report, size)
+
+    mimetype = 'application/gzip' if gzip_output else 'text/csv'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
+# --- 6. API Endpoints for Reports ---
 # -------------------- DAILY STUDENT COUNT --------------------
 @app.route('/report/daily_student_count', methods=['GET'])
 def daily_student_count():
-    log_df = get_log_data()
-    if log_df.empty:
-        return jsonify({"error": "Could not connect to the database or the log is empty."}), 500
-
     date_str = request.args.get('date')
     if not date_str:
         return jsonify({"error": "A 'date' parameter is required. Format: YYYY-MM-DD"}), 400
@@ -117,25 +522,29 @@ def daily_student_count():
     except ValueError:
         return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD."}), 400
 
-    daily_logs = log_df[log_df['Entry Date'] == target_date.strftime('%d-%m-%Y')]
-    if daily_logs.empty:
-        return jsonify({"error": f"No library entries found for {date_str}."}), 404
-
-    student_count = daily_logs['Registration No'].nunique()
-    report_df = pd.DataFrame({
-        'Date': [target_date.strftime('%d-%m-%Y')],
-        'Unique Student Count': [student_count]
-    })
-    filename = f"daily_student_count_{date_str}.xlsx"
-    return create_excel_response(report_df, filename)
+    def build():
+        # Closed days come from the rollup; today is always counted live
+        student_count = None
+        if target_date < date.today():
+            student_count = read_rollups(_read_rolled_up_unique_visitors, target_date, target_date)
+        if student_count is None:
+            student_count = count_unique_visitors(target_date, target_date)
+        if student_count is None:
+            raise ReportError("Could not connect to the database.", 500)
+        if student_count == 0:
+            raise ReportError(f"No library entries found for {date_str}.", 404)
+
+        report_df = pd.DataFrame({
+            'Date': [target_date.strftime('%d-%m-%Y')],
+            'Unique Student Count': [student_count]
+        })
+        return {'Report': report_df}, f"daily_student_count_{date_str}.xlsx"
+
+    return cached_report('daily_student_count', target_date, target_date, build)
 
 # -------------------- DAILY SUMMARY --------------------
 @app.route('/report/daily_summary', methods=['GET'])
 def daily_summary():
-    log_df = get_log_data()
-    if log_df.empty:
-        return jsonify({"error": "Could not connect to the database or the log is empty."}), 500
-
     date_str = request.args.get('date')
     if not date_str:
         return jsonify({"error": "A 'date' parameter is required. Format: YYYY-MM-DD"}), 400
@@ -145,20 +554,19 @@ def daily_summary():
     except ValueError:
         return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD."}), 400
 
-    daily_summary_df = log_df[log_df['Entry Date'] == target_date.strftime('%d-%m-%Y')].copy()
-    if daily_summary_df.empty:
-        return jsonify({"error": f"No library entries found for {date_str}."}), 404
+    def build():
+        daily_summary_df = get_log_data(target_date, target_date)
+        if daily_summary_df is None:
+            raise ReportError("Could not connect to the database.", 500)
+        if daily_summary_df.empty:
+            raise ReportError(f"No library entries found for {date_str}.", 404)
+        return {'Report': daily_summary_df}, f"daily_summary_{date_str}.xlsx"
 
-    filename = f"daily_summary_{date_str}.xlsx"
-    return create_excel_response(daily_summary_df, filename)
+    return cached_report('daily_summary', target_date, target_date, build)
 
 # -------------------- WEEKLY SUMMARY --------------------
 @app.route('/report/weekly_summary', methods=['GET'])
 def weekly_summary():
-    log_df = get_log_data()
-    if log_df.empty:
-        return jsonify({"error": "Could not connect to the database or the log is empty."}), 500
-        
     date_str = request.args.get('date')
     if not date_str:
         return jsonify({"error": "A 'date' parameter is required. Format: YYYY-MM-DD"}), 400
@@ -171,35 +579,246 @@ def weekly_summary():
     start_of_week = selected_date - timedelta(days=selected_date.weekday())
     end_of_week = start_of_week + timedelta(days=6)
 
-    weekly_mask = (
-        pd.to_datetime(log_df['Entry Date'], format='%d-%m-%Y') >= start_of_week
-    ) & (
-        pd.to_datetime(log_df['Entry Date'], format='%d-%m-%Y') <= end_of_week
-    )
-
-    weekly_summary_df = log_df.loc[weekly_mask].copy()
+    def build():
+        weekly_summary_df = get_log_data(start_of_week.date(), end_of_week.date())
+        if weekly_summary_df is None:
+            raise ReportError("Could not connect to the database.", 500)
+        if weekly_summary_df.empty:
+            raise ReportError(f"No library entries found for the week of {start_of_week.strftime('%Y-%m-%d')}.", 404)
+        filename = f"weekly_report_{start_of_week.strftime('%Y%m%d')}_to_{end_of_week.strftime('%Y%m%d')}.xlsx"
+        return {'Report': weekly_summary_df}, filename
 
-    if weekly_summary_df.empty:
-        return jsonify({"error": f"No library entries found for the week of {start_of_week.strftime('%Y-%m-%d')}."}), 404
-
-    filename = f"weekly_report_{start_of_week.strftime('%Y%m%d')}_to_{end_of_week.strftime('%Y%m%d')}.xlsx"
-    return create_excel_response(weekly_summary_df, filename)
+    return cached_report('weekly_summary', start_of_week.date(), end_of_week.date(), build)
 
 # -------------------- FULL LOG DUMP --------------------
 @app.route('/report/full_log_dump', methods=['GET'])
 def full_log_dump():
-    log_df = get_log_data()
-    if log_df.empty:
+    """
+    Streams every log, newest first. ?format=xlsx (default), csv or csv.gz.
+    Rows are read in chunks from a server-side cursor, never all at once.
+    """
+    export_format = request.args.get('format', 'xlsx').lower()
+    if export_format not in ('xlsx', 'csv', 'csv.gz'):
+        return jsonify({"error": "Invalid format. Use xlsx, csv or csv.gz."}), 400
+
+    try:
+        row_chunks = iter_log_rows(newest_first=True)
+        # Pull the first chunk now so connection errors still become a 500
+        first = next(row_chunks, None)
+    except mysql.connector.Error as e:
+        log.error("error streaming full log dump", extra={'fields': {'error': str(e)}})
+        return jsonify({"error": "Could not connect to the database or the log is empty."}), 500
+    if first is None:
         return jsonify({"error": "Could not connect to the database or the log is empty."}), 500
 
-    full_df = log_df.sort_values(by=['Entry Date', 'Entry Time'], ascending=[False, False]).copy()
-    filename = "full_library_log_dump.xlsx"
-    return create_excel_response(full_df, filename)
+    chunks = _prepend(first, row_chunks)
+    filename = f"full_library_log_dump.{export_format}"
+    if export_format == 'xlsx':
+        return stream_excel_response(chunks, filename)
+    return stream_csv_response(chunks, filename, gzip_output=export_format == 'csv.gz')
+
+# -------------------- RANGE SUMMARY (FROM ROLLUPS) --------------------
+@app.route('/report/range_summary', methods=['GET'])
+def range_summary():
+    """Per-day, per-hour and per-branch/year totals for ?start=..&end=.. from the rollup tables."""
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({"error": "'start' and 'end' parameters are required. Format: YYYY-MM-DD"}), 400
+    if end_date < start_date:
+        return jsonify({"error": "'end' must not be before 'start'."}), 400
+
+    def build():
+        # Today is still changing, so bring it up to date before reading
+        today = date.today()
+        if start_date <= today <= end_date and not refresh_log_rollups(today, today):
+            raise ReportError("Could not connect to the database.", 500)
+
+        daily = read_rollups(rollups.read_daily, start_date, end_date)
+        hourly = read_rollups(rollups.read_hourly, start_date, end_date)
+        breakdown = read_rollups(rollups.read_breakdown, start_date, end_date)
+        if daily is None or hourly is None or breakdown is None:
+            raise ReportError("Could not connect to the database.", 500)
+        if daily.empty:
+            raise ReportError(f"No library entries found between {start_date} and {end_date}.", 404)
+
+        for df in (daily, hourly, breakdown):
+            df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%d-%m-%Y')
+        filename = f"range_summary_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.xlsx"
+        return {'Daily': daily, 'Hourly': hourly, 'By Branch & Year': breakdown}, filename
+
+    return cached_report('range_summary', start_date, end_date, build)
+
+# -------------------- OCCUPANCY ANALYTICS --------------------
+@app.route('/report/occupancy_analytics', methods=['GET'])
+def occupancy_analytics():
+    """Dwell time per visit, peak occupancy per day and 15-minute occupancy for ?start=..&end=.."""
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({"error": "'start' and 'end' parameters are required. Format: YYYY-MM-DD"}), 400
+    if end_date < start_date:
+        return jsonify({"error": "'end' must not be before 'start'."}), 400
+
+    # Open visits last until "now", so a range reaching today is also keyed on the current minute
+    now = datetime.now(occupancy_report.IST).replace(tzinfo=None, second=0, microsecond=0)
+    state = (lambda: (now.isoformat(),)) if end_date >= now.date() else None
+
+    def build():
+        df = get_visit_times(start_date, end_date)
+        if df is None:
+            raise ReportError("Could not connect to the database.", 500)
+        if df.empty:
+            raise ReportError(f"No library entries found between {start_date} and {end_date}.", 404)
+        sheets = occupancy_report.build_occupancy_report(df, start_date, end_date, now)
+        filename = f"occupancy_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.xlsx"
+        return sheets, filename
+
+    return cached_report('occupancy_analytics', start_date, end_date, build, state=state)
+
+# -------------------- ATTENDANCE (FROM BITMAPS) --------------------
+def _attendance_report(endpoint, analyse):
+    """Shared ?start=..&end=.. handling for the reports built from attendance bitmaps."""
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({"error": "'start' and 'end' parameters are required. Format: YYYY-MM-DD"}), 400
+    if end_date < start_date:
+        return jsonify({"error": "'end' must not be before 'start'."}), 400
+
+    def build():
+        # Today is still changing, so bring its bitmap up to date before reading
+        today = date.today()
+        if start_date <= today <= end_date and not refresh_attendance_bitmaps(today, today):
+            raise ReportError("Could not connect to the database.", 500)
+        loaded = read_rollups(_read_attendance, start_date, end_date)
+        if loaded is None:
+            raise ReportError("Could not connect to the database.", 500)
+        days, matrix, people = loaded
+        if not days:
+            raise ReportError(f"No student entries found between {start_date} and {end_date}.", 404)
+        filename = f"{endpoint}_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.xlsx"
+        return analyse(days, matrix, people), filename
+
+    # A bitmap rebuilt after the logs settled (replayed scans, a late refresh) must invalidate too
+    return cached_report(endpoint, start_date, end_date, build,
+                         state=lambda: read_rollups(attendance.range_state, start_date, end_date))
+
+@app.route('/report/visit_frequency', methods=['GET'])
+def visit_frequency():
+    """Days visited, attendance rate and longest/current streak per student for ?start=..&end=.."""
+    return _attendance_report('visit_frequency', attendance.visit_frequency)
+
+@app.route('/report/cohort_attendance', methods=['GET'])
+def cohort_attendance():
+    """Per-day and whole-range attendance per branch/year for ?start=..&end=.."""
+    return _attendance_report('cohort_attendance', attendance.cohort_attendance)
+
+@app.route('/pool-metrics')
+def pool_metrics():
+    return jsonify(db_pool.pool_metrics())
+
+@app.route('/report-cache-metrics')
+def report_cache_metrics():
+    return jsonify(REPORT_CACHE.metrics())
+
+@app.route('/attendance-metrics')
+def attendance_metrics():
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        return jsonify(attendance.read_metrics(conn))
+    except mysql.connector.Error as e:
+        log.error("error reading attendance metrics", extra={'fields': {'error': str(e)}})
+        return jsonify({"error": "Could not connect to the database."}), 500
+    finally:
+        db_pool_conn.put(conn)
+
+@app.route('/parquet-export-status')
+def parquet_export_status():
+    return jsonify(dict(parquet_export.load_state(), enabled=PARQUET_EXPORT_ENABLED, report_source=REPORT_SOURCE))
 
 @app.route('/')
 def Home():
     return render_template('ind.html')
 
-# --- 7. Run the Application ---
+# --- 7. Scheduler and Startup ---
+# Rollups, attendance bitmaps, archiving and the Parquet export are run by
+# whichever admin process holds the lock.
+ROLLUP_REFRESH_MINUTES = 5
+LEADER = LeaderLock(os.environ.get(
+    'LIB_ADMIN_SCHEDULER_LOCK', os.path.join(tempfile.gettempdir(), 'lib_main_admin_scheduler.lock')
+))
+
+def run_rollup_refresh():
+    if not (LEADER.held or LEADER.try_acquire()):
+        return
+    # Both run even if one fails; raising lets timed_job count the failure
+    failed = [name for name, refresh in (('log rollups', refresh_log_rollups),
+                                         ('attendance bitmaps', refresh_attendance_bitmaps)) if not refresh()]
+    if failed:
+        raise RuntimeError(f"Refreshing {' and '.join(failed)} failed.")
+
+def run_log_archive():
+    """Nightly: moves closed logs older than archive.ARCHIVE_AFTER_MONTHS out of `logs`."""
+    if not (LEADER.held or LEADER.try_acquire()):
+        return
+    # Settle days with open logs first; later re-rolls read archived days through logs_source()
+    refresh_log_rollups()
+    conn = db_pool_conn.get()
+    try:
+        cutoff = archive.archive_cutoff()
+        moved = archive.archive_closed_logs(conn, cutoff)
+    finally:
+        db_pool_conn.put(conn)
+    log.info("archived closed logs", extra={'fields': {'moved': moved, 'before': cutoff.isoformat()}})
+
+def run_parquet_export():
+    if LEADER.held or LEADER.try_acquire():
+        written = export_parquet()
+        if written:
+            log.info("parquet export appended logs", extra={'fields': {'rows': written, 'dir': parquet_export.EXPORT_DIR}})
+
+def ensure_report_tables():
+    conn = None
+    try:
+        conn = db_pool_conn.get()
+        # refresh_pending finds open logs through logs.open_reg_no, whichever app starts first
+        log_schema.ensure_open_log_guard(conn)
+        rollups.ensure_rollup_tables(conn)
+        attendance.ensure_attendance_tables(conn)
+        archive.ensure_archive_table(conn)
+    except mysql.connector.Error as e:
+        log.error("error creating report tables", extra={'fields': {'error': str(e)}})
+    finally:
+        db_pool_conn.put(conn)
+
+try:
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(metrics.timed_job('rollup_refresh', run_rollup_refresh), trigger='interval', minutes=ROLLUP_REFRESH_MINUTES, id='rollup_refresh_job')
+    scheduler.add_job(metrics.timed_job('log_archive', run_log_archive), trigger='cron', hour=2, minute=0, id='log_archive_job')
+    if PARQUET_EXPORT_ENABLED:
+        scheduler.add_job(metrics.timed_job('parquet_export', run_parquet_export), trigger='interval', minutes=PARQUET_EXPORT_MINUTES, id='parquet_export_job')
+    else:
+        log.info("parquet export disabled (pyarrow not installed or LIB_PARQUET_EXPORT=0)")
+    scheduler.start()
+    atexit.register(lambda: scheduler.shutdown())
+except Exception as e:
+    log.error("scheduler initialization error", extra={'fields': {'error': str(e)}})
+
+def init_app():
+    ensure_log_indexes()
+    ensure_report_tables()
+    try:
+        run_rollup_refresh()
+    except RuntimeError:
+        pass  # already logged; the scheduled refresh retries
+
+# --- 8. Run the Application ---
+# Development server; use ../serve.py for the multi-worker production mode.
 if __name__ == '__main__':
+    init_app()
     app.run(debug=True, host='0.0.0.0', port=5001)
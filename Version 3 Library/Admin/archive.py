@@ -0,0 +1,83 @@
+"""
+Archive lifecycle for the `logs` table.
+
+`logs` gains a row per visit forever, but the kiosk only ever needs today's
+rows and the open ones. archive_closed_logs() moves closed logs older than
+ARCHIVE_AFTER_MONTHS into `logs_archive` in small primary-key batches, so
+the live table (and every kiosk query against it) stays small. Range
+partitioning was not used because InnoDB requires the partition column in
+every unique key, which the PRIMARY KEY (log_id) and the one-open-log key
+do not include.
+
+Admin reports call logs_source() to get a FROM clause that unions the
+archive in only when the requested range could reach archived days. That
+is decided from today's archive_cutoff(), not from what the archive holds:
+no log on or after the cutoff has been moved, whichever process moved the
+others and however recently, so the answer can't go stale between reading
+the archive and reading the logs.
+"""
+import os
+from datetime import date
+
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('LIB_ARCHIVE_AFTER_MONTHS', 12))
+ARCHIVE_BATCH_SIZE = 1000
+
+# Columns copied to the archive (open_reg_no is generated and always NULL there)
+LOG_COLUMNS = "log_id, full_reg_no, name, branch, year, entry_date, entry_time, exit_date, exit_time, role, reason"
+
+
+def ensure_archive_table(conn):
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS logs_archive LIKE logs")
+    cursor.close()
+
+
+def archive_cutoff(today=None, months=ARCHIVE_AFTER_MONTHS):
+    """First day that stays in `logs`: the same day-of-month `months` ago (clamped to the 28th)."""
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, min(today.day, 28))
+
+
+def archive_closed_logs(conn, cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Moves closed logs with entry_date < cutoff to logs_archive. Returns rows moved."""
+    moved = 0
+    cursor = conn.cursor()
+    try:
+        while True:
+            conn.start_transaction()
+            cursor.execute(
+                """SELECT log_id FROM logs
+                   WHERE entry_date < %s AND exit_date IS NOT NULL
+                   ORDER BY log_id LIMIT %s FOR UPDATE""",
+                (cutoff, batch_size)
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                conn.rollback()
+                break
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"INSERT INTO logs_archive ({LOG_COLUMNS}) SELECT {LOG_COLUMNS} FROM logs WHERE log_id IN ({placeholders})",
+                ids
+            )
+            cursor.execute(f"DELETE FROM logs WHERE log_id IN ({placeholders})", ids)
+            conn.commit()
+            moved += len(ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return moved
+
+
+def logs_source(where, start_date):
+    """
+    FROM clause for report queries. `where` is applied inside each branch so
+    both tables still use their entry_date indexes.
+    """
+    if start_date is not None and start_date >= archive_cutoff():
+        return f"logs {where}"
+    return (f"(SELECT {LOG_COLUMNS} FROM logs {where} "
+            f"UNION ALL SELECT {LOG_COLUMNS} FROM logs_archive {where}) AS logs")
@@ -0,0 +1,277 @@
+"""
+Per-day attendance bitmaps for frequency, streak and cohort reports.
+
+Questions like "how many days did each student come this semester" used
+to need a full scan of the logs plus a groupby. This index answers them
+from one small bitmap per day instead.
+
+Tables:
+  - attendance_ids gives every student who has ever entered a dense
+    integer id, 0, 1, 2, ...
+  - attendance_bitmaps holds one row per day: bit i is set if the student
+    with id i entered that day.
+New ids are handed out in full_reg_no order, so one intake batch sits in
+neighbouring bits. A day for 20,000 students is 2.5 KB.
+
+refresh_pending() is run by the admin scheduler alongside the rollups. It
+rebuilds only the days since the newest bitmap, plus yesterday, because
+scans replayed from the kiosk's offline queue can land there after
+midnight. The first run backfills history in batches, archive included.
+Reports also refresh today's bitmap, possibly from another admin process,
+so every refresh holds the MySQL named lock REFRESH_LOCK. Otherwise two
+refreshes could hand the same new dense ids to different students.
+
+Reports unpack a range of bitmaps into a days x students boolean matrix:
+  - visits per student are column sums;
+  - streaks come from one pass over the days;
+  - cohort figures use the columns of that branch/year.
+Streaks count library days, i.e. days with at least one visitor, so
+Sundays and holidays don't break them.
+"""
+from datetime import date, timedelta
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+
+import archive
+
+BACKFILL_DAYS_PER_BATCH = 31
+REFRESH_LOCK = 'attendance_refresh'
+REFRESH_LOCK_TIMEOUT = 30  # seconds to wait for a refresh running elsewhere
+
+ATTENDANCE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS attendance_ids (
+        dense_id INT PRIMARY KEY,
+        full_reg_no VARCHAR(20) NOT NULL,
+        UNIQUE KEY uq_attendance_ids_reg_no (full_reg_no)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS attendance_bitmaps (
+        day DATE PRIMARY KEY,
+        visitors INT NOT NULL,
+        bitmap MEDIUMBLOB NOT NULL,
+        refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+
+def ensure_attendance_tables(conn):
+    cursor = conn.cursor()
+    for statement in ATTENDANCE_TABLES:
+        cursor.execute(statement)
+    cursor.close()
+
+
+# --- BITMAPS ---
+def encode(ids):
+    """Bitmap bytes with bit `id` set for each id (little-endian bit order within a byte)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    bits = np.zeros(int(ids.max()) + 1 if len(ids) else 0, dtype=bool)
+    bits[ids] = True
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+def decode(bitmaps, width):
+    """Stacks bitmaps (bytes, possibly of different lengths) into a len(bitmaps) x width bool matrix."""
+    nbytes = (width + 7) // 8
+    packed = np.zeros((len(bitmaps), nbytes), dtype=np.uint8)
+    for row, bitmap in enumerate(bitmaps):
+        # Days built before newer ids existed are shorter; the missing bits are 0
+        data = np.frombuffer(bitmap, dtype=np.uint8)[:nbytes]
+        packed[row, :len(data)] = data
+    return np.unpackbits(packed, axis=1, count=width, bitorder='little').astype(bool)
+
+
+# --- REFRESH ---
+def _load_ids(cursor):
+    cursor.execute("SELECT full_reg_no, dense_id FROM attendance_ids")
+    return {str(reg_no): dense_id for reg_no, dense_id in cursor.fetchall()}
+
+
+def refresh_attendance(conn, start, end):
+    """Rebuilds the bitmaps for start..end (inclusive) in one transaction. Returns days written."""
+    where = "WHERE entry_date BETWEEN %(start)s AND %(end)s AND role = 'Student'"
+    cursor = conn.cursor()
+    # Taken before the transaction, so its snapshot includes ids the previous holder committed
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (REFRESH_LOCK, REFRESH_LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise mysql.connector.Error(msg="Timed out waiting for another attendance refresh.")
+    try:
+        conn.start_transaction()
+        cursor.execute(f"SELECT DISTINCT entry_date, full_reg_no FROM {archive.logs_source(where, start)}",
+                       {'start': start, 'end': end})
+        visits = cursor.fetchall()
+        ids = _load_ids(cursor)
+
+        new_reg_nos = sorted({str(reg_no) for _, reg_no in visits} - ids.keys())
+        if new_reg_nos:
+            next_id = max(ids.values(), default=-1) + 1
+            new_ids = [(next_id + i, reg_no) for i, reg_no in enumerate(new_reg_nos)]
+            cursor.executemany("INSERT INTO attendance_ids (dense_id, full_reg_no) VALUES (%s, %s)", new_ids)
+            ids.update((reg_no, dense_id) for dense_id, reg_no in new_ids)
+
+        by_day = {}
+        for day, reg_no in visits:
+            by_day.setdefault(day, []).append(ids[str(reg_no)])
+        cursor.execute("DELETE FROM attendance_bitmaps WHERE day BETWEEN %s AND %s", (start, end))
+        if by_day:
+            cursor.executemany(
+                "INSERT INTO attendance_bitmaps (day, visitors, bitmap) VALUES (%s, %s, %s)",
+                [(day, len(day_ids), encode(day_ids)) for day, day_ids in sorted(by_day.items())]
+            )
+        conn.commit()
+        return len(by_day)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (REFRESH_LOCK,))
+        cursor.fetchone()
+        cursor.close()
+
+
+def refresh_pending(conn, today=None):
+    """
+    Brings the bitmaps up to date. Returns the (start, end) range refreshed,
+    or None when there are no logs at all.
+    """
+    today = today or date.today()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(day) FROM attendance_bitmaps")
+    last_day = cursor.fetchone()[0]
+    if last_day is None:
+        cursor.execute(f"SELECT MIN(entry_date) FROM {archive.logs_source('', None)}")
+        last_day = cursor.fetchone()[0]
+    cursor.close()
+    if last_day is None:
+        return None
+
+    start = min(last_day, today - timedelta(days=1))
+    batch_start = start
+    while batch_start <= today:
+        batch_end = min(batch_start + timedelta(days=BACKFILL_DAYS_PER_BATCH - 1), today)
+        refresh_attendance(conn, batch_start, batch_end)
+        batch_start = batch_end + timedelta(days=1)
+    return start, today
+
+
+# --- READS ---
+def read_matrix(conn, start, end):
+    """(days, days x ids bool matrix) for the bitmaps in start..end, oldest first."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(dense_id) + 1, 0) FROM attendance_ids")
+    width = int(cursor.fetchone()[0])
+    cursor.execute("SELECT day, bitmap FROM attendance_bitmaps WHERE day BETWEEN %s AND %s ORDER BY day",
+                   (start, end))
+    rows = cursor.fetchall()
+    cursor.close()
+    return [day for day, _ in rows], decode([bytes(bitmap) for _, bitmap in rows], width)
+
+
+def read_people(conn):
+    """Dense id -> current name/branch/year, as a DataFrame indexed by dense_id."""
+    return pd.read_sql(
+        """SELECT a.dense_id, a.full_reg_no, s.name,
+                  COALESCE(NULLIF(s.branch, ''), 'N/A') AS branch, COALESCE(CAST(s.year AS CHAR), 'N/A') AS year
+           FROM attendance_ids a LEFT JOIN students s ON s.full_reg_no = a.full_reg_no
+           ORDER BY a.dense_id""",
+        conn
+    ).set_index('dense_id')
+
+
+def range_state(conn, start, end):
+    """
+    (days, newest day, checksum) of the bitmaps in start..end, for report
+    cache fingerprints. The checksum only moves when a bitmap's contents
+    do, so rewriting an unchanged day keeps cached reports valid.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), MAX(day), COALESCE(SUM(CRC32(bitmap)), 0) FROM attendance_bitmaps "
+                   "WHERE day BETWEEN %s AND %s", (start, end))
+    days, last_day, checksum = cursor.fetchone()
+    cursor.close()
+    return int(days), last_day and last_day.isoformat(), int(checksum)
+
+
+def read_metrics(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(bitmap)), 0), MIN(day), MAX(day) FROM attendance_bitmaps")
+    days, total_bytes, first_day, last_day = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM attendance_ids")
+    ids = cursor.fetchone()[0]
+    cursor.close()
+    total_bytes = int(total_bytes)
+    return {'days': days, 'ids': ids, 'bytes': total_bytes, 'avg_bytes_per_day': round(total_bytes / days) if days else 0,
+            'first_day': first_day and first_day.isoformat(), 'last_day': last_day and last_day.isoformat()}
+
+
+# --- REPORTS ---
+def streaks(matrix):
+    """(longest, current) run of consecutive library days per student column."""
+    current = np.zeros(matrix.shape[1], dtype=np.int32)
+    longest = np.zeros(matrix.shape[1], dtype=np.int32)
+    for day in matrix:
+        current = (current + 1) * day
+        np.maximum(longest, current, out=longest)
+    return longest, current
+
+
+def visit_frequency(days, matrix, people):
+    """Per-student days visited, attendance rate and streaks, plus a days-visited distribution."""
+    visited = matrix.sum(axis=0)
+    seen = np.flatnonzero(visited)
+    longest, current = streaks(matrix)
+    first = matrix.argmax(axis=0)
+    last = len(days) - 1 - matrix[::-1].argmax(axis=0)
+    day_labels = np.array([d.strftime('%d-%m-%Y') for d in days], dtype=object)
+
+    info = people.reindex(seen)
+    frequency = pd.DataFrame({
+        'Registration No': info['full_reg_no'].to_numpy(),
+        'Name': info['name'].to_numpy(),
+        'Branch': info['branch'].to_numpy(),
+        'Year': info['year'].to_numpy(),
+        'Days Visited': visited[seen],
+        'Attendance %': (visited[seen] / len(days) * 100).round(1),
+        'Longest Streak': longest[seen],
+        'Current Streak': current[seen],
+        'First Visit': day_labels[first[seen]],
+        'Last Visit': day_labels[last[seen]],
+    }).sort_values(['Days Visited', 'Registration No'], ascending=[False, True])
+
+    counts = np.bincount(visited[seen], minlength=len(days) + 1)[1:]
+    distribution = pd.DataFrame({'Days Visited': np.arange(1, len(days) + 1), 'Students': counts})
+    distribution = distribution[distribution['Students'] > 0]
+    return {'Visit Frequency': frequency, 'Distribution': distribution,
+            'Library Days': pd.DataFrame({'Library Days In Range': [len(days)]})}
+
+
+def cohort_attendance(days, matrix, people):
+    """Per-day and whole-range attendance for each branch/year cohort."""
+    cohorts = people.reindex(np.arange(matrix.shape[1])).fillna({'branch': 'N/A', 'year': 'N/A'})
+    day_labels = [d.strftime('%d-%m-%Y') for d in days]
+    daily, summary = [], []
+    for (branch, year), members in sorted(cohorts.groupby(['branch', 'year']).groups.items()):
+        present = matrix[:, np.asarray(members, dtype=np.int64)]   # days x this cohort's ids
+        visits = present.sum(axis=0)
+        if not visits.any():
+            continue
+        per_day = present.sum(axis=1)
+        daily += [(i, day_labels[i], branch, year, int(n)) for i, n in enumerate(per_day) if n]
+        summary.append({
+            'Branch': branch, 'Year': year,
+            'Students Ever Seen': len(members),
+            'Distinct Visitors': int((visits > 0).sum()),
+            'Avg Daily Visitors': round(float(per_day.mean()), 1),
+            'Peak Daily Visitors': int(per_day.max()),
+            # Came on at least half of the library days in the range
+            'Regular Visitors': int((visits * 2 >= len(days)).sum()),
+        })
+    return {'Cohort Summary': pd.DataFrame(summary),
+            'Cohort Daily': pd.DataFrame([row[1:] for row in sorted(daily)],
+                                         columns=['Date', 'Branch', 'Year', 'Visitors'])}
@@ -1,8 +1,22 @@
+import csv
+import io
 import os
+import re
 import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import mysql.connector as mysql
-from flask import Flask, request, render_template, flash, redirect, url_for
+from flask import Flask, request, render_template, flash, redirect, url_for, jsonify, Response
+from werkzeug.utils import secure_filename
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+import metrics
+
+from import_jobs import JobManager
+import import_readers
 
 # --- Database and Helper Functions (No changes needed here) ---
 
@@ -10,7 +24,7 @@ MYSQL_HOST = "localhost"
 MYSQL_PORT = 3306
 MYSQL_USER = "root"
 MYSQL_PASSWORD = ""  # <-- Fill with your MySQL root password if set
-MYSQL_DB = "lib_main"
+MYSQL_DB = os.environ.get("LIB_DB_NAME", "lib_main")  # bench.py points this at its own database
 
 EMAIL_DOMAIN = "@poornima.edu.in"
 
@@ -32,86 +46,327 @@ def safe_str(val):
         return ""
     return str(val).strip()
 
+DB_POOL = db_pool.get_pool({
+    'host': MYSQL_HOST,
+    'port': MYSQL_PORT,
+    'user': MYSQL_USER,
+    'password': MYSQL_PASSWORD,
+    'database': MYSQL_DB
+}, name='import')
+
 def get_connection():
+    # Pooled connections already run with autocommit on
     try:
-        conn = mysql.connect(
-            host=MYSQL_HOST,
-            port=MYSQL_PORT,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DB
-        )
-        conn.autocommit = True
-        return conn
+        return DB_POOL.get()
     except mysql.Error as e:
-        print(f"[FATAL] MySQL connection failed: {e}")
+        log.error("mysql connection failed", extra={'fields': {'error': str(e)}})
         return None
 
+def release_connection(conn):
+    DB_POOL.put(conn)
+
 def ensure_students_table(cursor):
     students_table = """
-    CREATE TABLE IF NOT EXISTS Students (
+    CREATE TABLE IF NOT EXISTS students (
         full_reg_no VARCHAR(20) PRIMARY KEY, 
         name VARCHAR(100),
         branch VARCHAR(50),
         year INT CHECK (year BETWEEN 1 AND 5),
-        email VARCHAR(255) CHECK(email LIKE '%@poornima.edu.in')
+        email VARCHAR(255) CHECK(email LIKE '%@poornima.edu.in'),
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_students_updated_at (updated_at)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
     try:
         cursor.execute(students_table)
-    except mysql.Error as e:
-        print(f"[ERROR] Creating Students table: {e}")
+    except mysql.Error:
+        log.exception("error creating students table")
+    ensure_students_updated_at(cursor)
 
-def import_students(cursor, df):
-    inserted = updated = skipped = 0
-    errors = []
-    insert_sql = """
-    INSERT INTO Students (full_reg_no, name, branch, year, email)
-    VALUES (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        name = VALUES(name),
-        branch = VALUES(branch),
-        year = VALUES(year),
-        email = VALUES(email);
+def ensure_students_updated_at(cursor):
+    # The kiosk's directory cache refreshes incrementally from this column,
+    # and every upsert sets it, so each imported row becomes visible to the gate.
+    try:
+        cursor.execute("""SELECT COUNT(*) FROM information_schema.COLUMNS
+                          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'students'
+                          AND COLUMN_NAME = 'updated_at'""")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("""ALTER TABLE students
+                              ADD COLUMN updated_at TIMESTAMP NOT NULL
+                                  DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                              ADD KEY idx_students_updated_at (updated_at)""")
+    except mysql.Error:
+        log.exception("error adding updated_at to students table")
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Upsert columns per table; the first one is the primary key
+STUDENT_UPSERT_COLUMNS = ("full_reg_no", "name", "branch", "year", "email")
+FACULTY_UPSERT_COLUMNS = ("full_reg_no", "name", "branch", "email")
+
+def ensure_faculty_table(cursor):
+    # The kiosk looks faculty up by their 4-digit code (see find_faculty in students.py)
+    faculty_table = """
+    CREATE TABLE IF NOT EXISTS faculty (
+        full_reg_no INT PRIMARY KEY,
+        name VARCHAR(100),
+        branch VARCHAR(50),
+        email VARCHAR(255),
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
-    for idx, row in df.iterrows():
-        full_reg_no = safe_str(row.get("full_reg_no"))
-        name = safe_str(row.get("name"))
-        branch = safe_str(row.get("branch"))
-        year = safe_int(row.get("year"))
-        email = safe_str(row.get("email"))
-
-        if not full_reg_no:
-            skipped += 1
-            errors.append(f"Row {idx+2}: 'full_reg_no' is missing.")
-            continue
-        
-        if year is None or not (1 <= year <= 5):
-            skipped += 1
-            errors.append(f"Row {idx+2}: 'year' must be between 1 and 5.")
-            continue
-        
-        if not is_valid_email(email):
-            skipped += 1
-            errors.append(f"Row {idx+2}: Email must end with {EMAIL_DOMAIN}.")
-            continue
-        
+    try:
+        cursor.execute(faculty_table)
+        cursor.execute("""SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'faculty'""")
+        existing = {row[0].lower() for row in cursor.fetchall()}
+        for column, definition in (("branch", "VARCHAR(50)"), ("email", "VARCHAR(255)"),
+                                   ("updated_at", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP "
+                                                  "ON UPDATE CURRENT_TIMESTAMP")):
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE faculty ADD COLUMN {column} {definition}")
+    except mysql.Error:
+        log.exception("error creating faculty table")
+
+def _clean_str(df, column):
+    """Vectorized safe_str: missing column or NaN -> '', otherwise stripped text."""
+    if column not in df:
+        return pd.Series("", index=df.index, dtype=object)
+    series = df[column]
+    return series.where(series.notna(), "").astype(str).str.strip()
+
+@metrics.timed('validate_students')
+def validate_students(df):
+    """
+    Validates the whole sheet at once. Returns (valid_df, errors, skipped)
+    where errors keeps the per-row messages (spreadsheet row numbers) and
+    each invalid row reports only its first failing rule, as before.
+    """
+    clean = pd.DataFrame({
+        "full_reg_no": _clean_str(df, "full_reg_no"),
+        "name": _clean_str(df, "name"),
+        "branch": _clean_str(df, "branch"),
+        "email": _clean_str(df, "email"),
+    }, index=df.index)
+    clean["year"] = pd.to_numeric(_clean_str(df, "year").str.split(".").str[0], errors="coerce")
+
+    missing_reg = clean["full_reg_no"] == ""
+    bad_year = ~missing_reg & ~clean["year"].between(1, 5)
+    bad_email = ~missing_reg & ~bad_year & ~clean["email"].str.lower().str.endswith(EMAIL_DOMAIN)
+
+    messages = pd.Series(None, index=df.index, dtype=object)
+    messages[bad_email] = f"Email must end with {EMAIL_DOMAIN}."
+    messages[bad_year] = "'year' must be between 1 and 5."
+    messages[missing_reg] = "'full_reg_no' is missing."
+    invalid = messages.notna()
+
+    errors = [f"Row {idx+2}: {msg}" for idx, msg in messages[invalid].items()]
+    valid = clean.loc[~invalid, list(STUDENT_UPSERT_COLUMNS)]
+    valid["year"] = valid["year"].astype(int)
+    return valid, errors, int(invalid.sum())
+
+@metrics.timed('validate_faculty')
+def validate_faculty(df):
+    """Same contract as validate_students, for the faculty sheet."""
+    clean = pd.DataFrame({
+        "full_reg_no": _clean_str(df, "full_reg_no").str.split(".").str[0],
+        "name": _clean_str(df, "name"),
+        "branch": _clean_str(df, "branch"),
+        "email": _clean_str(df, "email"),
+    }, index=df.index)
+
+    missing_reg = clean["full_reg_no"] == ""
+    bad_reg = ~missing_reg & ~clean["full_reg_no"].str.fullmatch(r"\d{4}")
+    missing_name = ~missing_reg & ~bad_reg & (clean["name"] == "")
+    bad_email = (~missing_reg & ~bad_reg & ~missing_name & (clean["email"] != "")
+                 & ~clean["email"].str.lower().str.endswith(EMAIL_DOMAIN))
+
+    messages = pd.Series(None, index=df.index, dtype=object)
+    messages[bad_email] = f"Email must end with {EMAIL_DOMAIN}."
+    messages[missing_name] = "'name' is missing."
+    messages[bad_reg] = "'full_reg_no' must be a 4-digit faculty code."
+    messages[missing_reg] = "'full_reg_no' is missing."
+    invalid = messages.notna()
+
+    errors = [f"Faculty row {idx+2}: {msg}" for idx, msg in messages[invalid].items()]
+    valid = clean.loc[~invalid, list(FACULTY_UPSERT_COLUMNS)]
+    valid["full_reg_no"] = valid["full_reg_no"].astype(int)
+    valid["email"] = valid["email"].where(valid["email"] != "")  # blank -> NULL
+    return valid, errors, int(invalid.sum())
+
+# sheet -> (table, upsert columns, validator, error row label)
+SHEET_SPECS = {
+    "students": ("students", STUDENT_UPSERT_COLUMNS, validate_students, "Row"),
+    "faculty": ("faculty", FACULTY_UPSERT_COLUMNS, validate_faculty, "Faculty row"),
+}
+
+def _upsert_chunk(conn, table, columns, chunk, seen):
+    """
+    Upserts one chunk in a single transaction with one multi-row statement.
+    Existing keys are read first (inside the same transaction) so inserted and
+    updated counts are exact; `seen` carries keys from earlier chunks so a
+    reg_no repeated in the sheet counts as an update, like the old per-row loop.
+    """
+    keys = list(chunk["full_reg_no"])
+    rows = [tuple(None if pd.isna(v) else int(v) if col == "year" else v for col, v in zip(columns, row))
+            for row in chunk[list(columns)].itertuples(index=False, name=None)]
+    # updated_at is set even when nothing else changed, so the kiosk's directory re-pulls every imported row
+    updates = ", ".join([f"{col} = VALUES({col})" for col in columns[1:]] + ["updated_at = CURRENT_TIMESTAMP"])
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        placeholders = ", ".join(["%s"] * len(set(keys)))
+        cursor.execute(f"SELECT full_reg_no FROM {table} WHERE full_reg_no IN ({placeholders}) FOR UPDATE",
+                       tuple(set(keys)))
+        existing = {row[0] for row in cursor.fetchall()}
+        row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        values_sql = ", ".join([row_sql] * len(rows))
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values_sql} ON DUPLICATE KEY UPDATE {updates}",
+            tuple(value for row in rows for value in row)
+        )
+        conn.commit()
+    except mysql.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    inserted = updated = 0
+    for key in keys:
+        if key in existing or key in seen:
+            updated += 1
+        else:
+            inserted += 1
+        seen.add(key)
+    return inserted, updated
+
+def _upsert_one_by_one(conn, table, columns, chunk, seen, errors, row_label):
+    """Fallback for a chunk the database rejected, to pinpoint the bad rows."""
+    inserted = updated = skipped = 0
+    for idx in chunk.index:
         try:
-            cursor.execute(insert_sql, (full_reg_no, name, branch, year, email))
-            if cursor.rowcount == 1:
-                inserted += 1
-            else:
-                updated += 1
+            i, u = _upsert_chunk(conn, table, columns, chunk.loc[[idx]], seen)
+            inserted += i
+            updated += u
         except mysql.Error as e:
             skipped += 1
-            errors.append(f"Row {idx+2}: Database error -> {e}")
-    
-    return {"inserted": inserted, "updated": updated, "skipped": skipped, "errors": errors}
+            errors.append(f"{row_label} {idx+2}: Database error -> {e}")
+    return inserted, updated, skipped
+
+def _error_row(message):
+    return int(re.match(r"(?:Faculty row|Row) (\d+):", message).group(1))
+
+def _as_chunks(data, chunk_size):
+    if isinstance(data, pd.DataFrame):
+        return (data.iloc[start:start + chunk_size] for start in range(0, len(data), chunk_size))
+    return data
+
+def import_sheet(conn, sheet, chunks, progress=None, on_errors=None):
+    """
+    Validates and upserts a sheet chunk by chunk, so only one chunk is in
+    memory at a time. `progress`, if given, is called after every chunk
+    with the running totals; `on_errors`, if given, with that chunk's
+    error messages, so a running job can show the errors found so far.
+    """
+    table, columns, validate, row_label = SHEET_SPECS[sheet]
+    totals = {"rows_processed": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    errors = []
+    seen = set()
+    for df in chunks:
+        valid, chunk_errors, skipped = validate(df)
+        inserted = updated = 0
+        if len(valid):
+            try:
+                inserted, updated = _upsert_chunk(conn, table, columns, valid, seen)
+            except mysql.Error as e:
+                log.warning("import chunk failed, retrying row by row",
+                            extra={'fields': {'sheet': sheet, 'first_row': int(valid.index[0]) + 2, 'error': str(e)}})
+                inserted, updated, s = _upsert_one_by_one(conn, table, columns, valid, seen, chunk_errors, row_label)
+                skipped += s
+        chunk_errors.sort(key=_error_row)
+        errors.extend(chunk_errors)
+        if on_errors and chunk_errors:
+            on_errors(chunk_errors)
+        totals["rows_processed"] += len(df)
+        totals["inserted"] += inserted
+        totals["updated"] += updated
+        totals["skipped"] += skipped
+        if progress:
+            progress(**totals)
+
+    errors.sort(key=_error_row)
+    return {"inserted": totals["inserted"], "updated": totals["updated"], "skipped": totals["skipped"],
+            "errors": errors}
+
+@metrics.timed('import_students')
+def import_students(conn, data, chunk_size=IMPORT_CHUNK_SIZE, progress=None, on_errors=None):
+    """Imports a students DataFrame or an iterable of DataFrame chunks."""
+    return import_sheet(conn, "students", _as_chunks(data, chunk_size), progress, on_errors)
+
+@metrics.timed('import_faculty')
+def import_faculty(conn, data, chunk_size=IMPORT_CHUNK_SIZE, progress=None, on_errors=None):
+    return import_sheet(conn, "faculty", _as_chunks(data, chunk_size), progress, on_errors)
+
+# --- Background Import Jobs ---
+
+IMPORT_JOBS = JobManager()
+SHEET_IMPORTERS = {"students": (ensure_students_table, import_students),
+                   "faculty": (ensure_faculty_table, import_faculty)}
+
+def _combined_progress(job, sheets):
+    """Per-sheet progress callbacks that report the sum over all sheets into job."""
+    lock = threading.Lock()
+    per_sheet = {sheet: {} for sheet in sheets}
+
+    def for_sheet(sheet):
+        def report(**totals):
+            with lock:
+                per_sheet[sheet] = totals
+                job.update(**{field: sum(t.get(field, 0) for t in per_sheet.values())
+                              for field in ("rows_processed", "inserted", "updated", "skipped")})
+        return report
+    return for_sheet
+
+def _import_sheet_file(filepath, sheet, progress, on_errors):
+    """Streams one sheet of the upload into its table on its own pooled connection."""
+    ensure_table, importer = SHEET_IMPORTERS[sheet]
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed.")
+    cursor = conn.cursor()
+    try:
+        ensure_table(cursor)
+        chunks = import_readers.prefetch(import_readers.iter_chunks(filepath, sheet, IMPORT_CHUNK_SIZE))
+        return importer(conn, chunks, progress=progress, on_errors=on_errors)
+    finally:
+        cursor.close()
+        release_connection(conn)
+
+def run_import_job(job, filepath):
+    """Imports the students and faculty sheets of one upload concurrently, reporting into job."""
+    try:
+        sheets = import_readers.sheet_names(filepath)
+        if not sheets:
+            raise ValueError("No 'students' or 'faculty' sheet found in the Excel file.")
+        job.update(rows_total=sum(import_readers.count_rows(filepath, sheet) or 0 for sheet in sheets))
+        progress = _combined_progress(job, sheets)
+        with ThreadPoolExecutor(max_workers=len(sheets), thread_name_prefix='import-sheet') as pool:
+            # Errors go into the job chunk by chunk, so the status endpoint shows them while the import runs
+            futures = {sheet: pool.submit(_import_sheet_file, filepath, sheet, progress(sheet), job.add_errors)
+                       for sheet in sheets}
+            results = {sheet: future.result() for sheet, future in futures.items()}
+        job.update(message="Import complete! " + "; ".join(
+            f"{sheet.title()} - Inserted: {r['inserted']}, Updated: {r['updated']}, Skipped: {r['skipped']}"
+            for sheet, r in results.items()))
+    finally:
+        os.remove(filepath) # Clean up the uploaded file
 
 # --- Flask Application ---
 
 # Tell Flask to look for HTML files in the current directory '.'
 app = Flask(__name__, template_folder='.')
+log = metrics.install(app, 'import')
 app.secret_key = "supersecretkey"
 app.config['UPLOAD_FOLDER'] = 'uploads'
 
@@ -133,46 +388,49 @@ def import_page():
             flash('No file selected', 'danger')
             return redirect(request.url)
         
-        if file and file.filename.endswith('.xlsx'):
+        file_format = import_readers.file_format(file.filename)
+        if file and file_format:
             # Ensure the uploads directory exists
             if not os.path.exists(app.config['UPLOAD_FOLDER']):
                 os.makedirs(app.config['UPLOAD_FOLDER'])
-            
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+
+            # Unique name so concurrent uploads of the same file don't collide
+            filename = secure_filename(file.filename) or f'upload{file_format}'
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
             file.save(filepath)
-            
-            conn = get_connection()
-            if not conn:
-                flash('Database connection failed.', 'danger')
-                return render_template('import.html')
-            
-            cursor = conn.cursor()
-            ensure_students_table(cursor)
-            
-            try:
-                xl = pd.ExcelFile(filepath)
-                if "students" in xl.sheet_names:
-                    students_df = xl.parse("students")
-                    result = import_students(cursor, students_df)
-                    flash(f"Import complete! Inserted: {result['inserted']}, Updated: {result['updated']}, Skipped: {result['skipped']}", 'success')
-                    if result['errors']:
-                        for error in result['errors']:
-                            flash(error, 'warning')
-                else:
-                    flash("'students' sheet not found in the Excel file.", 'danger')
-            except Exception as e:
-                flash(f"An error occurred: {e}", 'danger')
-            finally:
-                cursor.close()
-                conn.close()
-                os.remove(filepath) # Clean up the uploaded file
+
+            job = IMPORT_JOBS.submit(file.filename, run_import_job, filepath)
+            flash(f"Import started for {file.filename}.", 'info')
+            return redirect(url_for('import_page', job=job.id))
         else:
-            flash('Invalid file type. Please upload a .xlsx file.', 'danger')
+            flash('Invalid file type. Please upload a .xlsx, .csv or .tsv file.', 'danger')
 
         return redirect(url_for('import_page'))
 
-    # For a GET request, just display the page
-    return render_template('import.html')
+    # For a GET request, just display the page (with the job being tracked, if any)
+    return render_template('import.html', job_id=request.args.get('job', ''))
+
+@app.route('/import/jobs/<job_id>')
+def import_job_status(job_id):
+    job = IMPORT_JOBS.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown import job."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/import/jobs/<job_id>/errors.csv')
+def import_job_errors(job_id):
+    job = IMPORT_JOBS.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown import job."}), 404
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["sheet", "row", "error"])
+    for error in list(job.errors):
+        label, _, message = error.partition(": ")
+        writer.writerow(["faculty" if label.startswith("Faculty") else "students", label.split()[-1], message])
+    return Response(output.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename=import_errors_{job_id}.csv'})
 
+# Development server; use ../serve.py for the multi-worker production mode.
 if __name__ == '__main__':
     app.run(debug=True)
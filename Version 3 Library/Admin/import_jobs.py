@@ -0,0 +1,107 @@
+"""
+Background runner for student imports.
+
+The /import POST used to parse and write the whole workbook inside the
+request thread. It now saves the upload and hands it to a JobManager,
+which runs it on a small worker pool and keeps progress, counts and the
+full error list per job ID for the status and error-report endpoints.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+log = metrics.get_logger('import.jobs')
+
+MAX_WORKERS = 2
+MAX_FINISHED_JOBS = 50
+
+
+class ImportJob:
+    def __init__(self, filename):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = 'queued'     # queued -> running -> done | failed
+        self.message = ''
+        self.rows_total = 0
+        self.rows_processed = 0
+        self.inserted = self.updated = self.skipped = 0
+        self.errors = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def add_errors(self, errors):
+        with self._lock:
+            self.errors.extend(errors)
+
+    def throughput(self):
+        """Rows per second since the job started."""
+        if not self.started_at:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0.0
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'filename': self.filename,
+                'status': self.status,
+                'message': self.message,
+                'rows_total': self.rows_total,
+                'rows_processed': self.rows_processed,
+                'inserted': self.inserted,
+                'updated': self.updated,
+                'skipped': self.skipped,
+                'error_count': len(self.errors),
+                'recent_errors': self.errors[-5:],
+                'rows_per_second': self.throughput(),
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, filename, func, *args):
+        """Queues func(job, *args) and returns the new job."""
+        job = ImportJob(filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def _run(self, job, func, args):
+        job.update(status='running', started_at=time.time())
+        try:
+            func(job, *args)
+            job.update(status='done')
+        except Exception as e:
+            log.exception("import job failed", extra={'fields': {'job_id': job.id}})
+            job.update(status='failed', message=str(e))
+        finally:
+            job.update(finished_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.status in ('done', 'failed')]
+        finished.sort(key=lambda job: job.created_at)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
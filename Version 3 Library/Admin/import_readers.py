@@ -0,0 +1,145 @@
+"""
+Streaming readers for roster uploads.
+
+pd.ExcelFile(...).parse() loads a whole sheet through openpyxl's full mode
+before the first row can be validated. These readers yield DataFrames of
+at most `chunk_size` rows instead, so memory stays bounded by the chunk
+size whatever the file size:
+  - .xlsx: openpyxl read-only mode, iterating row values;
+  - .csv / .tsv: pandas' chunked reader.
+Chunk indexes are 0-based data-row positions (header excluded), so
+"Row {idx+2}" keeps pointing at the spreadsheet row, as before.
+
+An .xlsx upload can carry a `students` and a `faculty` sheet. A CSV/TSV
+file holds one table; it is treated as faculty when its file name
+contains "faculty" and as students otherwise.
+"""
+import os
+import queue
+import threading
+
+import pandas as pd
+from openpyxl import load_workbook
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.csv', '.tsv')
+SHEETS = ('students', 'faculty')
+
+
+def file_format(filename):
+    ext = os.path.splitext(filename.lower())[1]
+    return ext if ext in SUPPORTED_EXTENSIONS else None
+
+
+def _delimited_sheet(filepath):
+    # Uploads are saved as "<uuid>_<original name>"; only the original name matters
+    return 'faculty' if 'faculty' in os.path.basename(filepath).lower() else 'students'
+
+
+def sheet_names(filepath):
+    """The importable sheets present in the file, in SHEETS order."""
+    if file_format(filepath) == '.xlsx':
+        workbook = load_workbook(filepath, read_only=True)
+        try:
+            present = {name.strip().lower() for name in workbook.sheetnames}
+        finally:
+            workbook.close()
+        return [sheet for sheet in SHEETS if sheet in present]
+    return [_delimited_sheet(filepath)]
+
+
+def count_rows(filepath, sheet):
+    """Data rows in a sheet, cheaply: the xlsx dimension, or a newline count. None if unknown."""
+    if file_format(filepath) == '.xlsx':
+        workbook = load_workbook(filepath, read_only=True)
+        try:
+            max_row = _worksheet(workbook, sheet).max_row
+        finally:
+            workbook.close()
+        return max(max_row - 1, 0) if max_row else None
+    lines = 0
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            lines += block.count(b'\n')
+    return max(lines - 1, 0)
+
+
+def _worksheet(workbook, sheet):
+    for name in workbook.sheetnames:
+        if name.strip().lower() == sheet:
+            return workbook[name]
+    raise ValueError(f"'{sheet}' sheet not found in the Excel file.")
+
+
+def iter_chunks(filepath, sheet, chunk_size):
+    """Yields DataFrames of up to chunk_size rows with string column names."""
+    if file_format(filepath) == '.xlsx':
+        yield from _iter_xlsx(filepath, sheet, chunk_size)
+    else:
+        sep = '\t' if file_format(filepath) == '.tsv' else ','
+        reader = pd.read_csv(filepath, sep=sep, dtype=str, chunksize=chunk_size,
+                             skip_blank_lines=True, encoding='utf-8-sig')
+        for chunk in reader:
+            chunk.columns = [str(col).strip() for col in chunk.columns]
+            yield chunk
+
+
+def _iter_xlsx(filepath, sheet, chunk_size):
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = _worksheet(workbook, sheet).iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col).strip() if col is not None else f"column_{i}" for i, col in enumerate(header)]
+        batch, positions = [], []
+        for position, row in enumerate(rows):
+            if all(value is None for value in row):
+                continue  # blank or formatted-but-empty rows
+            batch.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+            positions.append(position)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns, index=positions)
+                batch, positions = [], []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=positions)
+    finally:
+        workbook.close()
+
+
+_DONE = object()
+
+
+def prefetch(iterable, depth=2):
+    """
+    Iterates `iterable` on a background thread, at most `depth` items ahead,
+    so parsing the next chunk overlaps with writing the current one.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        items.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            items.put(_DONE)
+        except Exception as e:
+            items.put(e)
+
+    threading.Thread(target=produce, daemon=True, name='import-reader').start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,117 @@
+"""
+Dwell-time and occupancy-over-time analytics for a date range.
+
+Everything is computed with array operations over the visits fetched for
+the range (no per-row Python loops):
+  - dwell time per visit is exit minus entry;
+  - peak concurrent occupancy per day comes from one sweep over the merged,
+    sorted entry (+1) and exit (-1) events and a cumulative sum;
+  - occupancy at 15-minute resolution is, for each slot, the number of
+    entries at or before it minus the exits at or before it, found with
+    binary search on the sorted entry and exit times.
+Open visits are treated as lasting until `now` (today) or the end of their day.
+The kiosk writes logs in IST wall-clock time, so `now` defaults to the
+current IST time too, whatever the admin server's own timezone is.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+
+SLOT_MINUTES = 15
+OPEN_HOUR = 7
+CLOSE_HOUR = 20
+IST = pytz.timezone('Asia/Kolkata')  # same zone students.py stamps logs in
+
+
+def load_visits(df, now=None):
+    """
+    Adds entry_ts, exit_ts and dwell_minutes to raw log rows
+    (entry_date, entry_time, exit_date, exit_time as returned by MySQL).
+    """
+    # Naive, like the entry/exit columns it is compared with
+    now = now or datetime.now(IST).replace(tzinfo=None)
+    visits = df.copy()
+    visits['entry_ts'] = pd.to_datetime(visits['entry_date']) + pd.to_timedelta(visits['entry_time'])
+    exit_ts = pd.to_datetime(visits['exit_date'], errors='coerce') + pd.to_timedelta(visits['exit_time'], errors='coerce')
+    day_end = visits['entry_ts'].dt.normalize() + pd.Timedelta(hours=23, minutes=59, seconds=59)
+    visits['still_inside'] = exit_ts.isna()
+    visits['exit_ts'] = exit_ts.fillna(day_end.clip(upper=pd.Timestamp(now)))
+    # Guard against bad rows (exit before entry) so they count as zero-length visits
+    visits['exit_ts'] = visits[['entry_ts', 'exit_ts']].max(axis=1)
+    visits['dwell_minutes'] = ((visits['exit_ts'] - visits['entry_ts']).dt.total_seconds() / 60).round(1)
+    return visits
+
+
+def daily_peaks(visits):
+    """Peak concurrent occupancy per day, with when it was first reached."""
+    n = len(visits)
+    times = np.concatenate([visits['entry_ts'].to_numpy(), visits['exit_ts'].to_numpy()])
+    deltas = np.concatenate([np.ones(n, dtype=np.int64), -np.ones(n, dtype=np.int64)])
+    # Sort by time; at equal times process exits (-1) before entries (+1)
+    order = np.lexsort((deltas, times))
+    times, deltas = times[order], deltas[order]
+    occupancy = np.cumsum(deltas)
+
+    events = pd.DataFrame({'time': times, 'occupancy': occupancy})
+    events = events[deltas == 1]  # peaks are only reached on an entry
+    events['day'] = events['time'].dt.normalize()
+    peak_idx = events.groupby('day')['occupancy'].idxmax()
+    peaks = events.loc[peak_idx, ['day', 'occupancy', 'time']].set_index('day')
+
+    per_day = visits.assign(day=visits['entry_ts'].dt.normalize()).groupby('day').agg(
+        visits=('entry_ts', 'size'),
+        unique_visitors=('full_reg_no', 'nunique'),
+        avg_dwell_minutes=('dwell_minutes', 'mean'),
+        median_dwell_minutes=('dwell_minutes', 'median'),
+    )
+    result = per_day.join(peaks).reset_index()
+    return pd.DataFrame({
+        'Date': result['day'].dt.strftime('%d-%m-%Y'),
+        'Visits': result['visits'],
+        'Unique Visitors': result['unique_visitors'],
+        'Peak Occupancy': result['occupancy'],
+        'Peak Time': result['time'].dt.strftime('%H:%M:%S'),
+        'Avg Dwell (min)': result['avg_dwell_minutes'].round(1),
+        'Median Dwell (min)': result['median_dwell_minutes'].round(1),
+    })
+
+
+def occupancy_slots(visits, start_date, end_date):
+    """Occupancy at every SLOT_MINUTES mark within opening hours, one column per day."""
+    days = pd.date_range(start_date, end_date, freq='D')
+    offsets = pd.timedelta_range(timedelta(hours=OPEN_HOUR), timedelta(hours=CLOSE_HOUR), freq=f'{SLOT_MINUTES}min')
+    slots = (days.values[:, None] + offsets.values[None, :]).ravel()
+
+    entries = np.sort(visits['entry_ts'].to_numpy())
+    exits = np.sort(visits['exit_ts'].to_numpy())
+    inside = np.searchsorted(entries, slots, side='right') - np.searchsorted(exits, slots, side='right')
+
+    grid = pd.DataFrame(inside.reshape(len(days), len(offsets)).T,
+                        columns=days.strftime('%d-%m-%Y'))
+    base = datetime.combine(start_date, time())
+    grid.insert(0, 'Time', [(base + offset).strftime('%H:%M') for offset in offsets.to_pytimedelta()])
+    return grid
+
+
+def visit_sheet(visits):
+    return pd.DataFrame({
+        'Registration No': visits['full_reg_no'],
+        'Name': visits['name'],
+        'Branch': visits['branch'],
+        'Year': visits['year'],
+        'Entry': visits['entry_ts'].dt.strftime('%d-%m-%Y %H:%M:%S'),
+        'Exit': np.where(visits['still_inside'], 'Still Inside', visits['exit_ts'].dt.strftime('%d-%m-%Y %H:%M:%S')),
+        'Dwell (min)': visits['dwell_minutes'],
+    })
+
+
+def build_occupancy_report(df, start_date, end_date, now=None):
+    """Returns {sheet name: DataFrame} for the occupancy analytics workbook."""
+    visits = load_visits(df, now).sort_values('entry_ts', kind='stable')
+    return {
+        'Daily Peaks': daily_peaks(visits),
+        f'Occupancy ({SLOT_MINUTES} min)': occupancy_slots(visits, start_date, end_date),
+        'Visits': visit_sheet(visits),
+    }
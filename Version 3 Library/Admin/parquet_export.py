@@ -0,0 +1,225 @@
+"""
+Incremental Parquet export of closed logs for analytics.
+
+export_closed_logs() appends every log closed since the previous run to
+date-partitioned Parquet files:
+
+    <LIB_PARQUET_DIR>/entry_date=2026-10-01/part-00000042-0000-0.parquet
+
+The dates and times are stored as Parquet's date32 and time32 types, not
+as strings. A closed log never changes again, so each log is written
+exactly once. The high-water mark in `_export_state.json` tracks two
+things:
+  - the newest log_id seen;
+  - the logs that were still open at that point.
+The next run exports closed logs above the mark, plus whichever of those
+open logs have closed since. Every run reads from one consistent
+snapshot. Its files are named after the run number, and the state file is
+replaced only after they are all written. A run that dies part-way is
+therefore redone from scratch: its leftover files are deleted first.
+
+read_logs() and range_fingerprint() read the files through pyarrow's
+dataset API. The entry_date filter prunes whole partition directories. The
+export only holds days with no open logs left (covers()), so callers
+should fall back to MySQL for anything newer.
+
+pyarrow is optional. Without it, available() is False and the admin app
+neither exports nor reads Parquet.
+"""
+import glob
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+import archive
+
+EXPORT_DIR = os.environ.get(
+    'LIB_PARQUET_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'parquet', 'logs'))
+STATE_FILE = '_export_state.json'  # leading underscore: skipped by pyarrow's dataset discovery
+EXPORT_BATCH_SIZE = 50000
+
+EXPORT_COLUMNS = ("log_id", "full_reg_no", "name", "branch", "year", "entry_date", "entry_time",
+                  "exit_date", "exit_time", "role", "reason")
+
+if pa is not None:
+    SCHEMA = pa.schema([
+        ('log_id', pa.int64()),
+        ('full_reg_no', pa.string()),
+        ('name', pa.string()),
+        ('branch', pa.string()),
+        ('year', pa.string()),
+        ('entry_date', pa.date32()),
+        ('entry_time', pa.time32('s')),
+        ('exit_date', pa.date32()),
+        ('exit_time', pa.time32('s')),
+        ('role', pa.string()),
+        ('reason', pa.string()),
+    ])
+    PARTITIONING = ds.partitioning(pa.schema([('entry_date', pa.date32())]), flavor='hive')
+    READ_ERRORS = (OSError, pa.ArrowException)
+else:
+    READ_ERRORS = ()
+
+EMPTY_STATE = {'runs': 0, 'max_log_id': 0, 'open_log_ids': [], 'complete_before': None,
+               'exported_at': None, 'rows': 0}
+
+
+def available():
+    return pa is not None
+
+
+# --- STATE ---
+def load_state(export_dir=EXPORT_DIR):
+    try:
+        with open(os.path.join(export_dir, STATE_FILE)) as f:
+            return dict(EMPTY_STATE, **json.load(f))
+    except FileNotFoundError:
+        return dict(EMPTY_STATE)
+
+
+def _save_state(export_dir, state):
+    path = os.path.join(export_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def covers(start_date, end_date, export_dir=EXPORT_DIR):
+    """True if every log with entry_date in the range is already in the export."""
+    if end_date is None:
+        return False
+    complete_before = load_state(export_dir)['complete_before']
+    return complete_before is not None and end_date < date.fromisoformat(complete_before)
+
+
+# --- EXPORT ---
+def _time_of_day(value):
+    # mysql-connector returns TIME columns as timedelta
+    if value is None:
+        return None
+    return (datetime.min + value).time() if isinstance(value, timedelta) else value
+
+
+def _to_table(rows):
+    columns = list(zip(*rows))
+    data = {}
+    for name, values in zip(EXPORT_COLUMNS, columns):
+        if name in ('entry_time', 'exit_time'):
+            values = [_time_of_day(v) for v in values]
+        elif name not in ('log_id', 'entry_date', 'exit_date'):
+            values = [None if v is None else str(v) for v in values]
+        data[name] = values
+    return pa.table(data, schema=SCHEMA)
+
+
+def export_closed_logs(conn, export_dir=EXPORT_DIR, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Appends logs closed since the last run to the Parquet export.
+    Returns the number of rows written.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; the Parquet export is disabled.")
+    os.makedirs(export_dir, exist_ok=True)
+    state = load_state(export_dir)
+    run = state['runs'] + 1
+    # Files from an earlier attempt at this run that died before saving the state
+    for leftover in glob.glob(os.path.join(export_dir, '*', f'part-{run:08d}-*.parquet')):
+        os.remove(leftover)
+
+    cursor = conn.cursor(buffered=False)
+    written = 0
+    try:
+        # One snapshot for the high-water mark, the open logs and the rows exported
+        conn.start_transaction(consistent_snapshot=True, isolation_level='REPEATABLE READ', readonly=True)
+        cursor.execute("SELECT GREATEST(COALESCE((SELECT MAX(log_id) FROM logs), 0), "
+                       "COALESCE((SELECT MAX(log_id) FROM logs_archive), 0))")
+        high = max(int(cursor.fetchone()[0]), state['max_log_id'])
+        cursor.execute("SELECT log_id, entry_date FROM logs WHERE exit_date IS NULL AND log_id <= %s", (high,))
+        still_open = cursor.fetchall()
+
+        params = {'low': state['max_log_id'], 'high': high}
+        reopened = ""
+        if state['open_log_ids']:
+            reopened = " OR log_id IN ({})".format(
+                ", ".join(f"%(id{i})s" for i in range(len(state['open_log_ids']))))
+            params.update((f"id{i}", log_id) for i, log_id in enumerate(state['open_log_ids']))
+        where = f"WHERE exit_date IS NOT NULL AND (log_id > %(low)s AND log_id <= %(high)s{reopened})"
+        cursor.execute(f"SELECT {archive.LOG_COLUMNS} FROM {archive.logs_source(where, None)} "
+                       f"ORDER BY log_id", params)
+        batch_no = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            ds.write_dataset(
+                _to_table(rows), export_dir, format='parquet', partitioning=PARTITIONING,
+                basename_template=f'part-{run:08d}-{batch_no:04d}-{{i}}.parquet',
+                existing_data_behavior='overwrite_or_ignore'
+            )
+            written += len(rows)
+            batch_no += 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    # Days before the oldest still-open log (and before today) are complete
+    complete_before = min([date.today()] + [entry_date for _, entry_date in still_open])
+    _save_state(export_dir, {
+        'runs': run,
+        'max_log_id': high,
+        'open_log_ids': sorted(log_id for log_id, _ in still_open),
+        'complete_before': complete_before.isoformat(),
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': state['rows'] + written,
+    })
+    return written
+
+
+# --- READ ---
+def _dataset(export_dir):
+    return ds.dataset(export_dir, schema=SCHEMA, format='parquet', partitioning=PARTITIONING)
+
+
+def _date_filter(start_date, end_date):
+    condition = ds.field('entry_date') <= pa.scalar(end_date, pa.date32())
+    if start_date is not None:
+        condition &= ds.field('entry_date') >= pa.scalar(start_date, pa.date32())
+    return condition
+
+
+def read_logs(start_date, end_date, columns=None, export_dir=EXPORT_DIR):
+    """
+    Exported logs with entry_date in the range, oldest first, shaped like a
+    MySQL read: dates as datetime.date, times as timedelta.
+    """
+    columns = list(columns or EXPORT_COLUMNS)
+    scan = list(dict.fromkeys(columns + ['entry_date', 'entry_time']))
+    table = _dataset(export_dir).to_table(columns=scan, filter=_date_filter(start_date, end_date))
+    table = table.sort_by([('entry_date', 'ascending'), ('entry_time', 'ascending')])
+    df = table.select(columns).to_pandas(date_as_object=True)
+    for col in ('entry_time', 'exit_time'):
+        if col in df:
+            df[col] = pd.to_timedelta(table.column(col).cast(pa.int32()).to_numpy(zero_copy_only=False), unit='s')
+    return df
+
+
+def range_fingerprint(start_date, end_date, export_dir=EXPORT_DIR):
+    """Same (count, newest log_id, open logs) tuple as the MySQL fingerprint for a covered range."""
+    log_ids = _dataset(export_dir).to_table(columns=['log_id'], filter=_date_filter(start_date, end_date))
+    newest = pc.max(log_ids.column('log_id')).as_py() if log_ids.num_rows else 0
+    return log_ids.num_rows, newest or 0, 0
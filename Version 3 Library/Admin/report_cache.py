@@ -0,0 +1,61 @@
+"""
+Size-capped LRU cache of generated report workbooks.
+
+Entries are keyed by (endpoint, start date, end date) and stored with a
+fingerprint of the logs in that range. A lookup with a different
+fingerprint means logs in the range changed (a new entry, an exit, an
+auto-exit closing open logs), so the entry is dropped and rebuilt. Closed
+days keep the same fingerprint and are served from memory indefinitely.
+"""
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ReportCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (fingerprint, data, filename)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    def get(self, key, fingerprint):
+        """Returns (data, filename) if cached for this fingerprint, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[0] != fingerprint:
+                self._remove(key)
+                self.stats['invalidations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1], entry[2]
+
+    def put(self, key, fingerprint, data, filename):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (fingerprint, data, filename)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        _, data, _ = self._entries.pop(key)
+        self._bytes -= len(data)
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes,
+                        hit_ratio=round(self.stats['hits'] / lookups, 3) if lookups else None)
@@ -0,0 +1,166 @@
+"""
+Pre-aggregated daily/hourly summaries of `logs` for the admin reports.
+
+Three rollup tables hold per-day totals (entries, unique visitors, average
+dwell time), per-hour entry counts, and a per-branch/per-year breakdown.
+refresh_rollups() recomputes a range of days from `logs` (and
+`logs_archive`, for days old enough to have been archived) in one
+transaction. refresh_pending() is what the scheduler calls: it only
+recomputes days that can still change (the last rolled-up day onward,
+yesterday, and any day that still has open logs), so the cost does not grow
+with history. Yesterday is included because scans queued offline at the
+gate can be replayed after midnight, landing as closed logs on a day that
+was already rolled up.
+"""
+from datetime import date, timedelta
+
+import pandas as pd
+
+import archive
+
+BACKFILL_DAYS_PER_BATCH = 31
+
+ROLLUP_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS log_daily_summary (
+        day DATE PRIMARY KEY,
+        entries INT NOT NULL,
+        unique_visitors INT NOT NULL,
+        avg_dwell_minutes DECIMAL(8, 2),
+        still_inside INT NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS log_hourly_summary (
+        day DATE NOT NULL,
+        hour TINYINT NOT NULL,
+        entries INT NOT NULL,
+        unique_visitors INT NOT NULL,
+        PRIMARY KEY (day, hour)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS log_daily_breakdown (
+        day DATE NOT NULL,
+        branch VARCHAR(50) NOT NULL,
+        year VARCHAR(10) NOT NULL,
+        entries INT NOT NULL,
+        unique_visitors INT NOT NULL,
+        avg_dwell_minutes DECIMAL(8, 2),
+        PRIMARY KEY (day, branch, year)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+DWELL_MINUTES = """CASE WHEN exit_date IS NOT NULL
+                   THEN TIMESTAMPDIFF(MINUTE, TIMESTAMP(entry_date, entry_time), TIMESTAMP(exit_date, exit_time))
+                   END"""
+
+# {source} is filled in per range by archive.logs_source()
+RANGE_WHERE = "WHERE entry_date BETWEEN %(start)s AND %(end)s"
+REFRESH_STATEMENTS = [
+    "DELETE FROM log_daily_summary WHERE day BETWEEN %(start)s AND %(end)s",
+    "DELETE FROM log_hourly_summary WHERE day BETWEEN %(start)s AND %(end)s",
+    "DELETE FROM log_daily_breakdown WHERE day BETWEEN %(start)s AND %(end)s",
+    f"""INSERT INTO log_daily_summary (day, entries, unique_visitors, avg_dwell_minutes, still_inside)
+        SELECT entry_date, COUNT(*), COUNT(DISTINCT full_reg_no), AVG({DWELL_MINUTES}), SUM(exit_date IS NULL)
+        FROM {{source}}
+        GROUP BY entry_date""",
+    """INSERT INTO log_hourly_summary (day, hour, entries, unique_visitors)
+       SELECT entry_date, HOUR(entry_time), COUNT(*), COUNT(DISTINCT full_reg_no)
+       FROM {source}
+       GROUP BY entry_date, HOUR(entry_time)""",
+    f"""INSERT INTO log_daily_breakdown (day, branch, year, entries, unique_visitors, avg_dwell_minutes)
+        SELECT entry_date, COALESCE(NULLIF(branch, ''), 'N/A'), COALESCE(NULLIF(year, ''), 'N/A'),
+               COUNT(*), COUNT(DISTINCT full_reg_no), AVG({DWELL_MINUTES})
+        FROM {{source}}
+        GROUP BY entry_date, COALESCE(NULLIF(branch, ''), 'N/A'), COALESCE(NULLIF(year, ''), 'N/A')""",
+]
+
+
+def ensure_rollup_tables(conn):
+    cursor = conn.cursor()
+    for statement in ROLLUP_TABLES:
+        cursor.execute(statement)
+    cursor.close()
+
+
+def refresh_rollups(conn, start, end):
+    """Recomputes every rollup row for start..end (inclusive) in one transaction."""
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        source = archive.logs_source(RANGE_WHERE, start)
+        for statement in REFRESH_STATEMENTS:
+            cursor.execute(statement.format(source=source), {'start': start, 'end': end})
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def refresh_pending(conn, today=None):
+    """
+    Brings the rollups up to date. Returns the (start, end) range refreshed,
+    or None when there are no logs at all.
+    """
+    today = today or date.today()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(day) FROM log_daily_summary")
+    last_day = cursor.fetchone()[0]
+    # Days with open logs change when those visitors exit or are auto-closed
+    cursor.execute("SELECT MIN(entry_date) FROM logs WHERE open_reg_no IS NOT NULL")
+    oldest_open = cursor.fetchone()[0]
+    if last_day is None:
+        cursor.execute(f"SELECT MIN(entry_date) FROM {archive.logs_source('', None)}")
+        last_day = cursor.fetchone()[0]
+    cursor.close()
+    if last_day is None:
+        return None
+
+    start = min(d for d in (last_day, oldest_open, today - timedelta(days=1)) if d is not None)
+    batch_start = start
+    while batch_start <= today:
+        batch_end = min(batch_start + timedelta(days=BACKFILL_DAYS_PER_BATCH - 1), today)
+        refresh_rollups(conn, batch_start, batch_end)
+        batch_start = batch_end + timedelta(days=1)
+    return start, today
+
+
+# --- READS ---
+def _read(conn, query, start, end):
+    return pd.read_sql(query, conn, params={'start': start, 'end': end})
+
+
+def read_daily(conn, start, end):
+    return _read(conn, """SELECT day AS `Date`, entries AS `Entries`, unique_visitors AS `Unique Visitors`,
+                                 avg_dwell_minutes AS `Avg Dwell (min)`, still_inside AS `Still Inside`
+                          FROM log_daily_summary WHERE day BETWEEN %(start)s AND %(end)s ORDER BY day""",
+                 start, end)
+
+
+def read_hourly(conn, start, end):
+    return _read(conn, """SELECT day AS `Date`, hour AS `Hour`, entries AS `Entries`,
+                                 unique_visitors AS `Unique Visitors`
+                          FROM log_hourly_summary WHERE day BETWEEN %(start)s AND %(end)s ORDER BY day, hour""",
+                 start, end)
+
+
+def read_breakdown(conn, start, end):
+    return _read(conn, """SELECT day AS `Date`, branch AS `Branch`, year AS `Year`, entries AS `Entries`,
+                                 unique_visitors AS `Unique Visitors`, avg_dwell_minutes AS `Avg Dwell (min)`
+                          FROM log_daily_breakdown WHERE day BETWEEN %(start)s AND %(end)s
+                          ORDER BY day, branch, year""",
+                 start, end)
+
+
+def read_unique_visitors(conn, day):
+    """Unique visitors for a rolled-up day, or None if the day isn't rolled up."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT unique_visitors FROM log_daily_summary WHERE day = %s", (day,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
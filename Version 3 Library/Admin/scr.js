@@ -183,7 +183,71 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     }
 
-    // 4. Download Full Log Tile
+    // 4. Date Range Summary Tile
+    const rangeSummaryTile = document.getElementById("rangeSummaryTile");
+    if (rangeSummaryTile) {
+        const submitBtn = rangeSummaryTile.querySelector(".submitBtn");
+        const startInput = document.getElementById("rangeStart");
+        const endInput = document.getElementById("rangeEnd");
+        const status = rangeSummaryTile.querySelector(".status");
+        submitBtn.addEventListener("click", () => {
+            if (!startInput.value || !endInput.value) {
+                updateStatus(status, "Please select both dates first.", "error");
+                return;
+            }
+            fetchAndDownloadReport('/report/range_summary', { start: startInput.value, end: endInput.value }, submitBtn, status);
+        });
+    }
+
+    // 5. Occupancy Analytics Tile
+    const occupancyTile = document.getElementById("occupancyTile");
+    if (occupancyTile) {
+        const submitBtn = occupancyTile.querySelector(".submitBtn");
+        const startInput = document.getElementById("occupancyStart");
+        const endInput = document.getElementById("occupancyEnd");
+        const status = occupancyTile.querySelector(".status");
+        submitBtn.addEventListener("click", () => {
+            if (!startInput.value || !endInput.value) {
+                updateStatus(status, "Please select both dates first.", "error");
+                return;
+            }
+            fetchAndDownloadReport('/report/occupancy_analytics', { start: startInput.value, end: endInput.value }, submitBtn, status);
+        });
+    }
+
+    // 6. Visit Frequency & Streaks Tile
+    const frequencyTile = document.getElementById("frequencyTile");
+    if (frequencyTile) {
+        const submitBtn = frequencyTile.querySelector(".submitBtn");
+        const startInput = document.getElementById("frequencyStart");
+        const endInput = document.getElementById("frequencyEnd");
+        const status = frequencyTile.querySelector(".status");
+        submitBtn.addEventListener("click", () => {
+            if (!startInput.value || !endInput.value) {
+                updateStatus(status, "Please select both dates first.", "error");
+                return;
+            }
+            fetchAndDownloadReport('/report/visit_frequency', { start: startInput.value, end: endInput.value }, submitBtn, status);
+        });
+    }
+
+    // 7. Cohort Attendance Tile
+    const cohortTile = document.getElementById("cohortTile");
+    if (cohortTile) {
+        const submitBtn = cohortTile.querySelector(".submitBtn");
+        const startInput = document.getElementById("cohortStart");
+        const endInput = document.getElementById("cohortEnd");
+        const status = cohortTile.querySelector(".status");
+        submitBtn.addEventListener("click", () => {
+            if (!startInput.value || !endInput.value) {
+                updateStatus(status, "Please select both dates first.", "error");
+                return;
+            }
+            fetchAndDownloadReport('/report/cohort_attendance', { start: startInput.value, end: endInput.value }, submitBtn, status);
+        });
+    }
+
+    // 8. Download Full Log Tile
     const excelTile = document.getElementById("excelTile");
     if (excelTile) {
         const downloadBtn = excelTile.querySelector(".downloadBtn");
@@ -0,0 +1,84 @@
+"""
+Batched closeout of open logs for the 16:30 auto-exit and startup cleanup.
+
+The old closeout was one unbounded `UPDATE logs ... WHERE exit_date IS NULL
+OR exit_date = ''`, which could not use an index and held row locks on
+every open log while kiosks were writing. Here open logs are found through
+the unique `open_reg_no` index, closed by primary key in small batches
+(one short transaction each), and every closed log is recorded in
+`log_closeouts` with the reason it was closed.
+"""
+import mysql.connector
+
+BATCH_SIZE = 200
+
+CLOSEOUTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS log_closeouts (
+        closeout_id INT AUTO_INCREMENT PRIMARY KEY,
+        log_id INT NOT NULL,
+        full_reg_no VARCHAR(20),
+        reason VARCHAR(50) NOT NULL,
+        exit_date DATE,
+        exit_time TIME,
+        closed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_closeouts_log_id (log_id),
+        KEY idx_closeouts_closed_at (closed_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def ensure_closeouts_table(execute_query):
+    execute_query(CLOSEOUTS_TABLE)
+
+
+def close_open_logs(get_connection, release_connection, exit_date, exit_time, reason,
+                    batch_size=BATCH_SIZE, on_batch=None):
+    """
+    Closes every open log in batches of `batch_size` and audits each one.
+    `on_batch(full_reg_nos)` is called after each committed batch.
+    Returns the list of closed (log_id, full_reg_no) pairs. A database
+    failure is raised; batches committed before it stay closed.
+    """
+    closed = []
+    last_log_id = 0
+    while True:
+        conn = get_connection()
+        if not conn:
+            raise RuntimeError(f"No database connection; stopped after {len(closed)} logs.")
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            cursor.execute(
+                """SELECT log_id, full_reg_no FROM logs
+                   WHERE open_reg_no IS NOT NULL AND log_id > %s
+                   ORDER BY log_id LIMIT %s FOR UPDATE""",
+                (last_log_id, batch_size)
+            )
+            batch = cursor.fetchall()
+            if not batch:
+                conn.rollback()
+                break
+            ids = [row[0] for row in batch]
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"UPDATE logs SET exit_date = %s, exit_time = %s WHERE log_id IN ({placeholders})",
+                (exit_date, exit_time, *ids)
+            )
+            cursor.executemany(
+                """INSERT INTO log_closeouts (log_id, full_reg_no, reason, exit_date, exit_time)
+                   VALUES (%s, %s, %s, %s, %s)""",
+                [(log_id, str(reg_no), reason, exit_date, exit_time) for log_id, reg_no in batch]
+            )
+            conn.commit()
+            cursor.close()
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+        finally:
+            release_connection(conn)
+
+        closed.extend(batch)
+        last_log_id = ids[-1]
+        if on_batch:
+            on_batch([str(reg_no) for _, reg_no in batch])
+    return closed
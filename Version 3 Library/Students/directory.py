@@ -0,0 +1,186 @@
+"""
+In-memory directory of students and faculty for the gate kiosk.
+
+find_student used to run `full_reg_no LIKE '%12345'` on every scan, which
+can't use the primary key and scans the whole students table. This cache
+loads both tables once, indexes students by the last 5 digits of
+full_reg_no and faculty by their numeric code, and keeps itself current by
+pulling only rows whose `updated_at` moved since the last refresh.
+
+import.py sets `updated_at` on every row it upserts, changed or not, so the
+next refresh (periodic, or triggered by a cache miss) picks the whole import
+up. Each refresh's watermark is the database's own clock, read before the
+rows and wound back by WATERMARK_OVERLAP, so a write whose transaction
+committed after the read but stamped an earlier `updated_at` is still
+picked up next time.
+
+While the tables can't be read at all (MySQL down at startup), lookups
+retry the full load at most once every LOAD_RETRY_INTERVAL seconds instead
+of adding a full-table query to every scan.
+"""
+import threading
+import time
+
+import metrics
+
+log = metrics.get_logger('students.directory')
+
+STUDENT_SUFFIX_LEN = 5
+REFRESH_INTERVAL = 60        # seconds between scheduled incremental refreshes
+MISS_REFRESH_INTERVAL = 5    # minimum seconds between refreshes triggered by a miss
+LOAD_RETRY_INTERVAL = 30     # minimum seconds between load attempts while nothing is loaded
+FULL_RELOAD_INTERVAL = 1800  # full reload also catches deleted rows
+WATERMARK_OVERLAP = 60       # seconds re-read on each refresh to cover writes still in flight
+
+
+class DirectoryCache:
+    def __init__(self, execute_query):
+        self._execute_query = execute_query
+        self._lock = threading.Lock()
+        self._students = {}         # full_reg_no -> row
+        self._student_index = {}    # last 5 digits -> [full_reg_no, ...]
+        self._faculty = {}          # int code -> row
+        self._watermark = None
+        self._has_updated_at = False
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._last_full_load = 0.0
+        self._last_load_attempt = None
+        self.stats = {'hits': 0, 'misses': 0, 'ambiguous': 0, 'refreshes': 0, 'full_loads': 0}
+
+    # --- LOADING ---
+    def load(self):
+        """Full reload of both tables. Replaces the indexes atomically."""
+        self._last_load_attempt = time.monotonic()
+        watermark = self._read_watermark()
+        students = self._execute_query("SELECT * FROM students", fetch=True)
+        faculty = self._execute_query("SELECT * FROM faculty", fetch=True)
+        if students is None:
+            log.warning("could not load students, keeping previous directory")
+            return False
+        column = self._execute_query(
+            """SELECT COUNT(*) AS count FROM information_schema.COLUMNS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'students' AND COLUMN_NAME = 'updated_at'""",
+            fetch_one=True
+        )
+
+        student_map = {str(row['full_reg_no']): row for row in students}
+        index = {}
+        for reg_no in student_map:
+            if len(reg_no) >= STUDENT_SUFFIX_LEN:
+                index.setdefault(reg_no[-STUDENT_SUFFIX_LEN:], []).append(reg_no)
+        faculty_map = {int(row['full_reg_no']): row for row in faculty or []
+                       if str(row['full_reg_no']).strip().isdigit()}
+
+        with self._lock:
+            self._students = student_map
+            self._student_index = index
+            if faculty is not None:
+                self._faculty = faculty_map
+            self._has_updated_at = bool(column and column['count'])
+            self._watermark = watermark
+            self._loaded = True
+            self._last_refresh = self._last_full_load = time.monotonic()
+            self.stats['full_loads'] += 1
+
+        self._report_collisions()
+        log.info("directory loaded", extra={'fields': {'students': len(student_map), 'faculty': len(faculty_map)}})
+        return True
+
+    def refresh(self):
+        """Pulls students changed since the last refresh; falls back to a full reload."""
+        if (not self._loaded or not self._has_updated_at or self._watermark is None
+                or time.monotonic() - self._last_full_load > FULL_RELOAD_INTERVAL):
+            return self.load()
+
+        watermark = self._read_watermark()
+        if watermark is None:
+            return False
+        rows = self._execute_query("SELECT * FROM students WHERE updated_at >= %s", (self._watermark,), fetch=True)
+        if rows is None:
+            return False
+        faculty = self._execute_query("SELECT * FROM faculty", fetch=True)
+        with self._lock:
+            if faculty is not None:
+                self._faculty = {int(row['full_reg_no']): row for row in faculty
+                                 if str(row['full_reg_no']).strip().isdigit()}
+            for row in rows:
+                self._upsert_student(row)
+            self._watermark = watermark
+            self._last_refresh = time.monotonic()
+            self.stats['refreshes'] += 1
+        return True
+
+    def _read_watermark(self):
+        """The DB's NOW() less the overlap, taken before reading so no commit falls between refreshes."""
+        row = self._execute_query("SELECT NOW() - INTERVAL %s SECOND AS watermark", (WATERMARK_OVERLAP,),
+                                  fetch_one=True)
+        return row['watermark'] if row else None
+
+    def _upsert_student(self, row):
+        reg_no = str(row['full_reg_no'])
+        if reg_no not in self._students and len(reg_no) >= STUDENT_SUFFIX_LEN:
+            bucket = self._student_index.setdefault(reg_no[-STUDENT_SUFFIX_LEN:], [])
+            bucket.append(reg_no)
+            if len(bucket) > 1:
+                log.warning("student suffix collision",
+                            extra={'fields': {'suffix': reg_no[-STUDENT_SUFFIX_LEN:], 'full_reg_nos': list(bucket)}})
+        self._students[reg_no] = row
+
+    def _ensure_fresh(self, after_miss=False):
+        if not self._loaded:
+            if (self._last_load_attempt is None
+                    or time.monotonic() - self._last_load_attempt > LOAD_RETRY_INTERVAL):
+                self.load()
+        elif after_miss and time.monotonic() - self._last_refresh > MISS_REFRESH_INTERVAL:
+            self.refresh()
+
+    # --- LOOKUPS ---
+    def _lookup_student(self, registry_code):
+        with self._lock:
+            return [self._students[reg_no] for reg_no in self._student_index.get(registry_code, [])]
+
+    def find_student(self, registry_code):
+        """Returns the list of students whose full_reg_no ends with registry_code."""
+        self._ensure_fresh()
+        matches = self._lookup_student(registry_code)
+        if not matches:
+            self._ensure_fresh(after_miss=True)
+            matches = self._lookup_student(registry_code)
+        self._count(matches)
+        return matches
+
+    def find_faculty(self, registry_code):
+        try:
+            code = int(registry_code)
+        except (TypeError, ValueError):
+            return None
+        self._ensure_fresh()
+        row = self._faculty.get(code)
+        if row is None:
+            self._ensure_fresh(after_miss=True)
+            row = self._faculty.get(code)
+        self._count([row] if row else [])
+        return row
+
+    def _count(self, matches):
+        if not matches:
+            self.stats['misses'] += 1
+        else:
+            self.stats['hits'] += 1
+            if len(matches) > 1:
+                self.stats['ambiguous'] += 1
+
+    # --- DIAGNOSTICS ---
+    def collisions(self):
+        with self._lock:
+            return {suffix: list(regs) for suffix, regs in self._student_index.items() if len(regs) > 1}
+
+    def _report_collisions(self):
+        for suffix, regs in self.collisions().items():
+            log.warning("student suffix collision", extra={'fields': {'suffix': suffix, 'full_reg_nos': regs}})
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, students=len(self._students), faculty=len(self._faculty),
+                        collisions=sum(1 for regs in self._student_index.values() if len(regs) > 1))
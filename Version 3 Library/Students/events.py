@@ -0,0 +1,122 @@
+"""
+Server-Sent Events fan-out for the kiosk dashboards.
+
+Each connected browser gets a small bounded queue. Publishing never blocks
+the scan that triggered it: if a client's queue is full the client is
+marked as overflowed, and its stream sends a single `resync` event and
+closes so the page reloads a fresh copy instead of replaying a backlog.
+
+Clients of the ASGI kiosk app subscribe with their event loop and read
+with alisten(); publishing then also wakes that loop, so a waiting
+dashboard holds no thread.
+
+Under the threaded servers every open stream holds one of the process's
+request threads for as long as the page is open. Those clients are capped
+at SYNC_MAX_CLIENTS, a quarter of LIB_THREADS, so dashboards can never
+starve /check of threads; the rest get a 503.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+
+CLIENT_QUEUE_SIZE = 100
+MAX_CLIENTS = 50
+# Streams served on request threads (students.py); serve.py exports LIB_THREADS from --threads
+SYNC_MAX_CLIENTS = int(os.environ.get('LIB_SSE_SYNC_CLIENTS', max(1, int(os.environ.get('LIB_THREADS', 8)) // 4)))
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+
+
+class _Client:
+    def __init__(self, loop=None):
+        self.queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.overflowed = False
+        self.loop = loop
+        self.wakeup = asyncio.Event() if loop else None
+
+    def notify(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventBroadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+        self.stats = {'published': 0, 'dropped_clients': 0}
+
+    def subscribe(self, loop=None):
+        """
+        Returns a new client, or None when MAX_CLIENTS are already connected
+        (SYNC_MAX_CLIENTS for clients read with listen() on a request thread).
+        Pass the running event loop to read it with alisten().
+        """
+        with self._lock:
+            if len(self._clients) >= MAX_CLIENTS:
+                return None
+            if loop is None and sum(1 for c in self._clients if c.loop is None) >= SYNC_MAX_CLIENTS:
+                return None
+            client = _Client(loop)
+            self._clients.add(client)
+            return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        with self._lock:
+            clients = list(self._clients)
+        self.stats['published'] += 1
+        for client in clients:
+            if client.overflowed:
+                continue
+            try:
+                client.queue.put_nowait(message)
+            except queue.Full:
+                client.overflowed = True
+                self.stats['dropped_clients'] += 1
+            client.notify()
+
+    def listen(self, client):
+        """Yields SSE frames for one client until it overflows or disconnects."""
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while True:
+            if client.overflowed:
+                yield format_event('resync', {})
+                return
+            try:
+                yield client.queue.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+
+    async def alisten(self, client):
+        """listen() for a client subscribed with an event loop."""
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while True:
+            if client.overflowed:
+                yield format_event('resync', {})
+                return
+            try:
+                yield client.queue.get_nowait()
+                continue
+            except queue.Empty:
+                pass
+            client.wakeup.clear()
+            if not client.queue.empty() or client.overflowed:
+                continue  # published between the check and the clear
+            try:
+                await asyncio.wait_for(client.wakeup.wait(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
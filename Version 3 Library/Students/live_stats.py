@@ -0,0 +1,114 @@
+"""
+Today's live counters for the kiosk summary panel.
+
+get_live_stats used to run four aggregate queries over `logs` per call.
+LiveStats seeds today's totals with one query, then updates a running
+entry count, a distinct-visitor set and a 24-bucket hourly histogram as
+entries happen. The inside count comes from the occupancy tracker.
+"""
+import json
+import threading
+import time
+
+import metrics
+
+log = metrics.get_logger('students.live_stats')
+
+RESEED_INTERVAL = 300   # seconds; re-derive today's counters from logs
+STATS_CACHE_TTL = 2     # seconds a rendered /stats payload is reused
+
+
+def format_hour(hour):
+    if hour is None:
+        return "N/A"
+    if hour == 0:
+        return "12 AM"
+    if hour < 12:
+        return f"{hour} AM"
+    if hour == 12:
+        return "12 PM"
+    return f"{hour - 12} PM"
+
+
+class LiveStats:
+    def __init__(self, execute_query, occupancy, today):
+        self._execute_query = execute_query
+        self._occupancy = occupancy
+        self._today = today            # callable returning today's date in IST
+        self._lock = threading.Lock()
+        self._date = None
+        self._total_entries = 0
+        self._visitors = set()
+        self._hourly = [0] * 24
+        self._cached_payload = None
+        self._cached_at = 0.0
+
+    def _reset(self, date):
+        self._date = date
+        self._total_entries = 0
+        self._visitors = set()
+        self._hourly = [0] * 24
+        self._cached_payload = None
+
+    def seed(self):
+        today = self._today()
+        rows = self._execute_query(
+            "SELECT full_reg_no, HOUR(entry_time) AS hour FROM logs WHERE entry_date = %s",
+            (today,), fetch=True
+        )
+        if rows is None:
+            log.warning("could not seed today's live stats")
+            return False
+        with self._lock:
+            self._reset(today)
+            for row in rows:
+                self._total_entries += 1
+                self._visitors.add(str(row['full_reg_no']))
+                if row['hour'] is not None:
+                    self._hourly[int(row['hour'])] += 1
+        return True
+
+    def _roll_over_if_needed(self):
+        if self._date != self._today():
+            self.seed()
+
+    def record_entry(self, full_reg_no, when):
+        if when.date() != self._date:
+            self.seed()
+            return  # the seed already counted this entry
+        with self._lock:
+            self._total_entries += 1
+            self._visitors.add(str(full_reg_no))
+            self._hourly[when.hour] += 1
+            self._cached_payload = None
+
+    def invalidate(self):
+        with self._lock:
+            self._cached_payload = None
+
+    def peak_hour(self):
+        best = max(range(24), key=lambda h: (self._hourly[h], h))
+        return best if self._hourly[best] else None
+
+    def snapshot(self):
+        self._roll_over_if_needed()
+        with self._lock:
+            return {
+                "total_entries_today": self._total_entries,
+                "unique_visitors_today": len(self._visitors),
+                "currently_inside": self._occupancy.count(),
+                "peak_hour_today": format_hour(self.peak_hour()),
+            }
+
+    def hourly(self):
+        with self._lock:
+            return list(self._hourly)
+
+    def cached_json(self):
+        """Serialized snapshot reused for STATS_CACHE_TTL seconds."""
+        now = time.monotonic()
+        payload = self._cached_payload
+        if payload is None or now - self._cached_at > STATS_CACHE_TTL:
+            payload = json.dumps(dict(self.snapshot(), hourly_entries=self.hourly()))
+            self._cached_payload, self._cached_at = payload, now
+        return payload
@@ -0,0 +1,116 @@
+"""
+In-memory "who's inside" state for the gate kiosk.
+
+The index page used to scan `logs` for open rows on every render, which
+with the post-redirect-get flow of /check meant once per scan. The tracker
+is seeded from `logs` once, updated by every entry/exit/closeout path in
+students.py, and reconciled against the database on a timer so it can't
+drift when another process writes to `logs`.
+"""
+import threading
+from collections import OrderedDict
+
+import metrics
+
+log = metrics.get_logger('students.occupancy')
+
+RECONCILE_INTERVAL = 60  # seconds
+
+# open_reg_no is only set while a log is open, so this is a lookup on its unique index
+OPEN_LOGS_QUERY = """SELECT log_id, full_reg_no, name, role FROM logs
+                     WHERE open_reg_no IS NOT NULL ORDER BY log_id"""
+
+
+class OccupancyTracker:
+    def __init__(self, execute_query):
+        self._execute_query = execute_query
+        self._lock = threading.Lock()
+        self._inside = OrderedDict()   # full_reg_no -> row, oldest entry first
+        self._snapshot = []
+        self._seeded = False
+        self.stats = {'reconciles': 0, 'drift_corrections': 0}
+
+    def _rebuild_snapshot(self):
+        # Newest first, matching the old ORDER BY log_id DESC
+        self._snapshot = list(reversed(self._inside.values()))
+
+    def _load_open_logs(self):
+        rows = self._execute_query(OPEN_LOGS_QUERY, fetch=True)
+        if rows is None:
+            return None
+        inside = OrderedDict()
+        for row in rows:
+            inside[str(row['full_reg_no'])] = {
+                'log_id': row['log_id'],
+                'full_reg_no': str(row['full_reg_no']),
+                'name': row['name'],
+                'role': row['role'],
+            }
+        return inside
+
+    # --- SEEDING / RECONCILIATION ---
+    def seed(self):
+        inside = self._load_open_logs()
+        if inside is None:
+            log.warning("could not seed occupancy from logs, will retry on next reconcile")
+            return False
+        with self._lock:
+            self._inside = inside
+            self._rebuild_snapshot()
+            self._seeded = True
+        log.info("occupancy seeded", extra={'fields': {'inside': len(inside)}})
+        return True
+
+    def reconcile(self):
+        """
+        Replaces memory with the database view. Returns how many people
+        were drifted (0 if none), or None if the database couldn't be read.
+        """
+        inside = self._load_open_logs()
+        if inside is None:
+            return None
+        with self._lock:
+            self.stats['reconciles'] += 1
+            drift = set(inside) ^ set(self._inside)
+            if drift and self._seeded:
+                self.stats['drift_corrections'] += 1
+                log.warning("occupancy drift corrected", extra={'fields': {'drifted': len(drift)}})
+            self._inside = inside
+            self._rebuild_snapshot()
+            self._seeded = True
+        return len(drift)
+
+    # --- UPDATES ---
+    def enter(self, full_reg_no, name, role, log_id=None):
+        full_reg_no = str(full_reg_no)
+        with self._lock:
+            self._inside.pop(full_reg_no, None)
+            self._inside[full_reg_no] = {'log_id': log_id, 'full_reg_no': full_reg_no, 'name': name, 'role': role}
+            self._rebuild_snapshot()
+
+    def exit(self, full_reg_no):
+        with self._lock:
+            if self._inside.pop(str(full_reg_no), None) is not None:
+                self._rebuild_snapshot()
+
+    def clear(self):
+        with self._lock:
+            self._inside.clear()
+            self._snapshot = []
+
+    # --- READS ---
+    def users_inside(self):
+        if not self._seeded:
+            self.seed()
+        return self._snapshot
+
+    def count(self):
+        if not self._seeded:
+            self.seed()
+        return len(self._inside)
+
+    def is_inside(self, full_reg_no):
+        return str(full_reg_no) in self._inside
+
+    def get(self, full_reg_no):
+        return self._inside.get(str(full_reg_no))
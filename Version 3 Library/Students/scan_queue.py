@@ -0,0 +1,236 @@
+"""
+Local write-ahead queue for gate scans while MySQL is unreachable.
+
+When toggle_log() can't get a connection (XAMPP restart, pool exhausted by
+lock contention), the scan is appended to a local SQLite file and
+acknowledged from local state instead of failing. The file lives in the
+data directory (LIB_DATA_DIR, default data/ next to serve.py), outside
+Students/ because that folder is served as static files. The leader
+process replays the queue to MySQL in order, in batches, from a
+background job.
+
+Every scan asks whether anything is queued. The answer is read from the
+file each time (a COUNT over the rowid table, which is near-free while the
+queue is empty), never cached in memory: the process that flushes is the
+leader-lock holder, which need not be the one serving scans (the
+`python students.py` reloader, or several gate workers).
+
+Every queued event carries an idempotency key. Replaying an event inserts
+its key into `log_event_keys` in the same transaction as the log write, so
+an event is applied exactly once even if the process dies between the
+MySQL commit and removing the event from the queue.
+
+While anything is queued, new scans are queued too (and the decision for a
+person consults their newest queued event first), so a later exit can't
+overtake the entry it closes.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import mysql.connector
+from mysql.connector import errorcode
+
+import metrics
+
+log = metrics.get_logger('students.scan_queue')
+
+DATA_DIR = os.environ.get(
+    'LIB_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+QUEUE_PATH = os.environ.get('LIB_SCAN_QUEUE', os.path.join(DATA_DIR, 'scan_queue.sqlite3'))
+FLUSH_INTERVAL = 5  # seconds
+FLUSH_BATCH_SIZE = 100
+
+EVENT_KEYS_TABLE = """
+    CREATE TABLE IF NOT EXISTS log_event_keys (
+        event_key CHAR(32) PRIMARY KEY,
+        kind VARCHAR(10) NOT NULL,
+        full_reg_no VARCHAR(20),
+        outcome VARCHAR(20) NOT NULL DEFAULT 'pending',
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+QUEUE_TABLE = """
+    CREATE TABLE IF NOT EXISTS scan_events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_key TEXT NOT NULL UNIQUE,
+        kind TEXT NOT NULL,
+        full_reg_no TEXT NOT NULL,
+        name TEXT,
+        branch TEXT,
+        year TEXT,
+        role TEXT NOT NULL,
+        event_date TEXT NOT NULL,
+        event_time TEXT NOT NULL,
+        queued_at REAL NOT NULL
+    )
+"""
+
+
+def ensure_event_keys_table(execute_query):
+    execute_query(EVENT_KEYS_TABLE)
+
+
+class ScanQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._flush_lock = threading.Lock()
+        self.stats = {'queued': 0, 'replayed': 0, 'duplicates': 0, 'conflicts': 0, 'flush_errors': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(QUEUE_TABLE)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_scan_events_reg ON scan_events (full_reg_no, seq)")
+        finally:
+            db.close()
+
+    def _connect(self):
+        # One short-lived connection per call: safe across threads and worker processes
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        db.execute("PRAGMA synchronous=FULL")
+        db.row_factory = sqlite3.Row
+        return db
+
+    # --- WRITES ---
+    def append(self, kind, user, role, when):
+        """Durably queues an 'entry' or 'exit' scan. Returns its idempotency key."""
+        event_key = uuid.uuid4().hex
+        db = self._connect()
+        try:
+            db.execute(
+                """INSERT INTO scan_events (event_key, kind, full_reg_no, name, branch, year, role,
+                                            event_date, event_time, queued_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (event_key, kind, str(user['full_reg_no']), user.get('name'), user.get('branch', 'N/A'),
+                 str(user.get('year', 'N/A')), role, when.date().isoformat(),
+                 when.time().isoformat(), time.time())
+            )
+        finally:
+            db.close()
+        self.stats['queued'] += 1
+        return event_key
+
+    # --- READS ---
+    def pending(self):
+        """Number of queued scans, whichever process queued or replayed them."""
+        db = self._connect()
+        try:
+            return db.execute("SELECT COUNT(*) FROM scan_events").fetchone()[0]
+        finally:
+            db.close()
+
+    def last_event(self, full_reg_no):
+        """The newest queued event for a person (a dict), or None."""
+        db = self._connect()
+        try:
+            row = db.execute(
+                "SELECT * FROM scan_events WHERE full_reg_no = ? ORDER BY seq DESC LIMIT 1",
+                (str(full_reg_no),)
+            ).fetchone()
+            return dict(row) if row else None
+        finally:
+            db.close()
+
+    def metrics(self):
+        return dict(self.stats, pending=self.pending(), path=self.path)
+
+    # --- REPLAY ---
+    def flush(self, get_connection, release_connection, batch_size=FLUSH_BATCH_SIZE):
+        """
+        Replays queued events to MySQL in order until the queue is empty or
+        MySQL fails. Returns the number of events removed from the queue.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        flushed = 0
+        try:
+            while True:
+                db = self._connect()
+                try:
+                    batch = [dict(row) for row in db.execute(
+                        "SELECT * FROM scan_events ORDER BY seq LIMIT ?", (batch_size,))]
+                finally:
+                    db.close()
+                if not batch:
+                    break
+                conn = get_connection()
+                if not conn:
+                    break
+                try:
+                    self._apply_batch(conn, batch)
+                except mysql.connector.Error as err:
+                    self.stats['flush_errors'] += 1
+                    log.error("scan queue replay failed", extra={'fields': {'seq': batch[0]['seq'], 'error': str(err)}})
+                    break
+                finally:
+                    release_connection(conn)
+
+                db = self._connect()
+                try:
+                    # Appends only add higher seqs, so this removes exactly the batch
+                    db.execute("DELETE FROM scan_events WHERE seq <= ?", (batch[-1]['seq'],))
+                finally:
+                    db.close()
+                flushed += len(batch)
+        finally:
+            self._flush_lock.release()
+        if flushed:
+            log.info("replayed queued scans", extra={'fields': {'replayed': flushed}})
+        return flushed
+
+    def _apply_batch(self, conn, batch):
+        """Applies a batch in one transaction; events already applied are skipped by key."""
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            for event in batch:
+                cursor.execute(
+                    "INSERT IGNORE INTO log_event_keys (event_key, kind, full_reg_no) VALUES (%s, %s, %s)",
+                    (event['event_key'], event['kind'], event['full_reg_no'])
+                )
+                if cursor.rowcount == 0:
+                    self.stats['duplicates'] += 1
+                    continue
+                outcome = self._apply_event(cursor, event)
+                if outcome != 'applied':
+                    self.stats['conflicts'] += 1
+                    log.warning("queued scan conflicted on replay", extra={'fields': {
+                        'kind': event['kind'], 'full_reg_no': event['full_reg_no'],
+                        'at': f"{event['event_date']} {event['event_time']}", 'outcome': outcome}})
+                cursor.execute("UPDATE log_event_keys SET outcome = %s WHERE event_key = %s",
+                               (outcome, event['event_key']))
+            conn.commit()
+            self.stats['replayed'] += len(batch)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _apply_event(cursor, event):
+        if event['kind'] == 'entry':
+            try:
+                cursor.execute(
+                    """INSERT INTO logs (full_reg_no, name, branch, year, entry_date, entry_time, role, reason)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                    (event['full_reg_no'], event['name'], event['branch'], event['year'],
+                     event['event_date'], event['event_time'], event['role'], "Self Study")
+                )
+            except mysql.connector.IntegrityError as err:
+                # Only the failed statement is rolled back; the batch continues
+                if err.errno == errorcode.ER_DUP_ENTRY:
+                    return 'already_inside'
+                raise
+            return 'applied'
+
+        cursor.execute(
+            """UPDATE logs SET exit_date = %s, exit_time = %s
+               WHERE open_reg_no = %s AND role = %s""",
+            (event['event_date'], event['event_time'], event['full_reg_no'], event['role'])
+        )
+        return 'applied' if cursor.rowcount else 'not_inside'
@@ -93,14 +93,68 @@ document.addEventListener("DOMContentLoaded", () => {
     function updateLiveStats() {
         fetch('/api/stats')
             .then(response => response.json())
-            .then(data => {
-                document.getElementById('entries-today').textContent = data.total_entries_today;
-                document.getElementById('currently-inside').textContent = data.currently_inside;
-                document.getElementById('peak-hour').textContent = data.peak_hour_today;
-            })
+            .then(renderLiveStats)
             .catch(error => console.error('Error fetching live stats:', error));
     }
 
+    function renderLiveStats(data) {
+        document.getElementById('entries-today').textContent = data.total_entries_today;
+        document.getElementById('currently-inside').textContent = data.currently_inside;
+        document.getElementById('peak-hour').textContent = data.peak_hour_today;
+    }
+
+    // --- LIVE EVENTS (SERVER-SENT) ---
+    const insideTableBody = document.querySelector(".live-status-panel tbody");
+
+    function renumberInsideRows() {
+        const rows = insideTableBody.querySelectorAll("tr[data-reg]");
+        rows.forEach((row, idx) => { row.cells[0].textContent = idx + 1; });
+        if (rows.length === 0) {
+            insideTableBody.innerHTML = '<tr><td colspan="3" style="text-align: center; padding: 20px;">The library is currently empty.</td></tr>';
+        }
+    }
+
+    function addInsideRow(user) {
+        removeInsideRow(user.full_reg_no);
+        insideTableBody.querySelectorAll("tr:not([data-reg])").forEach(row => row.remove());
+        const row = document.createElement("tr");
+        row.dataset.reg = user.full_reg_no;
+        ["", user.full_reg_no.slice(-5), user.name].forEach(text => {
+            const cell = document.createElement("td");
+            cell.textContent = text;
+            row.appendChild(cell);
+        });
+        insideTableBody.prepend(row);
+        renumberInsideRows();
+    }
+
+    function removeInsideRow(fullRegNo) {
+        insideTableBody.querySelectorAll("tr[data-reg]").forEach(row => {
+            if (row.dataset.reg === fullRegNo) row.remove();
+        });
+        renumberInsideRows();
+    }
+
+    let statsPoller = null;
+    function pollLiveStats() {
+        if (!statsPoller) statsPoller = setInterval(updateLiveStats, 15000); // Update every 15 seconds
+    }
+
+    function connectLiveEvents() {
+        if (!window.EventSource) return false;
+        const source = new EventSource('/events');
+        // A 503 (too many dashboards) closes the stream for good; poll instead
+        source.addEventListener('error', () => {
+            if (source.readyState === EventSource.CLOSED) pollLiveStats();
+        });
+        source.addEventListener('entry', e => addInsideRow(JSON.parse(e.data)));
+        source.addEventListener('exit', e => removeInsideRow(JSON.parse(e.data).full_reg_no));
+        source.addEventListener('stats', e => renderLiveStats(JSON.parse(e.data)));
+        // Sent when this page fell too far behind or everyone was exited at once
+        source.addEventListener('resync', () => { source.close(); window.location.reload(); });
+        return true;
+    }
+
     // --- MAIN UI INITIALIZATION ---
     function initMainUI() {
         const logo = document.getElementById("logo");
@@ -250,9 +304,11 @@ document.addEventListener("DOMContentLoaded", () => {
             }
         }
 
-        // Initial and periodic fetch for live stats
+        // Initial fetch, then live events; fall back to polling without EventSource
         updateLiveStats();
-        setInterval(updateLiveStats, 15000); // Update every 15 seconds
+        if (!connectLiveEvents()) {
+            pollLiveStats();
+        }
     }
 
     // This check ensures main UI logic only runs after successful login
@@ -1,32 +1,61 @@
-import traceback
+import hashlib
+import os
+import sys
 from datetime import datetime
 import atexit
 import pytz
 import mysql.connector
+from mysql.connector import errorcode
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask import (Flask, render_template, request, redirect, url_for, flash,
-                   get_flashed_messages, send_from_directory, jsonify)
-
-app = Flask(__name__, static_folder='.', template_folder='.')
+                   get_flashed_messages, jsonify, Response)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+import log_schema
+import metrics
+import static_assets
+from leader_lock import LeaderLock
+import directory
+from directory import DirectoryCache
+import occupancy
+from occupancy import OccupancyTracker
+import live_stats
+from live_stats import LiveStats
+from events import EventBroadcaster
+import closeout
+from scan_queue import ScanQueue
+import scan_queue
+import worker_channel
+from worker_channel import WorkerChannel
+
+app = Flask(__name__, static_folder=None, template_folder='.')
 app.secret_key = 'your_secret_key'
 app.config['DEBUG'] = True
 IST = pytz.timezone('Asia/Kolkata')
+log = metrics.install(app, 'students')
+ASSETS = static_assets.AssetPipeline(app, ['style.css', 'script.js', 'background.png', 'logo.png'])
 
 # --- DATABASE CONNECTION ---
 DB_CONFIG = {
     'host': 'localhost',
     'user': 'root',
     'password': '',  # Add your MySQL password here
-    'database': 'lib_main'
+    'database': os.environ.get('LIB_DB_NAME', 'lib_main')  # bench.py points this at its own database
 }
 
+DB_POOL = db_pool.get_pool(DB_CONFIG, name='students')
+
 def get_db_connection():
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        return DB_POOL.get()
     except mysql.connector.Error as err:
-        print(f"Database connection error: {err}")
+        log.error("database connection error", extra={'fields': {'error': str(err)}})
         return None
 
+def release_db_connection(conn):
+    DB_POOL.put(conn)
+
 def execute_query(query, params=None, fetch=False, fetch_one=False):
     conn = get_db_connection()
     if not conn:
@@ -36,51 +65,62 @@ def execute_query(query, params=None, fetch=False, fetch_one=False):
         cursor.execute(query, params or ())
         if fetch_one:
             result = cursor.fetchone()
+            cursor.fetchall()  # drain so the pooled connection can be reused
         elif fetch:
             result = cursor.fetchall()
         else:
             conn.commit()
             result = cursor.rowcount
         cursor.close()
-        conn.close()
         return result
     except mysql.connector.Error as err:
-        print(f"Query execution error: {err}")
-        if conn:
-            conn.close()
+        log.error("query execution error", extra={'fields': {'error': str(err), 'query': query.split(None, 1)[0]}})
         return None
+    finally:
+        release_db_connection(conn)
+
+# --- SCHEMA SETUP ---
+def ensure_open_log_guard():
+    """Adds logs.open_reg_no and its unique key if missing (see log_schema.py)."""
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        log_schema.ensure_open_log_guard(conn)
+    except mysql.connector.Error as err:
+        log.error("schema update failed", extra={'fields': {'error': str(err)}})
+    finally:
+        release_db_connection(conn)
 
 # --- CONDITIONAL STARTUP CLEANUP ---
 def run_startup_cleanup():
-    try:
-        scheduled_exit_hour = 16  # 4 PM
-        now = datetime.now(IST)
-        if now.hour > scheduled_exit_hour:
-            print(f"[STARTUP-CLEANUP] Server started after {scheduled_exit_hour}:00. Checking for open logs...")
-            query = "UPDATE logs SET exit_date = %s, exit_time = %s WHERE exit_date IS NULL OR exit_date = ''"
-            cleanup_datetime = now.replace(hour=23, minute=59, second=59)
-            count = execute_query("SELECT COUNT(*) as count FROM logs WHERE exit_date IS NULL OR exit_date = ''", fetch_one=True)
-            if count and count['count'] > 0:
-                print(f"[STARTUP-CLEANUP] Found {count['count']} users with open logs. Exiting them now.")
-                execute_query(query, (cleanup_datetime.date(), cleanup_datetime.time()))
-            else:
-                print("[STARTUP-CLEANUP] No open logs found to clean up.")
-        else:
-            print(f"[STARTUP-CLEANUP] Server started before scheduled exit time of {scheduled_exit_hour}:00. No cleanup needed.")
-    except Exception as e:
-        print(f"[STARTUP-CLEANUP ERROR] {e}")
+    """Closes logs left open by a server that was down at 16:30. Errors propagate to timed_job."""
+    scheduled_exit_hour = 16  # 4 PM
+    now = datetime.now(IST)
+    if now.hour <= scheduled_exit_hour:
+        log.info("startup cleanup not needed", extra={'fields': {'before_hour': scheduled_exit_hour}})
+        return
+    cleanup_datetime = now.replace(hour=23, minute=59, second=59)
+    closed = closeout.close_open_logs(
+        get_db_connection, release_db_connection,
+        cleanup_datetime.date(), cleanup_datetime.time(),
+        reason='startup_cleanup', on_batch=record_closed
+    )
+    # Audited per log in log_closeouts
+    log.info("startup cleanup finished", extra={'fields': {
+        'closed': len(closed), 'first_log_id': closed[0][0] if closed else None,
+        'last_log_id': closed[-1][0] if closed else None}})
 
 # --- USER FINDER FUNCTIONS ---
-def find_student(registry_code):
-    query = "SELECT * FROM students WHERE full_reg_no LIKE %s"
-    return execute_query(query, (f'%{registry_code}',), fetch_one=True)
+DIRECTORY = DirectoryCache(execute_query)
 
+@metrics.timed('find_student')
+def find_students(registry_code):
+    return DIRECTORY.find_student(registry_code)
+
+@metrics.timed('find_faculty')
 def find_faculty(registry_code):
-    try:
-        query = "SELECT * FROM faculty WHERE full_reg_no = %s"
-        return execute_query(query, (int(registry_code),), fetch_one=True)
-    except ValueError:
-        return None
+    return DIRECTORY.find_faculty(registry_code)
 
 def find_user_and_validate(registry_code, role):
     if not registry_code or not role:
@@ -89,7 +129,12 @@ def find_user_and_validate(registry_code, role):
     if role == 'Student':
         if not registry_code.isdigit() or len(registry_code) != 5:
             return None, "Enter a valid 5-digit code for Student."
-        user = find_student(registry_code)
+        matches = find_students(registry_code)
+        if len(matches) > 1:
+            log.warning("ambiguous student code", extra={'fields': {
+                'code': registry_code, 'full_reg_nos': [str(m['full_reg_no']) for m in matches]}})
+            return None, "More than one Student matches that code. Please contact the librarian."
+        user = matches[0] if matches else None
     elif role == 'Faculty':
         if not registry_code.isdigit() or len(registry_code) != 4:
             return None, "Enter a valid 4-digit code for Faculty."
@@ -101,101 +146,252 @@ def find_user_and_validate(registry_code, role):
     return user, None
 
 # --- LOG FUNCTIONS ---
-def get_open_log(full_reg_no):
-    query = "SELECT * FROM logs WHERE full_reg_no = %s AND (exit_date IS NULL OR exit_date = '')"
-    return execute_query(query, (str(full_reg_no),), fetch_one=True)
+OCCUPANCY = OccupancyTracker(execute_query)
+LIVE_STATS = LiveStats(execute_query, OCCUPANCY, lambda: datetime.now(IST).date())
+
+EVENTS = EventBroadcaster()
+# The other worker processes' scans reach this one's state and dashboards through here
+WORKERS = WorkerChannel()
+
+def record_entry(full_reg_no, name, role, when, log_id=None, share=True):
+    """
+    Applies a committed entry to the in-memory state and pushes it to
+    dashboards. share=False for changes that came from another worker.
+    """
+    OCCUPANCY.enter(full_reg_no, name, role, log_id)
+    LIVE_STATS.record_entry(full_reg_no, when)
+    EVENTS.publish('entry', {'full_reg_no': str(full_reg_no), 'name': name, 'role': role})
+    EVENTS.publish('stats', LIVE_STATS.snapshot())
+    if share:
+        WORKERS.publish('entry', {'full_reg_no': str(full_reg_no), 'name': name, 'role': role,
+                                  'when': when.isoformat(), 'log_id': log_id})
+
+def record_exit(full_reg_no, share=True):
+    OCCUPANCY.exit(full_reg_no)
+    LIVE_STATS.invalidate()
+    EVENTS.publish('exit', {'full_reg_no': str(full_reg_no)})
+    EVENTS.publish('stats', LIVE_STATS.snapshot())
+    if share:
+        WORKERS.publish('exit', {'full_reg_no': str(full_reg_no)})
+
+def record_closed(full_reg_nos, share=True):
+    """Applies a batch of closeout exits; dashboards resync rather than replay each one."""
+    for full_reg_no in full_reg_nos:
+        OCCUPANCY.exit(full_reg_no)
+    LIVE_STATS.invalidate()
+    EVENTS.publish('resync', {})
+    if share:
+        WORKERS.publish('closed', {'full_reg_nos': [str(r) for r in full_reg_nos]})
+
+def apply_worker_change(kind, data):
+    """Applies a change published by another worker process."""
+    if kind == 'entry':
+        record_entry(data['full_reg_no'], data['name'], data['role'], datetime.fromisoformat(data['when']),
+                     data['log_id'], share=False)
+    elif kind == 'exit':
+        record_exit(data['full_reg_no'], share=False)
+    elif kind == 'closed':
+        record_closed(data['full_reg_nos'], share=False)
+
+def resync_from_database():
+    """Rebuilds this worker's state after it missed changes from the others."""
+    OCCUPANCY.reconcile()
+    LIVE_STATS.seed()
+    EVENTS.publish('resync', {})
+
+def poll_workers():
+    WORKERS.poll(apply_worker_change, resync_from_database)
 
 def get_users_inside():
-    query = "SELECT full_reg_no, name FROM logs WHERE exit_date IS NULL OR exit_date = '' ORDER BY log_id DESC"
-    return execute_query(query, fetch=True) or []
-
-def create_entry_log(user, role):
+    return OCCUPANCY.users_inside()
+
+# --- CHECK-IN / CHECK-OUT ENGINE ---
+@metrics.timed('toggle_log')
+def toggle_log(user, role):
+    """
+    Decides entry vs. exit and writes the log in one transaction on one
+    connection. The open log is locked with FOR UPDATE and the unique
+    open_reg_no key turns a concurrent double entry into a duplicate-key
+    error, so two kiosks scanning the same ID can't both get in.
+
+    Returns (action, open_role) where action is one of 'entry', 'exit',
+    'role_mismatch', 'already_inside', 'closed', or None on a DB error.
+    If MySQL is unreachable the scan goes to SCAN_QUEUE instead.
+    """
     now = datetime.now(IST)
-    reason = "Self Study"  # Default reason
-    query = """INSERT INTO logs (full_reg_no, name, branch, year, entry_date, entry_time, role, reason)
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-    values = (
-        str(user['full_reg_no']),
-        user['name'],
-        user.get('branch', 'N/A'),
-        str(user.get('year', 'N/A')),
-        now.date(),
-        now.time(),
-        role,
-        reason
-    )
-    return execute_query(query, values)
+    full_reg_no = str(user['full_reg_no'])
+    # Scans queued during an outage must reach MySQL before any newer scan
+    if SCAN_QUEUE.pending():
+        return queue_scan(user, role, now)
+    conn = get_db_connection()
+    if not conn:
+        return queue_scan(user, role, now)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        conn.start_transaction()
+        cursor.execute("SELECT log_id, role FROM logs WHERE open_reg_no = %s FOR UPDATE", (full_reg_no,))
+        open_log = cursor.fetchone()
 
-def update_exit_log(full_reg_no):
-    now = datetime.now(IST)
-    query = "UPDATE logs SET exit_date = %s, exit_time = %s WHERE full_reg_no = %s AND (exit_date IS NULL OR exit_date = '')"
-    return execute_query(query, (now.date(), now.time(), str(full_reg_no)))
+        if open_log:
+            if open_log['role'] != role:
+                conn.rollback()
+                return 'role_mismatch', open_log['role']
+            cursor.execute("UPDATE logs SET exit_date = %s, exit_time = %s WHERE log_id = %s",
+                           (now.date(), now.time(), open_log['log_id']))
+            conn.commit()
+            record_exit(full_reg_no)
+            return 'exit', role
+
+        if now.hour < 7 or now.hour >= 20:
+            conn.rollback()
+            return 'closed', None
+        cursor.execute(
+            """INSERT INTO logs (full_reg_no, name, branch, year, entry_date, entry_time, role, reason)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+            (full_reg_no, user['name'], user.get('branch', 'N/A'), str(user.get('year', 'N/A')),
+             now.date(), now.time(), role, "Self Study")
+        )
+        conn.commit()
+        record_entry(full_reg_no, user['name'], role, now, cursor.lastrowid)
+        return 'entry', role
+    except mysql.connector.IntegrityError as err:
+        conn.rollback()
+        if err.errno == errorcode.ER_DUP_ENTRY:
+            return 'already_inside', None
+        log.error("toggle log failed", extra={'fields': {'error': str(err)}})
+        return None, None
+    except (mysql.connector.OperationalError, mysql.connector.InterfaceError) as err:
+        log.warning("toggle log failed, queueing the scan locally", extra={'fields': {'error': str(err)}})
+        return queue_scan(user, role, now)
+    except mysql.connector.Error as err:
+        log.error("toggle log failed", extra={'fields': {'error': str(err)}})
+        return None, None
+    finally:
+        release_db_connection(conn)
+
+# --- OFFLINE SCAN QUEUE ---
+SCAN_QUEUE = ScanQueue()
+
+def queue_scan(user, role, now):
+    """
+    Decides entry vs. exit from local state (the person's newest queued
+    event, else the occupancy tracker), queues the event and applies it to
+    the in-memory state right away. Same return values as toggle_log.
+    """
+    full_reg_no = str(user['full_reg_no'])
+    last = SCAN_QUEUE.last_event(full_reg_no)
+    if last:
+        inside, open_role = last['kind'] == 'entry', last['role']
+    else:
+        current = OCCUPANCY.get(full_reg_no)
+        inside, open_role = current is not None, current and current['role']
+
+    if inside:
+        if open_role != role:
+            return 'role_mismatch', open_role
+        SCAN_QUEUE.append('exit', user, role, now)
+        record_exit(full_reg_no)
+        return 'exit', role
+
+    if now.hour < 7 or now.hour >= 20:
+        return 'closed', None
+    SCAN_QUEUE.append('entry', user, role, now)
+    record_entry(full_reg_no, user['name'], role, now)
+    return 'entry', role
+
+def flush_scan_queue():
+    SCAN_QUEUE.flush(get_db_connection, release_db_connection)
 
 def check_password(user_id, password):
     query = "SELECT * FROM password WHERE id = %s AND pass = %s"
     return bool(execute_query(query, (user_id, password), fetch_one=True))
 
 # --- STATS FUNCTIONS ---
-def get_live_stats():
-    today = datetime.now(IST).date()
-
-    total_entries_query = "SELECT COUNT(*) as count FROM logs WHERE entry_date = %s"
-    total_entries_result = execute_query(total_entries_query, (today,), fetch_one=True)
-    total_entries_today = total_entries_result['count'] if total_entries_result else 0
-
-    unique_visitors_query = "SELECT COUNT(DISTINCT full_reg_no) as count FROM logs WHERE entry_date = %s"
-    unique_visitors_result = execute_query(unique_visitors_query, (today,), fetch_one=True)
-    unique_visitors_today = unique_visitors_result['count'] if unique_visitors_result else 0
-
-    inside_query = "SELECT COUNT(*) as count FROM logs WHERE exit_date IS NULL OR exit_date = ''"
-    inside_result = execute_query(inside_query, fetch_one=True)
-    currently_inside = inside_result['count'] if inside_result else 0
-
-    peak_hour_query = """SELECT HOUR(entry_time) as hour, COUNT(log_id) as count
-                         FROM logs WHERE entry_date = %s
-                         GROUP BY HOUR(entry_time) ORDER BY count DESC, hour DESC LIMIT 1"""
-    peak_hour_result = execute_query(peak_hour_query, (today,), fetch_one=True)
-    peak_hour_str = "N/A"
-    if peak_hour_result and peak_hour_result['hour'] is not None:
-        hour = int(peak_hour_result['hour'])
-        if hour == 0:
-            peak_hour_str = "12 AM"
-        elif hour < 12:
-            peak_hour_str = f"{hour} AM"
-        elif hour == 12:
-            peak_hour_str = "12 PM"
-        else:
-            peak_hour_str = f"{hour - 12} PM"
-
-    return {
-        "total_entries_today": total_entries_today,
-        "unique_visitors_today": unique_visitors_today,
-        "currently_inside": currently_inside,
-        "peak_hour_today": peak_hour_str
-    }
+@metrics.timed('get_live_stats')
+def get_live_stats(as_json=False):
+    return LIVE_STATS.cached_json() if as_json else LIVE_STATS.snapshot()
 
 # --- AUTO EXIT SCHEDULER ---
 def auto_exit_users():
-    try:
-        now = datetime.now(IST)
-        query = "UPDATE logs SET exit_date = %s, exit_time = %s WHERE exit_date IS NULL OR exit_date = ''"
-        count = execute_query(query, (now.date(), now.time()))
-        if count and count > 0:
-            print(f"[AUTO-EXIT] {count} users exited automatically at 16:30 IST.")
-        else:
-            print("[AUTO-EXIT] No open logs found at 16:30 IST.")
-    except Exception as e:
-        print(f"[AUTO-EXIT ERROR] {e}")
+    """Closes every open log at 16:30 IST. Errors propagate to timed_job."""
+    now = datetime.now(IST)
+    closed = closeout.close_open_logs(
+        get_db_connection, release_db_connection, now.date(), now.time(),
+        reason='auto_exit_16_30', on_batch=record_closed
+    )
+    # Audited per log in log_closeouts
+    log.info("auto-exit finished", extra={'fields': {'closed': len(closed)}})
+
+# --- SCHEDULER ---
+# Cache-maintenance jobs run in every process; jobs that write to the
+# database only run in the process holding LEADER, so a multi-worker
+# server still auto-exits exactly once.
+LEADER = LeaderLock()
+LEADER_ELECTION_INTERVAL = 60  # seconds
+
+def reconcile_occupancy():
+    # Writes from outside the gate (admin edits), and worker changes this process missed, only reach it here.
+    # Queued scans aren't in the database yet, so wait until they are replayed.
+    if SCAN_QUEUE.pending():
+        return
+    if OCCUPANCY.reconcile():
+        LIVE_STATS.invalidate()
+        EVENTS.publish('resync', {})
+
+def elect_scheduler_leader(startup=False):
+    if LEADER.held or not LEADER.try_acquire():
+        return False
+    log.info("elected to run database jobs")
+    ensure_open_log_guard()
+    closeout.ensure_closeouts_table(execute_query)
+    scan_queue.ensure_event_keys_table(execute_query)
+    if startup:
+        # One-off run on the scheduler, so a failure is counted in JOB_FAILURES like the others
+        scheduler.add_job(metrics.timed_job('startup_cleanup', run_startup_cleanup), id='startup_cleanup_job',
+                          replace_existing=True)
+    scheduler.add_job(metrics.timed_job('auto_exit', auto_exit_users), trigger='cron', hour=16, minute=30, id='auto_exit_job', replace_existing=True)
+    scheduler.add_job(metrics.timed_job('scan_queue_flush', flush_scan_queue), trigger='interval', seconds=scan_queue.FLUSH_INTERVAL,
+                      id='scan_queue_flush_job', replace_existing=True)
+    scheduler.add_job(metrics.timed_job('worker_channel_prune', WORKERS.prune), trigger='interval', seconds=worker_channel.PRUNE_INTERVAL,
+                      id='worker_channel_prune_job', replace_existing=True)
+    return True
 
 try:
     scheduler = BackgroundScheduler(timezone=IST)
-    scheduler.add_job(auto_exit_users, trigger='cron', hour=16, minute=30, id='auto_exit_job')
+    scheduler.add_job(metrics.timed_job('occupancy_reconcile', reconcile_occupancy), trigger='interval', seconds=occupancy.RECONCILE_INTERVAL, id='occupancy_reconcile_job')
+    scheduler.add_job(metrics.timed_job('live_stats_reseed', LIVE_STATS.seed), trigger='interval', seconds=live_stats.RESEED_INTERVAL, id='live_stats_reseed_job')
+    scheduler.add_job(metrics.timed_job('directory_refresh', DIRECTORY.refresh), trigger='interval', seconds=directory.REFRESH_INTERVAL, id='directory_refresh_job')
+    scheduler.add_job(metrics.timed_job('worker_channel_poll', poll_workers), trigger='interval', seconds=worker_channel.POLL_INTERVAL, id='worker_channel_poll_job')
+    scheduler.add_job(elect_scheduler_leader, trigger='interval', seconds=LEADER_ELECTION_INTERVAL, id='leader_election_job')
     scheduler.start()
     atexit.register(lambda: scheduler.shutdown())
-except Exception as e:
-    print(f"Scheduler initialization error: {e}")
+except Exception:
+    log.exception("scheduler initialization error")
+
+def init_app():
+    """Per-process startup: elect a leader for database jobs, then warm the caches."""
+    elect_scheduler_leader(startup=True)
+    DIRECTORY.load()
+    OCCUPANCY.seed()
+    LIVE_STATS.seed()
 
 # --- ROUTES ---
+@app.route('/pool-metrics')
+def pool_metrics():
+    return jsonify(db_pool.pool_metrics())
+
+@app.route('/scan-queue-metrics')
+def scan_queue_metrics():
+    return jsonify(SCAN_QUEUE.metrics())
+
+@app.route('/worker-channel-metrics')
+def worker_channel_metrics():
+    return jsonify(WORKERS.metrics())
+
+@app.route('/directory-metrics')
+def directory_metrics():
+    return jsonify(dict(DIRECTORY.metrics(), collisions_detail=DIRECTORY.collisions()))
+
 @app.route('/')
 def index():
     try:
@@ -206,9 +402,62 @@ def index():
             toast_type, toast_message = messages[0]
         return render_template('index.html', toast_message=toast_message, toast_type=toast_type, users_inside=users_inside)
     except Exception as e:
-        print(f"Index route error: {e}")
+        log.exception("index route error")
         return f"Error: {str(e)}"
 
+@app.route('/stats')
+@app.route('/api/stats')
+def stats():
+    # Served from in-memory counters; unchanged payloads answer 304 via ETag
+    payload = get_live_stats(as_json=True)
+    response = app.response_class(payload, mimetype='application/json')
+    response.set_etag(hashlib.md5(payload.encode('utf-8')).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/check-status', methods=['POST'])
+def check_status():
+    """Pre-submit check used by the kiosk: validates the code against the directory cache."""
+    registry_code = request.form.get('registry_last_digits', '').strip()
+    role = request.form.get('role', '').strip()
+    user, error = find_user_and_validate(registry_code, role)
+    if error:
+        return jsonify({"success": False, "error": error})
+    return jsonify({
+        "success": True,
+        "name": user['name'],
+        "inside": OCCUPANCY.is_inside(user['full_reg_no']),
+    })
+
+@app.route('/events')
+def events_stream():
+    client = EVENTS.subscribe()
+    if client is None:
+        return jsonify({"error": "Too many live dashboards connected."}), 503
+
+    def stream():
+        try:
+            yield from EVENTS.listen(client)
+        finally:
+            EVENTS.unsubscribe(client)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def scan_message(action, open_role, user):
+    """(message, category) shown on the kiosk for a toggle_log result."""
+    if action == 'exit':
+        return f"Goodbye! {user['name']} exited the library.", "success"
+    if action == 'entry':
+        return f"Welcome! {user['name']} entered the library.", "success"
+    if action == 'role_mismatch':
+        return f"Exit denied. You entered as {open_role} and must exit with the same role.", "error"
+    if action == 'already_inside':
+        return f"{user['name']} is already inside. Cannot enter again without exiting!", "error"
+    if action == 'closed':
+        return "Library closed. Hours: 7 AM - 8 PM", "error"
+    return "Could not record the scan. Please try again.", "error"
+
 @app.route('/check', methods=['POST'])
 def check_user():
     try:
@@ -224,44 +473,18 @@ def check_user():
             flash(error, "error")
             return redirect(url_for('index'))
 
-        open_log = get_open_log(user['full_reg_no'])
-
-        if open_log:
-            # User inside → Exit
-            if open_log['role'] != role:
-                flash(f"Exit denied. You entered as {open_log['role']} and must exit with the same role.", "error")
-                return redirect(url_for('index'))
-            update_exit_log(user['full_reg_no'])
-            flash(f"Goodbye! {user['name']} exited the library.", "success")
-        else:
-            # User outside → Entry
-            # Strictly check no open log exists before entry to prevent duplicates
-            existing_open_log = execute_query(
-                "SELECT * FROM logs WHERE full_reg_no = %s AND (exit_date IS NULL OR exit_date = '')",
-                (str(user['full_reg_no']),),
-                fetch_one=True
-            )
-            if existing_open_log:
-                flash(f"{user['name']} is already inside. Cannot enter again without exiting!", "error")
-                return redirect(url_for('index'))
-
-            now = datetime.now(IST)
-            if now.hour < 7 or now.hour >= 20:
-                flash("Library closed. Hours: 7 AM - 8 PM", "error")
-                return redirect(url_for('index'))
-
-            create_entry_log(user, role)
-            flash(f"Welcome! {user['name']} entered the library.", "success")
-
+        action, open_role = toggle_log(user, role)
+        flash(*scan_message(action, open_role, user))
         return redirect(url_for('index'))
 
-    except Exception as e:
-        print(f"Error in /check route: {e}")
-        traceback.print_exc()
+    except Exception:
+        log.exception("check route error")
         flash("An unexpected error occurred. Please try again.", "error")
         return redirect(url_for('index'))
 
 # --- MAIN EXECUTION BLOCK ---
+# Development server; use ../serve.py for the multi-worker production mode
+# (or `serve.py students --async` for the ASGI mode in students_asgi.py).
 if __name__ == '__main__':
-    run_startup_cleanup()
+    init_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,248 @@
+"""
+ASGI serving mode for the student gate app.
+
+    python serve.py students --async [--workers 2]
+
+students.py gives every request a thread, and that thread blocks on
+mysql.connector for the whole scan. This module serves the same kiosk
+routes as a Quart app on one event loop:
+  /, /check, /check-status, /stats, /api/stats, /events,
+  the static assets and the metrics endpoints.
+The scan transaction runs on aiomysql's connection pool. A slow query
+parks a coroutine rather than a thread, so one process can keep hundreds
+of kiosk and dashboard connections open.
+
+Everything else comes from students.py, which is imported unchanged:
+  - the directory, occupancy and live-stats caches;
+  - the offline scan queue;
+  - the change feed between worker processes (worker_channel.py);
+  - leader election and the scheduler jobs.
+Those jobs still use the blocking db_pool, on the scheduler's own
+threads. Directory lookups, scan-queue reads and writes, and the
+occupancy and live-stats reads (which seed themselves from MySQL when
+cold) can reach MySQL or the disk, so they run through asyncio.to_thread
+to keep the loop free.
+"""
+import asyncio
+import hashlib
+import os
+import sys
+from datetime import datetime
+
+import aiomysql
+import pymysql
+from pymysql.constants import ER
+from quart import (Quart, render_template, request, redirect, url_for, flash,
+                   get_flashed_messages, jsonify, Response)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+import metrics
+import students
+
+app = Quart(__name__, static_folder=None, template_folder='.')
+app.secret_key = students.app.secret_key  # flash cookies stay valid across serving modes
+log = metrics.install_async(app, 'students')
+students.ASSETS.register_async(app)
+
+# --- ASYNC DATABASE POOL ---
+ASYNC_POOL_SIZE = int(os.environ.get('LIB_ASYNC_DB_POOL_SIZE', 20))
+DB_POOL = None  # aiomysql pool; it has to be created inside the serving loop
+
+@app.before_serving
+async def startup():
+    global DB_POOL
+    config = students.DB_CONFIG
+    # minsize=0: like db_pool, connect on first use so a MySQL outage doesn't stop the server starting
+    DB_POOL = await aiomysql.create_pool(
+        host=config['host'], user=config['user'], password=config['password'], db=config['database'],
+        minsize=0, maxsize=ASYNC_POOL_SIZE, autocommit=True, pool_recycle=int(db_pool.POOL_RECYCLE)
+    )
+    await asyncio.to_thread(students.init_app)
+
+@app.after_serving
+async def shutdown():
+    DB_POOL.close()
+    await DB_POOL.wait_closed()
+
+async def get_db_connection():
+    try:
+        return await asyncio.wait_for(DB_POOL.acquire(), db_pool.POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        log.error("database connection error", extra={'fields': {'error': 'no free connection in the async pool'}})
+        return None
+    except (pymysql.err.Error, OSError) as err:
+        log.error("database connection error", extra={'fields': {'error': str(err)}})
+        return None
+
+def release_db_connection(conn):
+    # The pool closes connections released mid-transaction instead of reusing them
+    DB_POOL.release(conn)
+
+# --- CHECK-IN / CHECK-OUT ENGINE ---
+@metrics.timed('toggle_log')
+async def toggle_log(user, role):
+    """students.toggle_log on the async pool: same locking, return values and offline fallback."""
+    now = datetime.now(students.IST)
+    full_reg_no = str(user['full_reg_no'])
+    # Scans queued during an outage must reach MySQL before any newer scan
+    if await asyncio.to_thread(students.SCAN_QUEUE.pending):
+        return await asyncio.to_thread(students.queue_scan, user, role, now)
+    conn = await get_db_connection()
+    if not conn:
+        return await asyncio.to_thread(students.queue_scan, user, role, now)
+    try:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await conn.begin()
+            await cursor.execute("SELECT log_id, role FROM logs WHERE open_reg_no = %s FOR UPDATE", (full_reg_no,))
+            open_log = await cursor.fetchone()
+
+            if open_log:
+                if open_log['role'] != role:
+                    await conn.rollback()
+                    return 'role_mismatch', open_log['role']
+                await cursor.execute("UPDATE logs SET exit_date = %s, exit_time = %s WHERE log_id = %s",
+                                     (now.date(), now.time(), open_log['log_id']))
+                await conn.commit()
+                await asyncio.to_thread(students.record_exit, full_reg_no)
+                return 'exit', role
+
+            if now.hour < 7 or now.hour >= 20:
+                await conn.rollback()
+                return 'closed', None
+            await cursor.execute(
+                """INSERT INTO logs (full_reg_no, name, branch, year, entry_date, entry_time, role, reason)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                (full_reg_no, user['name'], user.get('branch', 'N/A'), str(user.get('year', 'N/A')),
+                 now.date(), now.time(), role, "Self Study")
+            )
+            await conn.commit()
+            # The stats snapshot it publishes may reseed at midnight
+            await asyncio.to_thread(students.record_entry, full_reg_no, user['name'], role, now, cursor.lastrowid)
+            return 'entry', role
+    except pymysql.err.IntegrityError as err:
+        await conn.rollback()
+        if err.args[0] == ER.DUP_ENTRY:
+            return 'already_inside', None
+        log.error("toggle log failed", extra={'fields': {'error': str(err)}})
+        return None, None
+    except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as err:
+        log.warning("toggle log failed, queueing the scan locally", extra={'fields': {'error': str(err)}})
+        conn.close()
+        return await asyncio.to_thread(students.queue_scan, user, role, now)
+    except pymysql.err.Error as err:
+        log.error("toggle log failed", extra={'fields': {'error': str(err)}})
+        return None, None
+    finally:
+        release_db_connection(conn)
+
+# --- ROUTES ---
+@app.route('/pool-metrics')
+async def pool_metrics():
+    pools = db_pool.pool_metrics()
+    if DB_POOL is not None:
+        pools['students_async'] = {'name': 'students_async', 'size': DB_POOL.maxsize,
+                                   'open': DB_POOL.size, 'idle': DB_POOL.freesize}
+    return jsonify(pools)
+
+@app.route('/scan-queue-metrics')
+async def scan_queue_metrics():
+    return jsonify(await asyncio.to_thread(students.SCAN_QUEUE.metrics))
+
+@app.route('/worker-channel-metrics')
+async def worker_channel_metrics():
+    return jsonify(students.WORKERS.metrics())
+
+@app.route('/directory-metrics')
+async def directory_metrics():
+    return jsonify(dict(students.DIRECTORY.metrics(), collisions_detail=students.DIRECTORY.collisions()))
+
+@app.route('/')
+async def index():
+    try:
+        # Seeds the occupancy tracker from MySQL on first use, so keep it off the loop
+        users_inside = await asyncio.to_thread(students.get_users_inside)
+        messages = get_flashed_messages(with_categories=True)
+        toast_message, toast_type = ('', 'info')
+        if messages:
+            toast_type, toast_message = messages[0]
+        return await render_template('index.html', toast_message=toast_message, toast_type=toast_type,
+                                     users_inside=users_inside)
+    except Exception as e:
+        log.exception("index route error")
+        return f"Error: {str(e)}"
+
+@app.route('/stats')
+@app.route('/api/stats')
+async def stats():
+    # Served from in-memory counters; unchanged payloads answer 304 via ETag.
+    # A rollover or an unseeded tracker reads MySQL, hence the thread.
+    payload = await asyncio.to_thread(students.get_live_stats, as_json=True)
+    response = Response(payload, mimetype='application/json')
+    response.set_etag(hashlib.md5(payload.encode('utf-8')).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    return await response.make_conditional(request)
+
+@app.route('/check-status', methods=['POST'])
+async def check_status():
+    """Pre-submit check used by the kiosk: validates the code against the directory cache."""
+    form = await request.form
+    registry_code = form.get('registry_last_digits', '').strip()
+    role = form.get('role', '').strip()
+    user, error = await asyncio.to_thread(students.find_user_and_validate, registry_code, role)
+    if error:
+        return jsonify({"success": False, "error": error})
+    return jsonify({
+        "success": True,
+        "name": user['name'],
+        "inside": students.OCCUPANCY.is_inside(user['full_reg_no']),
+    })
+
+@app.route('/events')
+async def events_stream():
+    # A waiting dashboard is a parked coroutine, not a thread blocked on a queue
+    client = students.EVENTS.subscribe(asyncio.get_running_loop())
+    if client is None:
+        return jsonify({"error": "Too many live dashboards connected."}), 503
+
+    async def stream():
+        try:
+            async for frame in students.EVENTS.alisten(client):
+                yield frame.encode('utf-8')
+        finally:
+            students.EVENTS.unsubscribe(client)
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None  # stays open as long as the dashboard does
+    return response
+
+@app.route('/check', methods=['POST'])
+async def check_user():
+    try:
+        form = await request.form
+        registry_code = form.get('registry_last_digits', '').strip()
+        role = form.get('role', '').strip()
+
+        if not role:
+            await flash("Please select a role.", "error")
+            return redirect(url_for('index'))
+
+        user, error = await asyncio.to_thread(students.find_user_and_validate, registry_code, role)
+        if error:
+            await flash(error, "error")
+            return redirect(url_for('index'))
+
+        action, open_role = await toggle_log(user, role)
+        await flash(*students.scan_message(action, open_role, user))
+        return redirect(url_for('index'))
+
+    except Exception:
+        log.exception("check route error")
+        await flash("An unexpected error occurred. Please try again.", "error")
+        return redirect(url_for('index'))
+
+# --- MAIN EXECUTION BLOCK ---
+# Development server; use `../serve.py students --async` in production.
+if __name__ == '__main__':
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,130 @@
+"""
+Change feed that keeps the gate's worker processes in step.
+
+Each worker keeps its own occupancy tracker, live counters and dashboard
+subscribers in memory. When a worker applies a scan it also appends the
+change to a small SQLite log in the data directory, next to the scan
+queue. Every worker tails that log on a POLL_INTERVAL job and applies the
+other workers' changes to its own state and dashboards, so a scan shows up
+on every dashboard within about a second whichever worker served it.
+
+The feed lives on local disk rather than in MySQL so that scans queued
+during a MySQL outage still reach the other workers. It is not a source of
+truth: the periodic occupancy reconcile and live-stats reseed still
+correct anything a worker missed (a feed it couldn't read, rows pruned
+before it caught up), as they do for writes made outside the gate.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+from scan_queue import DATA_DIR
+
+log = metrics.get_logger('students.worker_channel')
+
+CHANNEL_PATH = os.environ.get('LIB_WORKER_CHANNEL', os.path.join(DATA_DIR, 'worker_channel.sqlite3'))
+POLL_INTERVAL = 1       # seconds between reads of the feed
+POLL_BATCH_SIZE = 500
+RETAIN_SECONDS = 600    # changes older than this are pruned by the leader
+PRUNE_INTERVAL = 60
+
+CHANNEL_TABLE = """
+    CREATE TABLE IF NOT EXISTS worker_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        origin TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+"""
+
+
+class WorkerChannel:
+    def __init__(self, path=CHANNEL_PATH):
+        self.path = path
+        # Unique per process, and per import of this module after a fork
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._poll_lock = threading.Lock()
+        self.stats = {'published': 0, 'applied': 0, 'gaps': 0, 'errors': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(CHANNEL_TABLE)
+            # A new worker seeds its state from MySQL, so it only needs changes from here on.
+            # sqlite_sequence still holds the last seq after everything has been pruned.
+            self._last_seq = db.execute(
+                "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'worker_changes'), 0)").fetchone()[0]
+        finally:
+            db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        # Losing the newest changes in a power cut is fine; reconcile repairs state
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def publish(self, kind, data):
+        """Appends a change for the other workers. Never raises: a lost change is repaired by reconcile."""
+        try:
+            db = self._connect()
+            try:
+                db.execute("INSERT INTO worker_changes (origin, kind, data, created_at) VALUES (?, ?, ?, ?)",
+                           (self.origin, kind, json.dumps(data, default=str), time.time()))
+            finally:
+                db.close()
+            self.stats['published'] += 1
+        except sqlite3.Error as err:
+            self.stats['errors'] += 1
+            log.warning("could not publish change to other workers", extra={'fields': {'kind': kind, 'error': str(err)}})
+
+    def poll(self, apply, on_gap):
+        """
+        Calls apply(kind, data) for every change other workers published
+        since the last poll, oldest first. If some were pruned before this
+        worker read them, on_gap() is called first so it can resync from
+        MySQL. Returns how many were applied.
+        """
+        if not self._poll_lock.acquire(blocking=False):
+            return 0
+        applied = 0
+        try:
+            while True:
+                db = self._connect()
+                try:
+                    rows = db.execute(
+                        "SELECT seq, origin, kind, data FROM worker_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                        (self._last_seq, POLL_BATCH_SIZE)).fetchall()
+                finally:
+                    db.close()
+                if not rows:
+                    break
+                if rows[0][0] != self._last_seq + 1:
+                    self.stats['gaps'] += 1
+                    on_gap()
+                for seq, origin, kind, data in rows:
+                    self._last_seq = seq
+                    if origin != self.origin:
+                        apply(kind, json.loads(data))
+                        applied += 1
+                if len(rows) < POLL_BATCH_SIZE:
+                    break
+        finally:
+            self._poll_lock.release()
+        self.stats['applied'] += applied
+        return applied
+
+    def prune(self, keep_seconds=RETAIN_SECONDS):
+        db = self._connect()
+        try:
+            return db.execute("DELETE FROM worker_changes WHERE created_at < ?",
+                              (time.time() - keep_seconds,)).rowcount
+        finally:
+            db.close()
+
+    def metrics(self):
+        return dict(self.stats, origin=self.origin, last_seq=self._last_seq, path=self.path)
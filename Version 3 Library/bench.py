@@ -0,0 +1,384 @@
+"""
+Benchmark and load-test harness for the gate and the admin reports.
+
+    python bench.py seed    [--students 20000] [--faculty 300] [--years 5] [--visits-per-day 400]
+    python bench.py load    [--scans 2000] [--reports 20] [--concurrency 16] [--url ... --admin-url ...]
+    python bench.py profile [--days 90] [--import-rows 5000]
+
+Everything runs against a separate MySQL database (LIB_DB_NAME, default
+`lib_bench`) on the local server, never `lib_main`. `seed` creates it with
+synthetic students, faculty and closed logs going back `--years`.
+
+`load` drives concurrent /check scans and report downloads and prints
+p50/p95/p99 latency and throughput per endpoint. By default the apps run
+in-process through Flask's test client (no server needed); pass --url and
+--admin-url to load a running `serve.py` deployment over HTTP instead.
+The gate only records entries between 07:00 and 20:00 IST, so outside
+those hours /check measures the "library closed" path.
+
+`profile` runs get_log_data, import_students and get_live_stats under
+cProfile and prints the most expensive calls.
+
+An SQLite stand-in was not used: the apps rely on MySQL-only SQL
+(generated columns, FOR UPDATE, DATE_FORMAT, INSERT ... ON DUPLICATE KEY),
+so timings against anything else would not reflect production.
+"""
+import argparse
+import cProfile
+import importlib
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import mysql.connector
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DB = os.environ.setdefault('LIB_DB_NAME', 'lib_bench')
+# Keep in-process apps away from a production deployment's lock and queue files
+os.environ.setdefault('LIB_SCHEDULER_LOCK', os.path.join(tempfile.gettempdir(), 'lib_bench_scheduler.lock'))
+os.environ.setdefault('LIB_ADMIN_SCHEDULER_LOCK', os.path.join(tempfile.gettempdir(), 'lib_bench_admin_scheduler.lock'))
+os.environ.setdefault('LIB_SCAN_QUEUE', os.path.join(tempfile.gettempdir(), 'lib_bench_scan_queue.sqlite3'))
+
+SERVER_CONFIG = {'host': 'localhost', 'user': 'root', 'password': ''}
+BRANCHES = ['CSE', 'IT', 'ECE', 'EE', 'ME', 'CE', 'AI', 'DS']
+INSERT_BATCH = 5000
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS students (
+           full_reg_no VARCHAR(20) PRIMARY KEY,
+           name VARCHAR(100),
+           branch VARCHAR(50),
+           year INT CHECK (year BETWEEN 1 AND 5),
+           email VARCHAR(255) CHECK(email LIKE '%@poornima.edu.in'),
+           updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+           KEY idx_students_updated_at (updated_at)
+       ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS faculty (
+           full_reg_no INT PRIMARY KEY,
+           name VARCHAR(100),
+           branch VARCHAR(50),
+           email VARCHAR(255),
+           updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+       ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS logs (
+           log_id INT AUTO_INCREMENT PRIMARY KEY,
+           full_reg_no VARCHAR(20),
+           name VARCHAR(100),
+           branch VARCHAR(50),
+           year VARCHAR(10),
+           entry_date DATE,
+           entry_time TIME,
+           exit_date DATE,
+           exit_time TIME,
+           role VARCHAR(20),
+           reason VARCHAR(100)
+       ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS password (
+           id VARCHAR(50) PRIMARY KEY,
+           pass VARCHAR(100)
+       ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+]
+
+
+# --- SEEDING ---
+def student_rows(count, rng):
+    # Last five characters are unique digits, which is what the kiosk matches on
+    codes = np.arange(10000, 10000 + count)
+    years = rng.integers(1, 5, size=count)
+    branches = rng.choice(BRANCHES, size=count).tolist()
+    return [(f"{date.today().year - int(y)}PU{b}{c}", f"Student {c}", b, int(y), f"s{c}@poornima.edu.in")
+            for c, y, b in zip(codes, years, branches)]
+
+
+def faculty_rows(count, rng):
+    branches = rng.choice(BRANCHES, size=count).tolist()
+    return [(1000 + i, f"Faculty {1000 + i}", b, f"f{1000 + i}@poornima.edu.in") for i, b in enumerate(branches)]
+
+
+def log_batches(people, years, visits_per_day, rng):
+    """Yields batches of closed log rows, one day at a time, oldest first."""
+    today = date.today()
+    day = today - timedelta(days=365 * years)
+    batch = []
+    while day < today:
+        visits = rng.poisson(visits_per_day)
+        who = rng.integers(0, len(people), size=visits)
+        entry_min = np.sort(rng.integers(7 * 60, 19 * 60, size=visits))
+        exit_min = np.minimum(entry_min + rng.exponential(90, size=visits).astype(int) + 5, 20 * 60 - 1)
+        for person, entry, exit_ in zip(who, entry_min, exit_min):
+            reg_no, name, branch, year, role = people[person]
+            batch.append((reg_no, name, branch, year, day, timedelta(minutes=int(entry)),
+                          day, timedelta(minutes=int(exit_)), role, "Self Study"))
+        if len(batch) >= INSERT_BATCH:
+            yield batch
+            batch = []
+        day += timedelta(days=1)
+    if batch:
+        yield batch
+
+
+def seed(args):
+    if BENCH_DB == 'lib_main':
+        sys.exit("Refusing to seed lib_main; set LIB_DB_NAME to a scratch database.")
+    rng = np.random.default_rng(args.seed)
+    conn = mysql.connector.connect(**SERVER_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{BENCH_DB}`")
+    cursor.execute(f"CREATE DATABASE `{BENCH_DB}` DEFAULT CHARSET utf8mb4")
+    cursor.execute(f"USE `{BENCH_DB}`")
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+    started = time.perf_counter()
+    students = student_rows(args.students, rng)
+    faculty = faculty_rows(args.faculty, rng)
+    for start in range(0, len(students), INSERT_BATCH):
+        cursor.executemany("INSERT INTO students (full_reg_no, name, branch, year, email) VALUES (%s, %s, %s, %s, %s)",
+                           students[start:start + INSERT_BATCH])
+    cursor.executemany("INSERT INTO faculty (full_reg_no, name, branch, email) VALUES (%s, %s, %s, %s)", faculty)
+    cursor.execute("INSERT INTO password (id, pass) VALUES ('admin', 'admin')")
+    conn.commit()
+
+    people = ([(r[0], r[1], r[2], str(r[3]), 'Student') for r in students]
+              + [(str(r[0]), r[1], r[2], 'N/A', 'Faculty') for r in faculty])
+    logs = 0
+    for batch in log_batches(people, args.years, args.visits_per_day, rng):
+        cursor.executemany(
+            """INSERT INTO logs (full_reg_no, name, branch, year, entry_date, entry_time,
+                                 exit_date, exit_time, role, reason)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+            batch
+        )
+        conn.commit()
+        logs += len(batch)
+        print(f"\r[SEED] {logs} logs...", end='', flush=True)
+    cursor.close()
+    conn.close()
+    print(f"\n[SEED] {BENCH_DB}: {len(students)} students, {len(faculty)} faculty, {logs} logs "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+# --- IN-PROCESS APPS ---
+def load_module(folder, name):
+    sys.path.insert(0, os.path.join(BASE_DIR, folder))
+    return importlib.import_module(name)
+
+
+def load_apps():
+    students = load_module('Students', 'students')
+    admin = load_module('Admin', 'admin')
+    students.init_app()
+    admin.init_app()
+    return students, admin
+
+
+# --- LOAD TEST ---
+class InProcessClient:
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def request(self, method, path, data=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(path, method=method, data=data)
+        size = len(response.get_data())
+        return response.status_code, size
+
+
+class HttpClient:
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(self._NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self._opener.open(req, timeout=120) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+
+def run_requests(client, requests_, concurrency):
+    """Runs (label, method, path, data) requests concurrently; returns per-request results."""
+    def one(item):
+        label, method, path, data = item
+        started = time.perf_counter()
+        try:
+            status, size = client.request(method, path, data)
+        except Exception as e:
+            status, size = f"error: {type(e).__name__}", 0
+        return label, status, size, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, requests_))
+    return results, time.perf_counter() - started
+
+
+def summarize(title, results, wall_seconds):
+    df = pd.DataFrame(results, columns=['label', 'status', 'bytes', 'seconds'])
+    print(f"\n== {title}: {len(df)} requests in {wall_seconds:.2f}s "
+          f"({len(df) / wall_seconds:.1f} req/s) ==")
+    rows = []
+    for label, group in df.groupby('label'):
+        ms = group['seconds'].to_numpy() * 1000
+        rows.append({
+            'endpoint': label,
+            'n': len(group),
+            'p50_ms': round(float(np.percentile(ms, 50)), 1),
+            'p95_ms': round(float(np.percentile(ms, 95)), 1),
+            'p99_ms': round(float(np.percentile(ms, 99)), 1),
+            'max_ms': round(float(ms.max()), 1),
+            'avg_kb': round(group['bytes'].mean() / 1024, 1),
+            'statuses': dict(group['status'].astype(str).value_counts()),
+        })
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+def scan_requests(count, rng, student_codes, faculty_codes):
+    requests_ = []
+    for _ in range(count):
+        if rng.random() < 0.9:
+            data = {'registry_last_digits': str(rng.choice(student_codes)), 'role': 'Student'}
+        else:
+            data = {'registry_last_digits': str(rng.choice(faculty_codes)), 'role': 'Faculty'}
+        label = '/check' if rng.random() < 0.8 else '/check-status'
+        requests_.append((label, 'POST', label, data))
+    return requests_
+
+
+def report_requests(count, rng):
+    today = date.today()
+    makers = [
+        lambda d: ('/report/daily_student_count', f"/report/daily_student_count?date={d}"),
+        lambda d: ('/report/daily_summary', f"/report/daily_summary?date={d}"),
+        lambda d: ('/report/weekly_summary', f"/report/weekly_summary?date={d}"),
+        lambda d: ('/report/range_summary', f"/report/range_summary?start={d - timedelta(days=30)}&end={d}"),
+        lambda d: ('/report/occupancy_analytics',
+                   f"/report/occupancy_analytics?start={d - timedelta(days=7)}&end={d}"),
+    ]
+    requests_ = []
+    for _ in range(count):
+        day = today - timedelta(days=int(rng.integers(0, 365)))
+        label, path = makers[int(rng.integers(0, len(makers)))](day)
+        requests_.append((label, 'GET', path, None))
+    requests_.append(('/report/full_log_dump (csv.gz)', 'GET', '/report/full_log_dump?format=csv.gz', None))
+    return requests_
+
+
+def directory_codes():
+    conn = mysql.connector.connect(database=BENCH_DB, **SERVER_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT RIGHT(full_reg_no, 5) FROM students")
+    students = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT full_reg_no FROM faculty")
+    faculty = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return students, faculty
+
+
+def load(args):
+    rng = np.random.default_rng(args.seed)
+    student_codes, faculty_codes = directory_codes()
+    if args.url:
+        gate, reports = HttpClient(args.url), HttpClient(args.admin_url or args.url)
+    else:
+        students, admin = load_apps()
+        gate, reports = InProcessClient(students.app), InProcessClient(admin.app)
+
+    results, wall = run_requests(gate, scan_requests(args.scans, rng, student_codes, faculty_codes),
+                                 args.concurrency)
+    summarize("Gate scans", results, wall)
+    results, wall = run_requests(reports, report_requests(args.reports, rng), args.report_concurrency)
+    summarize("Admin reports", results, wall)
+
+
+# --- PROFILING ---
+def profiled(label, func, *args, **kwargs):
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    result = profiler.runcall(func, *args, **kwargs)
+    elapsed = time.perf_counter() - started
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(15)
+    print(f"\n== {label}: {elapsed * 1000:.1f} ms ==")
+    print(out.getvalue())
+    return result
+
+
+def profile(args):
+    students, admin = load_apps()
+    importer = load_module('Admin', 'import')
+    end = date.today()
+    start = end - timedelta(days=args.days)
+
+    df = profiled(f"get_log_data ({args.days} days)", admin.get_log_data, start, end)
+    print(f"   -> {0 if df is None else len(df)} rows")
+
+    rng = np.random.default_rng(args.seed)
+    sheet = pd.DataFrame(student_rows(args.import_rows, rng),
+                         columns=['full_reg_no', 'name', 'branch', 'year', 'email'])
+    conn = importer.get_connection()
+    try:
+        result = profiled(f"import_students ({args.import_rows} rows)", importer.import_students, conn, sheet)
+        print(f"   -> inserted {result['inserted']}, updated {result['updated']}, skipped {result['skipped']}")
+    finally:
+        importer.release_connection(conn)
+
+    students.LIVE_STATS.invalidate()
+    profiled("get_live_stats (cold)", students.get_live_stats)
+    profiled("get_live_stats (warm, x1000)", lambda: [students.get_live_stats() for _ in range(1000)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed, load-test and profile the library apps.")
+    parser.add_argument('--seed', type=int, default=42, help="random seed, for reproducible runs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('seed', help=f"(re)create the {BENCH_DB} database with synthetic data")
+    p.add_argument('--students', type=int, default=20000)
+    p.add_argument('--faculty', type=int, default=300)
+    p.add_argument('--years', type=int, default=5)
+    p.add_argument('--visits-per-day', type=int, default=400)
+    p.set_defaults(func=seed)
+
+    p = commands.add_parser('load', help="concurrent gate scans and report downloads")
+    p.add_argument('--scans', type=int, default=2000)
+    p.add_argument('--reports', type=int, default=20)
+    p.add_argument('--concurrency', type=int, default=16)
+    p.add_argument('--report-concurrency', type=int, default=4)
+    p.add_argument('--url', help="gate base URL (default: run the apps in-process)")
+    p.add_argument('--admin-url', help="admin base URL when using --url")
+    p.set_defaults(func=load)
+
+    p = commands.add_parser('profile', help="cProfile the hot paths")
+    p.add_argument('--days', type=int, default=90, help="date range for get_log_data")
+    p.add_argument('--import-rows', type=int, default=5000)
+    p.set_defaults(func=profile)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Shared MySQL connection pool used by Students/students.py, Admin/admin.py
+and Admin/import.py.
+
+Every app used to open a brand new mysql.connector connection per query.
+This module keeps a small set of connections open and hands them out, so a
+gate scan only pays the TCP/auth handshake once per worker.
+
+Settings can be overridden with environment variables:
+    LIB_DB_POOL_SIZE      maximum open connections per pool   (default 5)
+    LIB_DB_POOL_TIMEOUT   seconds to wait for a free connection (default 5)
+    LIB_DB_POOL_RECYCLE   idle seconds before a connection is pinged (default 60)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+
+POOL_SIZE = int(os.environ.get('LIB_DB_POOL_SIZE', 5))
+POOL_TIMEOUT = float(os.environ.get('LIB_DB_POOL_TIMEOUT', 5))
+POOL_RECYCLE = float(os.environ.get('LIB_DB_POOL_RECYCLE', 60))
+
+
+# Callables (pool_name, seconds) told about every wait for a free connection; see metrics.py
+WAIT_OBSERVERS = []
+
+
+class PoolExhausted(mysql.connector.Error):
+    """Raised when no connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, db_config, size=POOL_SIZE, timeout=POOL_TIMEOUT, recycle=POOL_RECYCLE, name='default'):
+        self.db_config = dict(db_config)
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.name = name
+        self._idle = []     # LIFO: the most recently used connection is the least likely to be stale
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)   # signalled when a connection or a slot frees up
+        self._open = 0
+        self._last_used = {}
+        self.stats = {
+            'checkouts': 0,     # connections handed out
+            'waits': 0,         # checkouts that had to wait for a free connection
+            'misses': 0,        # checkouts that had to open a new connection
+            'reconnects': 0,    # stale connections reconnected or replaced
+            'timeouts': 0,      # checkouts that gave up waiting
+            'wait_seconds': 0.0,
+        }
+
+    # --- CONNECTION LIFECYCLE ---
+    def _connect(self):
+        conn = mysql.connector.connect(**self.db_config)
+        conn.autocommit = True
+        return conn
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._capacity:
+            self._open -= 1
+            self._capacity.notify()
+
+    def _is_healthy(self, conn):
+        """Cheap check for recently used connections, a real ping for idle ones."""
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0)
+        try:
+            if idle_for < self.recycle:
+                return conn.is_connected()
+            try:
+                conn.ping()
+            except mysql.connector.Error:
+                conn.reconnect(attempts=1, delay=0)
+                conn.autocommit = True
+                self._count('reconnects')
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def get(self):
+        """Checks out a healthy connection, opening one if the pool has room."""
+        self._count('checkouts')
+        wait_started = None
+        while True:
+            conn, open_new, timed_out = None, False, False
+            with self._capacity:
+                if self._idle:
+                    conn = self._idle.pop()
+                elif self._open < self.size:
+                    self._open += 1
+                    self.stats['misses'] += 1
+                    open_new = True
+                else:
+                    now = time.monotonic()
+                    if wait_started is None:
+                        wait_started = now
+                        self.stats['waits'] += 1
+                    remaining = wait_started + self.timeout - now
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        timed_out = True
+                    else:
+                        # Woken by put() or by a discard freeing a slot
+                        self._capacity.wait(remaining)
+                        continue
+
+            if timed_out:
+                self._observe_wait(wait_started)
+                raise PoolExhausted(msg=f"No free connection in pool '{self.name}' after {self.timeout}s")
+            if wait_started is not None:
+                self._observe_wait(wait_started)
+                wait_started = None
+            if open_new:
+                try:
+                    return self._connect()
+                except mysql.connector.Error:
+                    with self._capacity:
+                        self._open -= 1
+                        self._capacity.notify()
+                    raise
+            if self._is_healthy(conn):
+                return conn
+            self._count('reconnects')
+            self._discard(conn)
+
+    def _count(self, stat, amount=1):
+        # Stats share the pool lock so concurrent checkouts don't lose updates
+        with self._capacity:
+            self.stats[stat] += amount
+
+    def _observe_wait(self, started):
+        waited = time.monotonic() - started
+        self._count('wait_seconds', waited)
+        for observer in WAIT_OBSERVERS:
+            observer(self.name, waited)
+
+    def put(self, conn):
+        """Returns a connection to the pool, rolling back anything left open."""
+        if conn is None:
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            if not conn.is_connected():
+                raise mysql.connector.Error(msg="connection lost")
+        except mysql.connector.Error:
+            self._discard(conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        with self._capacity:
+            self._idle.append(conn)
+            self._capacity.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.get()
+        try:
+            yield conn
+        finally:
+            self.put(conn)
+
+    def metrics(self):
+        with self._lock:
+            stats, open_count, idle_count = dict(self.stats), self._open, len(self._idle)
+        return dict(stats, name=self.name, size=self.size, open=open_count, idle=idle_count)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+# --- SHARED REGISTRY ---
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_config, name='default', **kwargs):
+    """Returns the process-wide pool for `name`, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ConnectionPool(db_config, name=name, **kwargs)
+            _pools[name] = pool
+        return pool
+
+
+def pool_metrics():
+    with _pools_lock:
+        return {name: pool.metrics() for name, pool in _pools.items()}
@@ -0,0 +1,65 @@
+"""
+Single-holder lock file used to elect one process to run once-only jobs.
+
+When students.py runs under a multi-worker server (or the debug reloader),
+every process imports the module and starts its own scheduler. Jobs that
+write to the database, like the 16:30 auto-exit, must run exactly once, so
+each process tries to take this lock and only the holder schedules them.
+The OS releases the lock when the holder exits, so another process can take
+over on its next attempt.
+"""
+import os
+import tempfile
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+DEFAULT_LOCK_PATH = os.environ.get(
+    'LIB_SCHEDULER_LOCK', os.path.join(tempfile.gettempdir(), 'lib_main_scheduler.lock')
+)
+
+
+class LeaderLock:
+    def __init__(self, path=DEFAULT_LOCK_PATH):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def try_acquire(self):
+        """Non-blocking. Returns True if this process holds the lock."""
+        if self._file is not None:
+            return True
+        f = open(self.path, 'a+')
+        try:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == 'nt':
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,50 @@
+"""
+Schema shared by the student gate and the admin app.
+
+Both apps read `logs`, and some of their queries rely on columns that
+earlier versions of the table didn't have. Each app calls
+ensure_open_log_guard() at startup, so whichever one starts first adds the
+column and neither depends on the other having run.
+"""
+import mysql.connector
+from mysql.connector import errorcode
+
+import metrics
+
+log = metrics.get_logger('schema')
+
+
+def ensure_open_log_guard(conn):
+    """
+    Enforces "one open log per full_reg_no" in the database itself.
+    `open_reg_no` mirrors full_reg_no while a log is open and is NULL once it
+    is closed, so a UNIQUE key on it rejects a second open entry, and
+    "WHERE open_reg_no IS NOT NULL" finds the open logs through that key.
+    `conn` must be in autocommit mode (as pooled connections are).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""SELECT COUNT(*) FROM information_schema.COLUMNS
+                          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'logs' AND COLUMN_NAME = 'open_reg_no'""")
+        if cursor.fetchone()[0]:
+            return
+        log.info("adding one-open-log-per-user guard to logs")
+        # Open logs must have a single representation before the key can be built
+        cursor.execute("UPDATE logs SET exit_date = NULL, exit_time = NULL WHERE exit_date = ''")
+        # Close older duplicates at their own entry time so only the newest stays open
+        cursor.execute("""UPDATE logs l JOIN logs newer
+                             ON newer.full_reg_no = l.full_reg_no AND newer.log_id > l.log_id
+                             AND newer.exit_date IS NULL
+                          SET l.exit_date = l.entry_date, l.exit_time = l.entry_time
+                          WHERE l.exit_date IS NULL""")
+        try:
+            cursor.execute("""ALTER TABLE logs
+                              ADD COLUMN open_reg_no VARCHAR(20)
+                                  AS (IF(exit_date IS NULL, full_reg_no, NULL)) STORED,
+                              ADD UNIQUE KEY uq_logs_open_reg_no (open_reg_no)""")
+        except mysql.connector.Error as err:
+            # The other app added it between our check and the ALTER
+            if err.errno != errorcode.ER_DUP_FIELDNAME:
+                raise
+    finally:
+        cursor.close()
@@ -0,0 +1,292 @@
+"""
+Prometheus-style metrics and structured logging shared by the three apps.
+
+    metrics.install(app, 'students')      # route latency, /metrics, request log
+    metrics.install_async(app, 'students')  # the same for the Quart (ASGI) kiosk app
+    @metrics.timed('find_student')        # per-call-site timing
+    scheduler.add_job(metrics.timed_job('auto_exit', auto_exit_users), ...)
+
+/metrics serves the Prometheus text format. Pool counters (connections
+opened, waits, timeouts) are read from db_pool at scrape time. Under a
+multi-worker server each worker process keeps its own counters, so every
+series carries a `pid` label and dashboards should sum across it.
+
+Log lines are single JSON objects on stderr (level from LIB_LOG_LEVEL,
+default INFO). Requests slower than LIB_SLOW_REQUEST_MS (default 500) are
+logged at WARNING.
+"""
+import bisect
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from flask import g, request
+
+import db_pool
+
+SLOW_REQUEST_MS = float(os.environ.get('LIB_SLOW_REQUEST_MS', 500))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JOB_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, 104857600, 1073741824)
+
+
+# --- METRIC TYPES ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_str(names, values):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_str(self.labels + ("pid",), values + (os.getpid(),))} {total}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        names = self.labels + ('pid',)
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                values = values + (os.getpid(),)
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_label_str(names + ("le",), values + (bound,))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_label_str(names + ("le",), values + ("+Inf",))} {series[-2]}')
+                lines.append(f'{self.name}_count{_label_str(names, values)} {series[-2]}')
+                lines.append(f'{self.name}_sum{_label_str(names, values)} {round(series[-1], 6)}')
+        return lines
+
+
+# --- REGISTRY ---
+REQUEST_LATENCY = Histogram('lib_http_request_duration_seconds', 'HTTP request latency by route.',
+                            ('app', 'route', 'method', 'status'))
+QUERY_LATENCY = Histogram('lib_call_duration_seconds', 'Hot-path call latency by call site.', ('call_site',))
+CALL_ERRORS = Counter('lib_call_errors_total', 'Exceptions raised by instrumented call sites.', ('call_site',))
+POOL_WAIT = Histogram('lib_db_pool_wait_seconds', 'Time spent waiting for a free pooled connection.', ('pool',))
+EXPORT_BYTES = Histogram('lib_export_bytes', 'Size of generated report downloads.', ('report',),
+                         buckets=SIZE_BUCKETS)
+JOB_DURATION = Histogram('lib_scheduler_job_duration_seconds', 'Scheduler job run time.', ('job',),
+                         buckets=JOB_BUCKETS)
+JOB_FAILURES = Counter('lib_scheduler_job_failures_total', 'Scheduler job runs that raised.', ('job',))
+
+# db_pool can't import this module (we import it), so it reports waits through a hook
+db_pool.WAIT_OBSERVERS.append(lambda pool_name, seconds: POOL_WAIT.observe(seconds, pool_name))
+
+REGISTRY = [REQUEST_LATENCY, QUERY_LATENCY, CALL_ERRORS, POOL_WAIT, EXPORT_BYTES, JOB_DURATION, JOB_FAILURES]
+
+POOL_COUNTERS = {
+    # db_pool stat -> (metric name, help)
+    'misses': ('lib_db_connections_opened_total', 'New MySQL connection attempts by the pool.'),
+    'reconnects': ('lib_db_reconnects_total', 'Stale pooled connections reconnected or replaced.'),
+    'checkouts': ('lib_db_pool_checkouts_total', 'Connections handed out by the pool.'),
+    'waits': ('lib_db_pool_waits_total', 'Checkouts that had to wait for a free connection.'),
+    'timeouts': ('lib_db_pool_timeouts_total', 'Checkouts that gave up waiting.'),
+}
+POOL_GAUGES = {
+    'open': ('lib_db_pool_open_connections', 'Connections currently open.'),
+    'idle': ('lib_db_pool_idle_connections', 'Open connections not checked out.'),
+}
+
+
+def _render_pools():
+    pools = db_pool.pool_metrics()
+    lines = []
+    for stats_map, metric_type in ((POOL_COUNTERS, 'counter'), (POOL_GAUGES, 'gauge')):
+        for key, (name, help_text) in stats_map.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+            for pool_name, stats in sorted(pools.items()):
+                lines.append(f'{name}{_label_str(("pool", "pid"), (pool_name, os.getpid()))} {stats[key]}')
+    return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += _render_pools()
+    return '\n'.join(lines) + '\n'
+
+
+# --- INSTRUMENTATION HELPERS ---
+def timed(call_site):
+    """Decorator recording a function's latency (and exceptions) under `call_site`."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    CALL_ERRORS.inc(call_site)
+                    raise
+                finally:
+                    QUERY_LATENCY.observe(time.perf_counter() - started, call_site)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                CALL_ERRORS.inc(call_site)
+                raise
+            finally:
+                QUERY_LATENCY.observe(time.perf_counter() - started, call_site)
+        return wrapper
+    return decorator
+
+
+def timed_job(job_name, func):
+    """Wraps a scheduler job so its duration and failures are recorded and logged."""
+    log = get_logger('scheduler')
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            JOB_FAILURES.inc(job_name)
+            log.error('job failed', extra={'fields': {'job': job_name, 'error': str(e)}})
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            JOB_DURATION.observe(duration, job_name)
+            log.debug('job finished', extra={'fields': {'job': job_name, 'duration_ms': round(duration * 1000, 1)}})
+    return wrapper
+
+
+def record_export(report, size):
+    EXPORT_BYTES.observe(size, report)
+
+
+# --- STRUCTURED LOGGING ---
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'pid': record.process,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_logging_configured = False
+
+
+def get_logger(name):
+    global _logging_configured
+    if not _logging_configured:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter())
+        root = logging.getLogger('lib')
+        root.addHandler(handler)
+        root.setLevel(os.environ.get('LIB_LOG_LEVEL', 'INFO').upper())
+        root.propagate = False
+        _logging_configured = True
+    return logging.getLogger(f'lib.{name}')
+
+
+# --- FLASK INTEGRATION ---
+def install(app, app_name):
+    """Adds request timing, a JSON request log and the /metrics endpoint to a Flask app."""
+    log = get_logger(app_name)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            _record(log, app_name, request, response, started)
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return app.response_class(render(), mimetype='text/plain; version=0.0.4')
+
+    return log
+
+
+def install_async(app, app_name):
+    """install() for a Quart app. The hooks are coroutines so Quart doesn't hand them to a thread."""
+    from quart import g as quart_g, request as quart_request
+    log = get_logger(app_name)
+
+    @app.before_request
+    async def _start_timer():
+        quart_g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    async def _record_request(response):
+        started = quart_g.pop('metrics_started', None)
+        if started is not None:
+            _record(log, app_name, quart_request, response, started)
+        return response
+
+    @app.route('/metrics')
+    async def metrics_endpoint():
+        return app.response_class(render(), mimetype='text/plain; version=0.0.4')
+
+    return log
+
+
+def _record(log, app_name, req, response, started):
+    duration = time.perf_counter() - started
+    # Label by URL rule, not path, so /import/jobs/<id> stays one series
+    route = req.url_rule.rule if req.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(duration, app_name, route, req.method, response.status_code)
+    duration_ms = round(duration * 1000, 1)
+    log.log(logging.WARNING if duration_ms >= SLOW_REQUEST_MS else logging.INFO, 'request', extra={'fields': {
+        'route': route, 'method': req.method, 'status': response.status_code, 'duration_ms': duration_ms,
+    }})
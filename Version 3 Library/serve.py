@@ -0,0 +1,132 @@
+"""
+Production server for the three Flask apps.
+
+    python serve.py students [--threads 16] [--port 5000]
+    python serve.py students --async
+    python serve.py admin
+    python serve.py import
+
+On Linux/macOS the app runs under gunicorn with `--workers` processes of
+`--threads` threads each (gthread workers). gunicorn does not run on
+Windows, so there the app runs under waitress in a single process with
+`--threads` threads.
+
+import always runs as a single worker process, whatever --workers says,
+because it keeps job progress in memory. The student gate scales across
+workers: each worker keeps its own who's-inside, counters and live-event
+subscribers, and passes every scan it applies to the others through
+Students/worker_channel.py. students.py elects one worker to run the
+database jobs (see leader_lock.py), so the gate still auto-exits once.
+
+With --async the student gate runs under uvicorn as an ASGI app
+(Students/students_asgi.py: Quart + aiomysql). That works on Windows
+too, and one event loop already serves many concurrent kiosks.
+Requires: pip install quart aiomysql uvicorn.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+APPS = {
+    # name: (folder, module, default port)
+    'students': ('Students', 'students', 5000),
+    'admin': ('Admin', 'admin', 5001),
+    'import': ('Admin', 'import', 5002),
+}
+SINGLE_PROCESS_APPS = {'import'}
+ASGI_APPS = {
+    # name: module exposing the ASGI `app`
+    'students': 'students_asgi',
+}
+
+
+def load_app(name):
+    folder, module_name, _ = APPS[name]
+    app_dir = os.path.join(BASE_DIR, folder)
+    # The apps resolve templates and uploads relative to their own folder
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    return importlib.import_module(module_name)
+
+
+def run_gunicorn(name, host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class LibraryApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # Live-event streams stay open; don't let the arbiter kill idle workers
+            self.cfg.set('timeout', 120)
+            self.cfg.set('post_worker_init', lambda worker: init(self.module))
+
+        def load(self):
+            self.module = load_app(name)
+            return self.module.app
+
+    LibraryApplication().run()
+
+
+def run_waitress(name, host, port, threads):
+    from waitress import serve
+
+    module = load_app(name)
+    init(module)
+    serve(module.app, host=host, port=port, threads=threads)
+
+
+def run_uvicorn(name, host, port, workers):
+    import uvicorn
+
+    app_dir = os.path.join(BASE_DIR, APPS[name][0])
+    os.chdir(app_dir)
+    # uvicorn imports the app in each worker; the app runs init_app from its startup hook
+    uvicorn.run(f'{ASGI_APPS[name]}:app', host=host, port=port, workers=workers, app_dir=app_dir)
+
+
+def init(module):
+    if hasattr(module, 'init_app'):
+        module.init_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a library app under a production WSGI server.")
+    parser.add_argument('app', choices=sorted(APPS))
+    parser.add_argument('--host', default=os.environ.get('LIB_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('LIB_THREADS', 8)))
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Serve the app as ASGI under uvicorn (students only).")
+    args = parser.parse_args()
+    if args.use_async and args.app not in ASGI_APPS:
+        parser.error(f"--async is only available for: {', '.join(sorted(ASGI_APPS))}")
+
+    # The apps size per-thread limits (e.g. live-event streams in events.py) from this
+    os.environ['LIB_THREADS'] = str(args.threads)
+    port = args.port or APPS[args.app][2]
+    workers = args.workers or int(os.environ.get('LIB_WORKERS', os.cpu_count() or 1))
+    if args.app in SINGLE_PROCESS_APPS:
+        if args.workers and args.workers > 1:
+            print(f"[SERVE] {args.app} keeps its state in memory; running one worker process.")
+        workers = 1
+    workers = max(1, workers)
+
+    if args.use_async:
+        run_uvicorn(args.app, args.host, port, workers)
+    elif os.name == 'nt':
+        if workers > 1:
+            print(f"[SERVE] gunicorn is not available on Windows; running {args.app} "
+                  f"as one process with {args.threads} threads.")
+        run_waitress(args.app, args.host, port, args.threads)
+    else:
+        run_gunicorn(args.app, args.host, port, workers, args.threads)
+
+
+if __name__ == '__main__':
+    main()
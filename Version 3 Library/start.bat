@@ -4,15 +4,16 @@ echo Starting Apache and MySQL servers...
 cd /d "C:\xampp"
 start "" .\xampp_start.exe
 
-REM === Step 2: Run app.py inside MAIN folder ===
-cd /d "C:\xampp\htdocs\lib2\Students"
-echo Running MAIN app.py...
-start cmd /k "python students.py"
+REM === Step 2: Run the student gate app under the production server ===
+REM (needs: pip install waitress; use "python students.py" for the debug server)
+REM (for the async mode: pip install quart aiomysql uvicorn, then "python serve.py students --async")
+cd /d "C:\xampp\htdocs\lib2"
+echo Running MAIN students app...
+start cmd /k "python serve.py students --threads 16"
 
-REM === Step 3: Run app.py inside admin folder ===
-cd /d "C:\xampp\htdocs\lib2\Admin"
-echo Running ADMIN app.py...
-start cmd /k "python admin.py"
+REM === Step 3: Run the admin reports app ===
+echo Running ADMIN app...
+start cmd /k "python serve.py admin --threads 8"
 
 REM === Step 4: Wait 3 seconds ===
 timeout /t 2 >nul
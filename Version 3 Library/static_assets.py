@@ -0,0 +1,181 @@
+"""
+Fingerprinted, precompressed static assets for the kiosk and admin UIs.
+
+    ASSETS = static_assets.AssetPipeline(app, ['style.css', 'script.js', 'background.png'])
+    <link rel="stylesheet" href="{{ asset_url('style.css') }}">
+
+Only the listed files are served (the apps used to expose their whole
+folder, .py sources included, as the static root). Each asset is read
+once at startup and published as /static/<name>.<hash>.<ext> with a
+year-long immutable Cache-Control, so a kiosk reload after a scan never
+refetches them; a changed file gets a new hash and URL.
+
+Text assets are precompressed at startup with gzip and, if the optional
+`brotli` package is installed, brotli; the variant is picked from
+Accept-Encoding. If Pillow is installed, PNG/JPEG images also get a
+WebP copy scaled to at most IMAGE_MAX_WIDTH, sent to browsers that accept
+image/webp. url(...) references between assets in CSS are rewritten to the
+hashed URLs.
+
+The Quart (ASGI) kiosk app serves the same assets through
+register_async(app).
+"""
+import gzip
+import hashlib
+import io
+import mimetypes
+import os
+import re
+
+from flask import Response, abort, request, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+IMAGE_MAX_WIDTH = 1920
+WEBP_QUALITY = 80
+COMPRESSIBLE = ('text/', 'application/javascript', 'image/svg+xml')
+CSS_URL = re.compile(r"""url\((['"]?)([^'")]+)\1\)""")
+
+
+class Asset:
+    def __init__(self, name, data, mimetype):
+        self.name = name
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        self.hashed_name = f"{stem}.{self.digest}{ext}"
+        # (content type, content encoding) -> body
+        self.variants = {(mimetype, None): data}
+
+    def add_compressed(self, data, content_type):
+        self.variants[(content_type, 'gzip')] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.variants[(content_type, 'br')] = brotli.compress(data, quality=11)
+
+    def add_webp(self, data):
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail((IMAGE_MAX_WIDTH, IMAGE_MAX_WIDTH * 4))
+            output = io.BytesIO()
+            image.save(output, format='WEBP', quality=WEBP_QUALITY, method=6)
+        webp = output.getvalue()
+        if len(webp) < len(data):
+            self.variants[('image/webp', None)] = webp
+
+    def choose(self, accept, accept_encoding):
+        """Picks the smallest representation the client accepts."""
+        content_type = 'image/webp' if ('image/webp', None) in self.variants and 'image/webp' in accept \
+            else self.mimetype
+        for encoding in ('br', 'gzip'):
+            if (content_type, encoding) in self.variants and encoding in accept_encoding:
+                return content_type, encoding
+        return content_type, None
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if token and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+class AssetPipeline:
+    def __init__(self, app, names, source_dir=None, url_prefix='/static'):
+        self.source_dir = source_dir or app.root_path
+        self.assets = {}   # logical name -> Asset
+        self._by_hashed = {}
+        # Images first, so stylesheets can be rewritten to their hashed URLs
+        for name in sorted(names, key=lambda n: n.endswith('.css')):
+            self._build(name)
+        app.add_url_rule(f'{url_prefix}/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.url
+
+    def _build(self, name):
+        with open(os.path.join(self.source_dir, name), 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if mimetype == 'text/css':
+            data = CSS_URL.sub(self._rewrite_css_url, data.decode('utf-8')).encode('utf-8')
+        asset = Asset(name, data, mimetype)
+        if mimetype.startswith(COMPRESSIBLE):
+            asset.add_compressed(data, mimetype)
+        elif mimetype in ('image/png', 'image/jpeg') and Image is not None:
+            asset.add_webp(data)
+        self.assets[name] = asset
+        self._by_hashed[asset.hashed_name] = asset
+
+    def _rewrite_css_url(self, match):
+        asset = self.assets.get(match.group(2))
+        if asset is None:
+            return match.group(0)
+        return f'url("{asset.hashed_name}")'  # relative to the stylesheet's own /static/ URL
+
+    def url(self, name):
+        return url_for('assets', filename=self.assets[name].hashed_name)
+
+    def lookup(self, filename, headers):
+        """(body, content type, response headers, etag) for a request, or None if unknown."""
+        asset = self._by_hashed.get(filename)
+        cache_control = IMMUTABLE
+        if asset is None:
+            # Unhashed names still work (bookmarks, old pages) but must be revalidated
+            asset = self.assets.get(filename)
+            cache_control = REVALIDATE
+        if asset is None:
+            return None
+
+        content_type, encoding = asset.choose(headers.get('Accept', ''),
+                                              _accepted_encodings(headers.get('Accept-Encoding', '')))
+        body = asset.variants[(content_type, encoding)]
+        etag = f"{asset.digest}-{content_type.split('/')[1]}-{encoding or 'identity'}"
+
+        response_headers = {'Cache-Control': cache_control}
+        vary = []
+        if ('image/webp', None) in asset.variants:
+            vary.append('Accept')
+        if any(e for _, e in asset.variants):
+            vary.append('Accept-Encoding')
+        if vary:
+            response_headers['Vary'] = ', '.join(vary)
+        if encoding:
+            response_headers['Content-Encoding'] = encoding
+        return body, content_type, response_headers, etag
+
+    def serve(self, filename):
+        found = self.lookup(filename, request.headers)
+        if found is None:
+            abort(404)
+        body, content_type, headers, etag = found
+        response = Response(body, mimetype=content_type, headers=headers)
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    # --- QUART ---
+    def register_async(self, app, url_prefix='/static'):
+        """Serves the already-built assets from a Quart app as well."""
+        from quart import Response as QuartResponse, abort as quart_abort, request as quart_request, \
+            url_for as quart_url_for
+
+        async def serve_async(filename):
+            found = self.lookup(filename, quart_request.headers)
+            if found is None:
+                quart_abort(404)
+            body, content_type, headers, etag = found
+            response = QuartResponse(body, mimetype=content_type, headers=headers)
+            response.set_etag(etag)
+            return await response.make_conditional(quart_request)
+
+        app.add_url_rule(f'{url_prefix}/<path:filename>', 'assets', serve_async)
+        app.jinja_env.globals['asset_url'] = \
+            lambda name: quart_url_for('assets', filename=self.assets[name].hashed_name)
@@ -0,0 +1,12 @@
+"""
+The apps import their sibling modules by bare name (see the sys.path lines
+at the top of students.py and admin.py); the tests do the same.
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('', 'Admin', 'Students'):
+    path = os.path.join(BASE_DIR, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+import pytest
+
+import attendance
+
+
+def test_encode_decode_round_trip():
+    bitmap = attendance.encode([0, 3, 8, 17])
+    assert len(bitmap) == 3
+    matrix = attendance.decode([bitmap], 20)
+    assert matrix.shape == (1, 20)
+    assert list(np.flatnonzero(matrix[0])) == [0, 3, 8, 17]
+
+
+def test_decode_pads_older_shorter_bitmaps_and_empty_days():
+    # The first day was built before ids 8+ existed; the last day had no visitors
+    matrix = attendance.decode([attendance.encode([1]), attendance.encode([1, 9]), attendance.encode([])], 12)
+    assert matrix.shape == (3, 12)
+    assert [list(np.flatnonzero(row)) for row in matrix] == [[1], [1, 9], []]
+
+
+def test_decode_ignores_bits_past_the_width():
+    matrix = attendance.decode([attendance.encode([2, 15])], 10)
+    assert list(np.flatnonzero(matrix[0])) == [2]
+
+
+def test_streaks_count_consecutive_library_days():
+    matrix = np.array([
+        [1, 1, 0],
+        [1, 0, 0],
+        [0, 1, 1],
+        [1, 1, 1],
+        [1, 1, 0],
+    ], dtype=bool)
+    longest, current = attendance.streaks(matrix)
+    assert list(longest) == [2, 3, 2]
+    assert list(current) == [2, 3, 0]
+
+
+def _people(n):
+    return pd.DataFrame({
+        'full_reg_no': [f'REG{i}' for i in range(n)],
+        'name': [f'Student {i}' for i in range(n)],
+        'branch': ['CSE', 'CSE', 'ECE', 'ECE'][:n],
+        'year': ['1', '1', '2', '2'][:n],
+    }, index=pd.Index(range(n), name='dense_id'))
+
+
+def test_visit_frequency_per_student_and_distribution():
+    days = [date(2026, 10, 5) + timedelta(days=i) for i in range(4)]
+    matrix = np.array([
+        [1, 1, 0, 0],
+        [1, 0, 0, 0],
+        [1, 1, 0, 0],
+        [0, 1, 0, 0],
+    ], dtype=bool)
+    report = attendance.visit_frequency(days, matrix, _people(4))
+    frequency = report['Visit Frequency'].set_index('Registration No')
+
+    # Students who never came in the range are left out
+    assert list(frequency.index) == ['REG0', 'REG1']
+    assert frequency.loc['REG0', 'Days Visited'] == 3
+    assert frequency.loc['REG0', 'Attendance %'] == 75.0
+    assert frequency.loc['REG0', 'Longest Streak'] == 3
+    assert frequency.loc['REG0', 'Current Streak'] == 0
+    assert frequency.loc['REG1', 'First Visit'] == '05-10-2026'
+    assert frequency.loc['REG1', 'Last Visit'] == '08-10-2026'
+    assert report['Distribution'].values.tolist() == [[3, 2]]
+
+
+def test_cohort_attendance_groups_by_branch_and_year():
+    days = [date(2026, 10, 5), date(2026, 10, 6)]
+    matrix = np.array([
+        [1, 1, 1, 0],
+        [1, 0, 0, 0],
+    ], dtype=bool)
+    report = attendance.cohort_attendance(days, matrix, _people(4))
+    summary = report['Cohort Summary'].set_index(['Branch', 'Year'])
+
+    assert summary.loc[('CSE', '1'), 'Distinct Visitors'] == 2
+    assert summary.loc[('CSE', '1'), 'Peak Daily Visitors'] == 2
+    assert summary.loc[('CSE', '1'), 'Regular Visitors'] == 2
+    assert summary.loc[('ECE', '2'), 'Students Ever Seen'] == 2
+    assert summary.loc[('ECE', '2'), 'Distinct Visitors'] == 1
+    assert report['Cohort Daily'].values.tolist() == [
+        ['05-10-2026', 'CSE', '1', 2], ['05-10-2026', 'ECE', '2', 1], ['06-10-2026', 'CSE', '1', 1],
+    ]
+
+
+class _FakeConn:
+    """Records statements; answers GET_LOCK with `lock` and serves one day of visits."""
+
+    def __init__(self, lock=1):
+        self.lock = lock
+        self.statements = []
+        self.inserted = {}   # table -> rows passed to executemany
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.statements.append(' '.join(sql.split()))
+
+    def executemany(self, sql, rows):
+        self.statements.append(' '.join(sql.split()))
+        self.inserted[sql.split()[2]] = list(rows)
+
+    def fetchone(self):
+        return (self.lock,)
+
+    def fetchall(self):
+        if 'DISTINCT' in self.statements[-1]:
+            return [(date(2026, 10, 5), 'REG1'), (date(2026, 10, 5), 'REG0')]
+        return [('REG0', 0)]
+
+    def start_transaction(self):
+        self.statements.append('START TRANSACTION')
+
+    def commit(self):
+        self.statements.append('COMMIT')
+
+    def rollback(self):
+        self.statements.append('ROLLBACK')
+
+    def close(self):
+        pass
+
+
+def test_refresh_holds_the_named_lock_around_id_allocation():
+    conn = _FakeConn()
+    assert attendance.refresh_attendance(conn, date(2026, 10, 5), date(2026, 10, 5)) == 1
+    assert conn.statements[0].startswith('SELECT GET_LOCK(')
+    assert conn.statements[1] == 'START TRANSACTION'
+    assert conn.statements[-1].startswith('SELECT RELEASE_LOCK(')
+    # REG1 is new and gets the next id after REG0's
+    assert conn.inserted['attendance_ids'] == [(1, 'REG1')]
+    [(day, visitors, bitmap)] = conn.inserted['attendance_bitmaps']
+    assert visitors == 2 and list(np.flatnonzero(attendance.decode([bitmap], 2)[0])) == [0, 1]
+
+
+def test_refresh_gives_up_when_another_refresh_holds_the_lock():
+    conn = _FakeConn(lock=0)
+    with pytest.raises(mysql.connector.Error):
+        attendance.refresh_attendance(conn, date(2026, 10, 5), date(2026, 10, 5))
+    assert 'START TRANSACTION' not in conn.statements
@@ -0,0 +1,80 @@
+import importlib
+
+import pandas as pd
+
+# `import` is a keyword, so the module can't be imported with a statement
+importer = importlib.import_module('import')
+
+
+def test_validate_students_keeps_valid_rows_and_reports_first_failing_rule():
+    df = pd.DataFrame({
+        'full_reg_no': ['2021PIET001', '', '2021PIET003', '2021PIET004', ' 2021PIET005 '],
+        'name': ['A', 'B', 'C', 'D', 'E'],
+        'branch': ['CSE', 'CSE', 'ECE', 'ME', None],
+        'year': [2, 3, 7, '4.0', 1],
+        'email': ['a@poornima.edu.in', 'b@poornima.edu.in', 'bad@gmail.com', 'D@POORNIMA.EDU.IN', 'x@gmail.com'],
+    })
+    valid, errors, skipped = importer.validate_students(df)
+
+    assert list(valid['full_reg_no']) == ['2021PIET001', '2021PIET004']
+    assert list(valid.columns) == list(importer.STUDENT_UPSERT_COLUMNS)
+    assert list(valid['year']) == [2, 4]
+    # Spreadsheet rows are 1-based with a header row; year is checked before email
+    assert errors == [
+        "Row 3: 'full_reg_no' is missing.",
+        "Row 4: 'year' must be between 1 and 5.",
+        "Row 6: Email must end with @poornima.edu.in.",
+    ]
+    assert skipped == 3
+
+
+def test_validate_students_handles_missing_optional_columns():
+    df = pd.DataFrame({'full_reg_no': ['2021PIET001'], 'year': [1], 'email': ['a@poornima.edu.in']})
+    valid, errors, skipped = importer.validate_students(df)
+    assert errors == [] and skipped == 0
+    assert valid.iloc[0]['name'] == '' and valid.iloc[0]['branch'] == ''
+
+
+def test_validate_faculty_requires_a_four_digit_code_and_a_name():
+    df = pd.DataFrame({
+        'full_reg_no': ['1234', '12345', '5678.0', '4321', ''],
+        'name': ['Dr. A', 'Dr. B', 'Dr. C', '', 'Dr. E'],
+        'branch': ['CSE', 'CSE', 'ECE', 'ME', 'ME'],
+        'email': ['a@poornima.edu.in', '', '', '', ''],
+    })
+    valid, errors, skipped = importer.validate_faculty(df)
+
+    assert list(valid['full_reg_no']) == [1234, 5678]
+    # A blank email becomes NULL rather than failing the domain check
+    assert pd.isna(valid.iloc[1]['email'])
+    assert errors == [
+        "Faculty row 3: 'full_reg_no' must be a 4-digit faculty code.",
+        "Faculty row 5: 'name' is missing.",
+        "Faculty row 6: 'full_reg_no' is missing.",
+    ]
+    assert skipped == 3
+
+
+def test_validate_faculty_rejects_other_email_domains():
+    df = pd.DataFrame({'full_reg_no': ['1234'], 'name': ['Dr. A'], 'email': ['a@gmail.com']})
+    valid, errors, skipped = importer.validate_faculty(df)
+    assert valid.empty and skipped == 1
+    assert errors == ["Faculty row 2: Email must end with @poornima.edu.in."]
+
+
+def test_import_sheet_reports_errors_chunk_by_chunk(monkeypatch):
+    monkeypatch.setattr(importer, '_upsert_chunk', lambda conn, table, columns, valid, seen: (len(valid), 0))
+    chunk = pd.DataFrame({'full_reg_no': ['2021PIET001', ''], 'name': ['A', 'B'], 'branch': ['CSE', 'CSE'],
+                          'year': [2, 3], 'email': ['a@poornima.edu.in', 'b@poornima.edu.in']})
+    reported = []
+
+    def chunks():
+        yield chunk
+        # The first chunk's errors are out before the second chunk is read
+        assert reported == [["Row 3: 'full_reg_no' is missing."]]
+        yield chunk.set_axis([2, 3])
+
+    result = importer.import_sheet(None, 'students', chunks(), on_errors=reported.append)
+    assert reported == [["Row 3: 'full_reg_no' is missing."], ["Row 5: 'full_reg_no' is missing."]]
+    assert result['errors'] == ["Row 3: 'full_reg_no' is missing.", "Row 5: 'full_reg_no' is missing."]
+    assert result['inserted'] == 2
@@ -0,0 +1,74 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import occupancy_report
+
+DAY = date(2026, 10, 5)
+
+
+def _visits(rows):
+    """rows: (reg_no, entry 'HH:MM', exit 'HH:MM' or None) on DAY, shaped like a MySQL read."""
+    def clock(text):
+        hours, minutes = map(int, text.split(':'))
+        return timedelta(hours=hours, minutes=minutes)
+    return pd.DataFrame({
+        'full_reg_no': [reg for reg, _, _ in rows],
+        'name': [f'Student {reg}' for reg, _, _ in rows],
+        'branch': 'CSE',
+        'year': '2',
+        'entry_date': [DAY] * len(rows),
+        'entry_time': [clock(entry) for _, entry, _ in rows],
+        'exit_date': [DAY if exit_ else None for _, _, exit_ in rows],
+        'exit_time': [clock(exit_) if exit_ else None for _, _, exit_ in rows],
+    })
+
+
+def test_dwell_minutes_and_bad_rows():
+    visits = occupancy_report.load_visits(_visits([('1', '09:00', '10:30'), ('2', '11:00', '10:00')]),
+                                          now=datetime(2026, 10, 6))
+    # An exit before the entry counts as a zero-length visit
+    assert list(visits['dwell_minutes']) == [90.0, 0.0]
+
+
+def test_open_visits_last_until_now_or_the_end_of_their_day():
+    df = _visits([('1', '09:00', None)])
+    today = occupancy_report.load_visits(df, now=datetime(2026, 10, 5, 12, 0))
+    assert today['still_inside'].iloc[0]
+    assert today['dwell_minutes'].iloc[0] == 180.0
+
+    later = occupancy_report.load_visits(df, now=datetime(2026, 10, 8))
+    assert later['exit_ts'].iloc[0] == pd.Timestamp('2026-10-05 23:59:59')
+
+
+def test_default_now_is_ist_wall_clock_time():
+    df = _visits([('1', '00:00', None)])
+    df['entry_date'] = [(datetime.now(occupancy_report.IST) - timedelta(hours=1)).date()]
+    visits = occupancy_report.load_visits(df)
+    expected = min(datetime.now(occupancy_report.IST).replace(tzinfo=None),
+                   datetime.combine(df['entry_date'].iloc[0], datetime.max.time()))
+    assert abs(visits['exit_ts'].iloc[0] - pd.Timestamp(expected)) < pd.Timedelta(minutes=1)
+
+
+def test_daily_peak_counts_exits_before_entries_at_the_same_time():
+    df = _visits([('1', '09:00', '10:00'), ('2', '09:30', '11:00'), ('3', '10:00', '10:45'), ('4', '10:15', '10:30')])
+    report = occupancy_report.build_occupancy_report(df, DAY, DAY, now=datetime(2026, 10, 6))
+    peaks = report['Daily Peaks']
+
+    # 1 leaves at 10:00 as 3 arrives, so the peak is 2, 3 and 4 inside at 10:15
+    assert peaks.iloc[0]['Peak Occupancy'] == 3
+    assert peaks.iloc[0]['Peak Time'] == '10:15:00'
+    assert peaks.iloc[0]['Visits'] == 4 and peaks.iloc[0]['Unique Visitors'] == 4
+
+
+def test_occupancy_slots_match_a_direct_count():
+    rows = [('1', '07:05', '08:00'), ('2', '07:30', '09:10'), ('3', '08:00', None)]
+    report = occupancy_report.build_occupancy_report(_visits(rows), DAY, DAY, now=datetime(2026, 10, 5, 9, 0))
+    grid = report[f'Occupancy ({occupancy_report.SLOT_MINUTES} min)'].set_index('Time')[DAY.strftime('%d-%m-%Y')]
+
+    assert grid['07:00'] == 0
+    assert grid['07:30'] == 2     # entries at a slot count from that slot
+    assert grid['08:00'] == 2     # 1 left and 3 arrived at 08:00
+    assert grid['09:00'] == 1     # 3's open visit ends at now (09:00); 2 stays until 09:10
+    assert grid['20:00'] == 0
+    assert len(grid) == (occupancy_report.CLOSE_HOUR - occupancy_report.OPEN_HOUR) * 60 // occupancy_report.SLOT_MINUTES + 1
@@ -0,0 +1,51 @@
+from report_cache import ReportCache
+
+KEY = ('range_summary', '2026-10-01', '2026-10-07')
+
+
+def test_hit_requires_the_same_fingerprint():
+    cache = ReportCache(max_bytes=1024)
+    cache.put(KEY, (10, 42, 0), b'workbook', 'report.xlsx')
+
+    assert cache.get(KEY, (10, 42, 0)) == (b'workbook', 'report.xlsx')
+    # A new entry in the range changes the fingerprint and drops the entry
+    assert cache.get(KEY, (11, 43, 1)) is None
+    assert cache.get(KEY, (10, 42, 0)) is None
+    assert cache.stats == {'hits': 1, 'misses': 2, 'invalidations': 1, 'evictions': 0}
+
+
+def test_put_replaces_an_existing_entry_and_its_size():
+    cache = ReportCache(max_bytes=1024)
+    cache.put(KEY, (1,), b'x' * 100, 'a.xlsx')
+    cache.put(KEY, (2,), b'y' * 10, 'b.xlsx')
+    assert cache.get(KEY, (2,)) == (b'y' * 10, 'b.xlsx')
+    assert cache.metrics()['bytes'] == 10
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes():
+    cache = ReportCache(max_bytes=25)
+    cache.put('a', 1, b'a' * 10, 'a.xlsx')
+    cache.put('b', 1, b'b' * 10, 'b.xlsx')
+    cache.get('a', 1)                        # 'b' is now the least recently used
+    cache.put('c', 1, b'c' * 10, 'c.xlsx')
+
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) is not None and cache.get('c', 1) is not None
+    assert cache.stats['evictions'] == 1
+    assert cache.metrics()['bytes'] == 20
+
+
+def test_entries_larger_than_the_cache_are_not_stored():
+    cache = ReportCache(max_bytes=5)
+    cache.put(KEY, 1, b'too large', 'big.xlsx')
+    assert cache.get(KEY, 1) is None
+    assert cache.metrics()['entries'] == 0
+
+
+def test_metrics_report_the_hit_ratio():
+    cache = ReportCache(max_bytes=100)
+    assert cache.metrics()['hit_ratio'] is None
+    cache.put(KEY, 1, b'data', 'r.xlsx')
+    cache.get(KEY, 1)
+    cache.get(('other',), 1)
+    assert cache.metrics()['hit_ratio'] == 0.5
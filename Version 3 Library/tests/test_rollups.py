@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+import rollups
+
+
+class _FakeConn:
+    """Answers refresh_pending's MAX/MIN lookups and records each refreshed range."""
+
+    def __init__(self, last_day, oldest_open=None):
+        self.answers = {'log_daily_summary': last_day, 'open_reg_no': oldest_open}
+        self.ranges = []
+        self._row = None
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        if params is not None:
+            if sql.startswith('DELETE FROM log_daily_summary'):
+                self.ranges.append((params['start'], params['end']))
+            return
+        self._row = (next((v for k, v in self.answers.items() if k in sql), None),)
+
+    def fetchone(self):
+        return self._row
+
+    def start_transaction(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_refresh_pending_re_rolls_yesterday():
+    today = date(2026, 10, 17)
+    conn = _FakeConn(last_day=today)
+    assert rollups.refresh_pending(conn, today) == (today - timedelta(days=1), today)
+    assert conn.ranges == [(today - timedelta(days=1), today)]
+
+
+def test_refresh_pending_starts_at_the_oldest_open_log():
+    today = date(2026, 10, 17)
+    conn = _FakeConn(last_day=today, oldest_open=date(2026, 10, 10))
+    assert rollups.refresh_pending(conn, today) == (date(2026, 10, 10), today)
@@ -0,0 +1,137 @@
+import copy
+from contextlib import closing
+from datetime import datetime
+
+import mysql.connector
+import pytest
+from mysql.connector import errorcode
+
+from scan_queue import ScanQueue
+
+USER = {'full_reg_no': '2021PIET001', 'name': 'A', 'branch': 'CSE', 'year': 2}
+
+
+class FakeMySQL:
+    """Just enough of `logs` and `log_event_keys` for ScanQueue's replay statements."""
+
+    def __init__(self):
+        self.event_keys = {}    # event_key -> outcome
+        self.logs = []          # dicts; exit_date None while open
+        self._saved = None
+        self.fail_next = False
+
+    # connection
+    def cursor(self):
+        return self
+
+    def start_transaction(self):
+        self._saved = copy.deepcopy((self.event_keys, self.logs))
+
+    def commit(self):
+        self._saved = None
+
+    def rollback(self):
+        if self._saved is not None:
+            self.event_keys, self.logs = self._saved
+            self._saved = None
+
+    def close(self):
+        pass
+
+    # cursor
+    def execute(self, sql, params):
+        if self.fail_next:
+            self.fail_next = False
+            raise mysql.connector.OperationalError(msg="lost connection")
+        sql = ' '.join(sql.split())
+        self.rowcount = 1
+        if sql.startswith("INSERT IGNORE INTO log_event_keys"):
+            if params[0] in self.event_keys:
+                self.rowcount = 0
+            else:
+                self.event_keys[params[0]] = 'pending'
+        elif sql.startswith("UPDATE log_event_keys"):
+            self.event_keys[params[1]] = params[0]
+        elif sql.startswith("INSERT INTO logs"):
+            if any(log['full_reg_no'] == params[0] and log['exit_date'] is None for log in self.logs):
+                raise mysql.connector.IntegrityError(errno=errorcode.ER_DUP_ENTRY, msg="Duplicate entry")
+            self.logs.append({'full_reg_no': params[0], 'role': params[6], 'entry': (params[4], params[5]),
+                              'exit_date': None})
+        elif sql.startswith("UPDATE logs SET exit_date"):
+            open_logs = [log for log in self.logs if log['full_reg_no'] == params[2]
+                         and log['exit_date'] is None and log['role'] == params[3]]
+            for log in open_logs:
+                log['exit_date'] = params[0]
+            self.rowcount = len(open_logs)
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ScanQueue(str(tmp_path / 'data' / 'scan_queue.sqlite3'))
+
+
+def _flush(queue, db):
+    return queue.flush(lambda: db, lambda conn: None)
+
+
+def test_pending_count_is_read_from_the_file(queue):
+    queue.append('entry', USER, 'Student', datetime(2026, 10, 5, 9, 0))
+    queue.append('exit', USER, 'Student', datetime(2026, 10, 5, 11, 0))
+    assert queue.pending() == 2
+    # Another process (the flushing leader) sees the same queue
+    other = ScanQueue(queue.path)
+    assert other.pending() == 2
+    assert _flush(other, FakeMySQL()) == 2
+    assert queue.pending() == 0
+
+
+def test_flush_replays_in_order_and_empties_the_queue(queue):
+    db = FakeMySQL()
+    queue.append('entry', USER, 'Student', datetime(2026, 10, 5, 9, 0))
+    queue.append('exit', USER, 'Student', datetime(2026, 10, 5, 11, 0))
+
+    assert _flush(queue, db) == 2
+    assert queue.pending() == 0 and ScanQueue(queue.path).pending() == 0
+    assert [log['exit_date'] for log in db.logs] == ['2026-10-05']
+    assert set(db.event_keys.values()) == {'applied'}
+
+
+def test_replaying_an_already_applied_batch_is_a_no_op(queue):
+    """The process died after the MySQL commit but before deleting the batch from the queue."""
+    db = FakeMySQL()
+    queue.append('entry', USER, 'Student', datetime(2026, 10, 5, 9, 0))
+    with closing(queue._connect()) as local:
+        batch = [dict(row) for row in local.execute("SELECT * FROM scan_events ORDER BY seq")]
+    queue._apply_batch(db, batch)
+
+    assert _flush(queue, db) == 1
+    assert len(db.logs) == 1
+    assert queue.stats['duplicates'] == 1
+    assert queue.pending() == 0
+
+
+def test_a_failed_replay_keeps_the_events_queued(queue):
+    db = FakeMySQL()
+    queue.append('entry', USER, 'Student', datetime(2026, 10, 5, 9, 0))
+    queue.append('entry', dict(USER, full_reg_no='2021PIET002'), 'Student', datetime(2026, 10, 5, 9, 5))
+    db.fail_next = True
+
+    assert _flush(queue, db) == 0
+    assert queue.pending() == 2 and queue.stats['flush_errors'] == 1
+    assert db.logs == [] and db.event_keys == {}
+
+    assert _flush(queue, db) == 2
+    assert len(db.logs) == 2
+
+
+def test_conflicting_events_are_recorded_not_retried(queue):
+    db = FakeMySQL()
+    queue.append('entry', USER, 'Student', datetime(2026, 10, 5, 9, 0))
+    queue.append('entry', USER, 'Student', datetime(2026, 10, 5, 9, 1))
+    queue.append('exit', dict(USER, full_reg_no='2021PIET002'), 'Student', datetime(2026, 10, 5, 9, 2))
+
+    assert _flush(queue, db) == 3
+    assert sorted(db.event_keys.values()) == ['already_inside', 'applied', 'not_inside']
+    assert queue.stats['conflicts'] == 2
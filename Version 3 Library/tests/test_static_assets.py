@@ -0,0 +1,66 @@
+import gzip
+import io
+
+import pytest
+from flask import Flask
+
+import static_assets
+
+CSS = """body { background: url('background.png'); }
+.logo { background-image: url("logo.png"); }
+.icon { background: url(missing.png); }
+"""
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    (tmp_path / 'style.css').write_text(CSS)
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG not really an image')
+    (tmp_path / 'background.png').write_bytes(b'\x89PNG also not an image')
+    app = Flask(__name__)
+    # Listed before the images on purpose: the pipeline must still build images first
+    names = ['style.css', 'logo.png', 'background.png']
+    monkeypatch.setattr(static_assets, 'Image', None)  # the placeholder bytes aren't decodable
+    return static_assets.AssetPipeline(app, names, source_dir=str(tmp_path))
+
+
+def _css(pipeline):
+    asset = pipeline.assets['style.css']
+    return asset.variants[(asset.mimetype, None)].decode('utf-8')
+
+
+def test_css_urls_point_at_the_hashed_image_names(pipeline):
+    css = _css(pipeline)
+    assert f'url("{pipeline.assets["background.png"].hashed_name}")' in css
+    assert f'url("{pipeline.assets["logo.png"].hashed_name}")' in css
+
+
+def test_unknown_css_urls_are_left_alone(pipeline):
+    assert 'url(missing.png)' in _css(pipeline)
+
+
+def test_hashed_names_change_with_the_content():
+    first = static_assets.Asset('logo.png', b'one', 'image/png')
+    second = static_assets.Asset('logo.png', b'two', 'image/png')
+    assert first.hashed_name.startswith('logo.') and first.hashed_name.endswith('.png')
+    assert first.hashed_name != second.hashed_name
+
+
+def test_hashed_urls_are_immutable_and_plain_names_revalidate(pipeline):
+    hashed = pipeline.assets['style.css'].hashed_name
+    _, _, headers, _ = pipeline.lookup(hashed, {})
+    assert headers['Cache-Control'] == static_assets.IMMUTABLE
+    _, _, headers, _ = pipeline.lookup('style.css', {})
+    assert headers['Cache-Control'] == static_assets.REVALIDATE
+    assert pipeline.lookup('nope.css', {}) is None
+
+
+def test_compressed_variant_follows_accept_encoding(pipeline):
+    hashed = pipeline.assets['style.css'].hashed_name
+    body, content_type, headers, etag = pipeline.lookup(hashed, {'Accept-Encoding': 'gzip;q=1, br;q=0'})
+    assert content_type == 'text/css' and headers['Content-Encoding'] == 'gzip'
+    assert gzip.GzipFile(fileobj=io.BytesIO(body)).read().decode('utf-8') == _css(pipeline)
+    assert etag.endswith('-gzip') and 'Accept-Encoding' in headers['Vary']
+
+    body, _, headers, etag = pipeline.lookup(hashed, {})
+    assert 'Content-Encoding' not in headers and etag.endswith('-identity')
@@ -0,0 +1,45 @@
+import pytest
+
+from worker_channel import WorkerChannel
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'data' / 'worker_channel.sqlite3')
+
+
+def _poll(channel):
+    applied, gaps = [], []
+    channel.poll(lambda kind, data: applied.append((kind, data)), lambda: gaps.append(True))
+    return applied, gaps
+
+
+def test_changes_reach_the_other_workers_but_not_their_publisher(path):
+    first, second = WorkerChannel(path), WorkerChannel(path)
+    first.publish('entry', {'full_reg_no': '2021PIET001'})
+    second.publish('exit', {'full_reg_no': '2021PIET002'})
+
+    assert _poll(first) == ([('exit', {'full_reg_no': '2021PIET002'})], [])
+    assert _poll(second) == ([('entry', {'full_reg_no': '2021PIET001'})], [])
+    # Each change is applied once
+    assert _poll(first) == ([], []) and _poll(second) == ([], [])
+
+
+def test_a_new_worker_starts_from_the_end_of_the_feed(path):
+    WorkerChannel(path).publish('entry', {'full_reg_no': '2021PIET001'})
+    late = WorkerChannel(path)
+    assert _poll(late) == ([], [])
+
+
+def test_changes_pruned_before_they_were_read_trigger_a_resync(path):
+    first, second = WorkerChannel(path), WorkerChannel(path)
+    first.publish('entry', {'full_reg_no': '2021PIET001'})
+    first.prune(keep_seconds=-1)
+    first.publish('exit', {'full_reg_no': '2021PIET001'})
+
+    applied, gaps = _poll(second)
+    assert applied == [('exit', {'full_reg_no': '2021PIET001'})]
+    assert gaps == [True]
+    # After everything is pruned a new worker still starts past the old changes
+    first.prune(keep_seconds=-1)
+    assert _poll(WorkerChannel(path)) == ([], [])